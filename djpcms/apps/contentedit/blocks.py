@@ -10,6 +10,33 @@ from . import classes
 __all__ = ['ContentApplication']
 
 
+def column_blocks(mapper, block, column=None):
+    '''The blocks in the page, namespace and *column* of *block*, ordered by
+position. If *column* is not given, the column of *block* is used.'''
+    column = block.column if column is None else column
+    blocks = [b for b in mapper.filter(page=block.page)\
+              if b.column == column and b.namespace == block.namespace]
+    return sorted(blocks, key=lambda b: b.position)
+
+
+def renumber_columns(request, block, columns):
+    '''Normalise *columns*, a dictionary mapping column numbers to blocks in
+the page and namespace of *block*, with
+:meth:`djpcms.cms.layout.PageModel.renumber_columns`.'''
+    Page = request.view.Page
+    if Page is not None:
+        return Page.model.renumber_columns(columns, block.page,
+                                           block.namespace)
+
+
+def renumber_column(request, block, blocks=None):
+    '''Normalise the *blocks* in the column of *block*. If *blocks* are not
+given, they are loaded with :func:`column_blocks`.'''
+    if blocks is None:
+        blocks = column_blocks(request.view.mapper, block)
+    return renumber_columns(request, block, {block.column: blocks})
+
+
 # Content wrapper in editing mode.
 # Only called by content_view (function above)
 class EditWrapperHandler(CollapsedWrapper):
@@ -153,9 +180,12 @@ The instance.plugin object is maintained but its fields may change.'''
                 if commit:
                     instance.arguments = plugin.save(pform.form)
                     instance.save()
+                    renumber_column(request, instance)
                 plugin_form = pform.render(request)
             else:
                 instance = form.submit(commit=commit)
+                if commit:
+                    renumber_column(request, instance)
                 plugin_form = ''
             plugin_form = self.plugin_form_container(instance, plugin_form)
             jquery = ajax.jhtmls(request.environ,
@@ -167,6 +197,8 @@ The instance.plugin object is maintained but its fields may change.'''
             instance = form.submit(commit=commit)
             jquery = ajax.jhtmls(request.environ)
 
+        if commit and self.cache_handler is not None:
+            self.cache_handler.invalidate_block(instance)
         preview = self.get_preview(request, instance)
         jquery.add('#%s' % instance.pluginid('preview'),
                    html.render(request, preview))
@@ -197,40 +229,63 @@ The instance.plugin object is maintained but its fields may change.'''
                                                    instance=request.instance))
 
     def ajax__rearrange(self, request):
-        '''Move the content block to a new position.'''
+        '''Move the content block to a new position. The request contains
+the ``column`` where the block was dropped and the comma separated html ids
+of the blocks in that column, in their new ``order``. Blocks of the column
+missing from ``order`` keep their relative order after the listed blocks.
+Alternatively, it contains the html id of the ``previous`` or ``next`` block.
+
+The blocks of the page are loaded once and the target and source columns are
+renumbered with a single call to
+:meth:`djpcms.cms.layout.BlockModel.save_blocks`.'''
         contentblock = request.instance
         data = request.REQUEST
-        previous = data.get('previous', None)
-        if previous:
-            block = self.model.block_from_html_id(previous)
-            pos = block.position
-            newposition = pos + 1
-        else:
-            nextv = data.get('next', None)
-            if nextv:
-                block = self.model.block_from_html_id(nextv)
-                pos = block.position
-            else:
-                return jempty()
-            newposition = pos if not pos else pos-1
-
-        column = block.column
         c0 = contentblock.column
         p0 = contentblock.position
-        if column != c0 or p0 != newposition:
-            for bc in self.model.objects.filter(page=contentblock.page):
-                if bc.column != column or bc.position < newposition:
-                    continue
-                bc.position += 1
-                bc.save()
-            contentblock.position = newposition
-            contentblock.column = column
-            contentblock.save()
-            return ajax.message(request.environ,
-                        '%s moved from column, position (%s, %s) to (%s, %s)'
-                        % (block.htmlid(),c0,p0,column,newposition))
-            #update_page(self.model,page)
-        return ajax.message(request.environ, 'nothing moved')
+        bypos = lambda b: b.position
+        blocks = [b for b in self.mapper.filter(page=contentblock.page)\
+                  if b.namespace == contentblock.namespace]
+        byid = dict(((str(b.id), b) for b in blocks))
+        contentblock = byid.get(str(contentblock.id), contentblock)
+        order = data.get('order')
+        if order is not None:
+            try:
+                column = int(data.get('column'))
+            except (TypeError, ValueError):
+                return ajax.message(request.environ, 'nothing moved')
+            ids = (bid.split('-')[-1] for bid in order.split(','))
+            target = []
+            for bid in ids:
+                block = byid.get(bid)
+                if block is not None and block not in target:
+                    target.append(block)
+            target.extend(sorted((b for b in blocks if b.column == column and\
+                                  b not in target), key=bypos))
+        else:
+            previous = data.get('previous')
+            block = byid.get((previous or data.get('next') or '')\
+                             .split('-')[-1])
+            if block is None or block is contentblock:
+                return ajax.jempty(request.environ)
+            column = block.column
+            target = sorted((b for b in blocks if b.column == column and\
+                             b is not contentblock), key=bypos)
+            target.insert(target.index(block) + (1 if previous else 0),
+                          contentblock)
+        current = sorted((b for b in blocks if b.column == column), key=bypos)
+        if contentblock not in target or target == current:
+            return ajax.message(request.environ, 'nothing moved')
+        # Empty blocks are drop targets and stay at the end of the column
+        columns = {column: [b for b in target if b.plugin_name] +
+                           [b for b in target if not b.plugin_name]}
+        if column != c0:
+            columns[c0] = sorted((b for b in blocks if b.column == c0 and\
+                                  b not in target), key=bypos)
+        renumber_columns(request, contentblock, columns)
+        return ajax.message(request.environ,
+                    '%s moved from column, position (%s, %s) to (%s, %s)'
+                    % (contentblock.htmlid(), c0, p0, column,
+                       contentblock.position))
 
 
 class DeleteContentView(views.DeleteView):
@@ -239,25 +294,15 @@ class DeleteContentView(views.DeleteView):
         if not request.is_xhr:
             raise ValueError()
         instance = request.instance
-        column = instance.column
         jquery = ajax.jcollection(request.environ)
-        blockcontents = [b for b in self.mapper.filter(page=instance.page)\
-                         if b.column==column]
+        blockcontents = column_blocks(self.mapper, instance)
         if instance.position == len(blockcontents) - 1:
             return jquery
-
-        jatt   = ajax.jattribute(request.environ)
-        pos    = 0
-        for b in blockcontents:
-            if b == instance:
-                jquery.add(ajax.jremove(None, '#'+instance.htmlid()))
-                b.delete()
-                continue
-            if b.position != pos:
-                b.position = pos
-                b.save()
-            pos += 1
-        jquery.add(jatt)
+        jquery.add(ajax.jremove(None, '#'+instance.htmlid()))
+        instance.delete()
+        renumber_column(request, instance,
+                        [b for b in blockcontents if b != instance])
+        jquery.add(ajax.jattribute(request.environ))
         return jquery
 
 
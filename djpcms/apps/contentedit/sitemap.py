@@ -7,11 +7,12 @@ following to your application urls tuple::
 from djpcms import views, media
 from djpcms.utils import markups
 from djpcms.utils.text import escape, mark_safe
-from djpcms.utils.async import is_async
+from djpcms.utils.async import is_async, on_result
 from djpcms.html import box, Pagination, table_header, Widget, htmldoc
-from djpcms.html.layout import grid, container
+from djpcms.html.layout import grid, container, normalise_columns
 from djpcms.cms import Http404, messages, pageview, permissions
 from djpcms.cms.formutils import request_get_data
+from djpcms.cms.layout import page_tree_update
 from djpcms.apps.nav import page_links
 from djpcms.apps.admin import AdminApplication
 
@@ -87,8 +88,14 @@ editing form.'''
 
     def get_response(self, request):
         page = request.instance
-        layout = page.layout
-        layout = self.root.get_page_layout(layout)()
+        layout = self.root.get_page_layout(page.layout)
+        # Columns are normalised here, rather than when rendering, so that
+        # the editor has saved blocks to edit
+        columns = normalise_columns(request, page,
+                                    layout.container_columns(page))
+        return on_result(columns, lambda r: self.edit_layout(layout()))
+
+    def edit_layout(self, layout):
         # Insert edit page form container
         edit_container = layout.maker.child_widget(self.edit_container, layout)
         cls = layout.children.__class__
@@ -143,6 +150,10 @@ class SiteMapApplication(views.Application):
     def on_bound(self):
         self.root.internals['Page'] = self.mapper
 
+    def invalidate_counts(self):
+        super(SiteMapApplication, self).invalidate_counts()
+        page_tree_update.send(sender=self.model)
+
     def view_for_instance(self, request, instance):
         return self.views['change']
 
@@ -178,10 +189,9 @@ class SiteContentApp(AdminApplication):
         self.root.internals['SiteContent'] = self.mapper
 
     def render_instance_default(self, request, instance, **kwargs):
-        mkp = markups.get(instance.markup)
-        text = instance.body
-        if mkp:
-            text = mkp(request, text)
+        handler = request.view.cache_handler
+        text = markups.render(request, instance.markup, instance.body,
+                              handler.markups if handler else None)
         w = Widget('div', text, cn=classes.sitecontent)
         if instance.javascript:
             g = script_template % instance.javascript
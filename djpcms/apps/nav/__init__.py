@@ -148,6 +148,11 @@ class SoftNavigation(DJPplugin):
     name = 'soft-nav'
     description = 'Navigation'
     form = navigationForm
+    cache_timeout = 60
+
+    def cache_vary(self, request, block):
+        # links depend on the current page and on the views the user can see
+        return request.path, getattr(request.user, 'id', None)
 
     def render(self, request, levels=1, layout='v', **kwargs):
         nav = Navigator(soft=True, levels=int(levels))()
@@ -5,16 +5,20 @@ It also provides several utilities for handling external media.
 '''
 import os
 import re
-import stat
-import mimetypes
 from email.utils import parsedate_tz, mktime_tz
 
 from djpcms import views, html
+from djpcms.media.bundle import is_bundle, BUNDLE_MAX_AGE
 from djpcms.utils.httpurl import http_date, CacheControl
 from djpcms.utils.importer import import_module
 from djpcms.cms import Http404, Response, PermissionDenied
 
-_media = None
+from .index import file_etag, static_file, directory_listing, StaticFile,\
+                   MediaIndex
+
+_media_maps = {}
+_media_indexes = {}
+range_re = re.compile(r'^bytes=(\d*)-(\d*)$')
 w = html.Widget
 wm = html.WidgetMaker
 # Template for media index
@@ -54,6 +58,121 @@ It looks for the ``media`` directory in each installed application.'''
     return map
 
 
+def etag_matches(header, etag):
+    '''Check if the value of an ``If-None-Match`` *header* matches *etag*
+using the weak comparison function.'''
+    if header:
+        header = header.strip()
+        if header == '*':
+            return True
+        etag = etag[2:] if etag.startswith('W/') else etag
+        for tag in header.split(','):
+            tag = tag.strip()
+            tag = tag[2:] if tag.startswith('W/') else tag
+            if tag == etag:
+                return True
+    return False
+
+
+def accepts_gzip(environ):
+    '''``True`` if the ``Accept-Encoding`` header in *environ* accepts the
+gzip content coding.'''
+    for coding in environ.get('HTTP_ACCEPT_ENCODING', '').split(','):
+        bits = coding.split(';')
+        if bits[0].strip().lower() in ('gzip', 'x-gzip'):
+            for param in bits[1:]:
+                name, _, value = param.partition('=')
+                if name.strip() == 'q':
+                    try:
+                        return float(value) > 0
+                    except ValueError:
+                        return False
+            return True
+    return False
+
+
+def parse_range(header, size):
+    '''Parse the value of a ``Range`` *header* for a file of *size* bytes.
+Only a single byte range is supported.
+
+:rtype: ``None`` if the header should be ignored, ``False`` if the range
+    can't be satisfied or a two elements tuple with the first and last byte
+    positions.'''
+    m = range_re.match(header.strip()) if header else None
+    if not m:
+        return None
+    first, last = m.groups()
+    if not first:
+        if not last:
+            return None
+        # suffix range, the last bytes of the file
+        length = int(last)
+        if not length or not size:
+            return False
+        return max(size - length, 0), size - 1
+    first = int(first)
+    if last and int(last) < first:
+        return None
+    if first >= size:
+        return False
+    last = min(int(last), size - 1) if last else size - 1
+    return first, last
+
+
+class file_iterator(object):
+    '''Iterable over chunks of at most *block_size* bytes of the open binary
+file *f*, *length* bytes from *start*. The file is closed when the iteration
+is done or when :meth:`close` is called by the server, even if the content
+was never iterated.'''
+    def __init__(self, f, start=0, length=None, block_size=65536):
+        self.f = f
+        self.start = start
+        self.length = length
+        self.block_size = block_size
+
+    def __iter__(self):
+        f, length, block_size = self.f, self.length, self.block_size
+        with f:
+            if self.start:
+                f.seek(self.start)
+            while length is None or length > 0:
+                size = block_size if length is None else\
+                        min(block_size, length)
+                data = f.read(size)
+                if not data:
+                    break
+                if length is not None:
+                    length -= len(data)
+                yield data
+
+    def close(self):
+        self.f.close()
+
+
+def media_map(settings):
+    '''The :func:`application_map` of the installed applications in
+*settings*, built once for each set of installed applications.'''
+    apps = tuple(settings.get('INSTALLED_APPS', ()))
+    mapping = _media_maps.get(apps)
+    if mapping is None:
+        mapping = _media_maps.setdefault(apps, application_map(apps))
+    return mapping
+
+
+def media_index(settings):
+    '''The :class:`MediaIndex` of installed applications media files or
+``None`` if the ``MEDIA_INDEX`` setting is off. Sites with the same installed
+applications and refresh interval share the index.'''
+    if settings.get('MEDIA_INDEX'):
+        refresh = settings.get('MEDIA_INDEX_REFRESH', 0)
+        key = (tuple(settings.get('INSTALLED_APPS', ())), refresh)
+        index = _media_indexes.get(key)
+        if index is None:
+            index = _media_indexes.setdefault(
+                        key, MediaIndex(media_map(settings), refresh))
+        return index
+
+
 class StaticMapMixin(views.View):
     _methods = ('get',)
 
@@ -73,10 +192,11 @@ class StaticMapMixin(views.View):
     @property
     def media_mapping(self):
         '''Load application media.'''
-        global _media
-        if _media is None:
-            _media = application_map(self.settings.INSTALLED_APPS)
-        return _media
+        return media_map(self.settings)
+
+    @property
+    def media_index(self):
+        return media_index(self.settings)
 
     def has_permission(self, request, **kwargs):
         return True
@@ -96,8 +216,12 @@ class StaticRootView(StaticMapMixin):
 
 class StaticFileView(StaticMapMixin):
     DEFAULT_CONTENT_TYPE = 'application/octet-stream'
+    block_size = 65536
 
     def render(self, request, **kwargs):
+        index = self.media_index
+        if index is not None:
+            return self.render_indexed(request, index)
         mapping = self.media_mapping
         paths = request.urlargs['path'].split('/')
         app = paths.pop(0)
@@ -116,39 +240,136 @@ class StaticFileView(StaticMapMixin):
         else:
             raise Http404()
 
-    def directory_index(self, request, fullpath):
+    def render_indexed(self, request, index):
+        '''Render a file or a directory from the :class:`MediaIndex`
+without accessing the filesystem metadata.'''
+        path = '/'.join((p for p in request.urlargs['path'].split('/') if p))
+        info = index.get(path)
+        if info is not None:
+            return self.serve_file(request, info.fullpath, info,
+                                   lambda: index.discard(path))
+        listing = index.listing(path)
+        if listing is None:
+            raise Http404()
+        elif self.appmodel.show_indexes:
+            return self.directory_index(request, None, listing)
+        else:
+            raise PermissionDenied()
+
+    def directory_index(self, request, fullpath, listing=None):
+        dirs, files = listing or directory_listing(fullpath)
         names = [w('a', '../', href = '../', cn = 'folder')]
-        files = []
-        for f in sorted(os.listdir(fullpath)):
-            if not f.startswith('.'):
-                if os.path.isdir(os.path.join(fullpath, f)):
-                    names.append(w('a', f, href = f+'/', cn = 'folder'))
-                else:
-                    files.append(w('a', f, href = f))
-        names.extend(files)
+        names.extend((w('a', d, href = d+'/', cn = 'folder') for d in dirs))
+        names.extend((w('a', f, href = f) for f in files))
         return static_index().render(request,
                             {'title': self.title(request),
                              'nav': names})
 
-    def serve_file(self, request, fullpath):
-        # Respect the If-Modified-Since header.
-        statobj = os.stat(fullpath)
-        mimetype, encoding = mimetypes.guess_type(fullpath)
-        mimetype = mimetype or self.DEFAULT_CONTENT_TYPE
-        if not self.was_modified_since(request.environ.get(
-                                            'HTTP_IF_MODIFIED_SINCE',None),
-                                       statobj[stat.ST_MTIME],
-                                       statobj[stat.ST_SIZE]):
-            return Response(status=304,
-                            content_type=mimetype,
-                            encoding=encoding)
-        contents = open(fullpath, 'rb').read()
-        response = Response(content=contents,
-                            content_type=mimetype,
-                            encoding=encoding)
-        response.headers["Last-Modified"] = http_date(statobj[stat.ST_MTIME])
+    def serve_file(self, request, fullpath, info=None, stale=None):
+        '''Serve the file at *fullpath*. The file is streamed in chunks of
+:attr:`block_size` bytes, using the ``wsgi.file_wrapper`` of the server when
+available. ``If-None-Match``, ``If-Modified-Since`` and single byte
+``Range`` requests are supported and a ``.gz`` sibling of the file is served
+to clients accepting gzip encoding.
+
+:parameter info: optional :class:`StaticFile` of *fullpath*. If not
+    provided it is obtained from the filesystem. The size, modification time
+    and entity tag are always taken from the open file.
+:parameter stale: optional callable invoked when *info* does not match the
+    file, because it was changed or removed after *info* was built.'''
+        environ = request.environ
+        headers = {'Accept-Ranges': 'bytes'}
+        try:
+            info = info or static_file(fullpath)
+            mimetype = info.mimetype or self.DEFAULT_CONTENT_TYPE
+            encoding = info.encoding
+            if info.gzip is not None:
+                headers['Vary'] = 'Accept-Encoding'
+                if accepts_gzip(environ):
+                    headers['Content-Encoding'] = 'gzip'
+                    info = info.gzip
+            f = open(info.fullpath, 'rb')
+        except (IOError, OSError):
+            if stale is not None:
+                stale()
+            raise Http404()
+        statobj = os.fstat(f.fileno())
+        suffix = '-gzip' if 'Content-Encoding' in headers else ''
+        if file_etag(statobj, suffix) != info.etag:
+            if stale is not None:
+                stale()
+            info = StaticFile(info.fullpath, statobj, etag_suffix=suffix)
+        fullpath, mtime, size, etag = info.fullpath, info.mtime, info.size,\
+                                      info.etag
+        headers['ETag'] = etag
+        headers['Last-Modified'] = http_date(mtime)
+        if is_bundle(fullpath):
+            # bundles names change with their content
+            headers['Cache-Control'] = 'public, max-age=%s' % BUNDLE_MAX_AGE
+        # Respect the If-None-Match and If-Modified-Since headers.
+        if_none_match = environ.get('HTTP_IF_NONE_MATCH')
+        if if_none_match:
+            modified = not etag_matches(if_none_match, etag)
+        else:
+            modified = self.was_modified_since(
+                            environ.get('HTTP_IF_MODIFIED_SINCE'), mtime, size)
+        if not modified:
+            f.close()
+            response = Response(status=304,
+                                content_type=mimetype,
+                                encoding=encoding)
+        else:
+            byte_range = self.byte_range(environ, etag, mtime, size)
+            if byte_range is False:
+                f.close()
+                response = Response(status=416,
+                                    content_type=mimetype,
+                                    encoding=encoding)
+                headers['Content-Range'] = 'bytes */%s' % size
+            else:
+                status, start, length = 200, 0, size
+                if byte_range:
+                    start, last = byte_range
+                    status, length = 206, last - start + 1
+                    headers['Content-Range'] = 'bytes %s-%s/%s' %\
+                                                    (start, last, size)
+                content = self.file_content(environ, f, start, length, size)
+                response = Response(status=status,
+                                    content=content,
+                                    content_type=mimetype,
+                                    encoding=encoding)
+                # The content is streamed, set the length so that the
+                # server does not use a chunked transfer encoding
+                headers['Content-Length'] = str(length)
+        for name, value in headers.items():
+            response.headers[name] = value
         return response
 
+    def byte_range(self, environ, etag, mtime, size):
+        '''The byte range requested by the client, ``None`` for the whole
+file or ``False`` if the range can't be satisfied. The ``Range`` header is
+ignored if an ``If-Range`` header does not match the file.'''
+        header = environ.get('HTTP_RANGE')
+        if header:
+            if_range = environ.get('HTTP_IF_RANGE')
+            if if_range:
+                if_range = if_range.strip()
+                if if_range.startswith('"') or if_range.startswith('W/'):
+                    # strong comparison only
+                    if if_range != etag:
+                        return None
+                elif self.was_modified_since(if_range, mtime):
+                    return None
+            return parse_range(header, size)
+
+    def file_content(self, environ, f, start, length, size):
+        '''An iterable over *length* bytes of the open file *f* from
+*start*. The ``wsgi.file_wrapper`` of the server is used for whole files.'''
+        file_wrapper = environ.get('wsgi.file_wrapper')
+        if file_wrapper is not None and not start and length == size:
+            return file_wrapper(f, self.block_size)
+        return file_iterator(f, start, length, self.block_size)
+
     def was_modified_since(self, header=None, mtime=0, size=0):
         """
         Was something modified since the user last downloaded it?
@@ -187,7 +408,14 @@ class FavIconView(StaticFileView):
             settings = self.settings
             mapping = self.media_mapping
             name = settings.FAVICON_MODULE or settings.SITE_MODULE
-            if name in mapping:
+            index = self.media_index
+            if index is not None:
+                path = name + '/favicon.ico'
+                info = index.get(path)
+                if info is not None:
+                    return self.serve_file(request, info.fullpath, info,
+                                           lambda: index.discard(path))
+            elif name in mapping:
                 hd = mapping[name]
                 fullpath = os.path.join(hd.absolute_path,'favicon.ico')
                 return self.serve_file(request, fullpath)
@@ -209,3 +437,8 @@ class Static(views.Application):
         self.show_indexes = kwargs.pop('show_indexes',self.show_indexes)
         super(Static,self).__init__(*args,**kwargs)
 
+    def _load(self):
+        super(Static, self)._load()
+        # build the media index at startup
+        media_index(self.settings)
+
@@ -0,0 +1,177 @@
+'''An in memory index of static media files. It maps the url path of each
+file in the media directories of installed applications to its size,
+modification time, mimetype and entity tag, so that serving a static file
+does not require filesystem metadata calls.
+
+The index is enabled by the ``MEDIA_INDEX`` setting and rebuilt in a
+background thread, at most once every ``MEDIA_INDEX_REFRESH`` seconds, when
+accessed. Files created after the last build, such as media bundles, are
+looked up in the filesystem and added to the index.
+'''
+import os
+import stat
+import time
+import mimetypes
+from threading import Lock, Thread
+
+__all__ = ['file_etag', 'StaticFile', 'static_file', 'directory_listing',
+           'MediaIndex']
+
+
+def file_etag(statobj, suffix=''):
+    '''A strong entity tag for a file from its inode, size and modification
+time. Files with different content are assumed to differ in at least one of
+them, therefore the tag does not require reading the file.'''
+    return '"%x-%x-%x%s"' % (statobj[stat.ST_INO], statobj[stat.ST_SIZE],
+                             int(statobj.st_mtime*1000000), suffix)
+
+
+class StaticFile(object):
+    '''The metadata needed to serve a static file.
+
+.. attribute:: gzip
+
+    The :class:`StaticFile` of an up to date ``.gz`` sibling of the file or
+    ``None``.
+'''
+    __slots__ = ('fullpath', 'size', 'mtime', 'etag', 'mimetype', 'encoding',
+                 'gzip')
+
+    def __init__(self, fullpath, statobj, gzip=None, etag_suffix=''):
+        self.fullpath = fullpath
+        self.size = statobj[stat.ST_SIZE]
+        self.mtime = statobj[stat.ST_MTIME]
+        self.etag = file_etag(statobj, etag_suffix)
+        self.mimetype, self.encoding = mimetypes.guess_type(fullpath)
+        self.gzip = gzip
+
+    def __repr__(self):
+        return self.fullpath
+
+
+def gzip_sibling(fullpath, statobj, gzstat):
+    if gzstat is not None and gzstat.st_mtime >= statobj.st_mtime:
+        return StaticFile(fullpath + '.gz', gzstat, etag_suffix='-gzip')
+
+
+def static_file(fullpath, statobj=None):
+    '''Build the :class:`StaticFile` of *fullpath* from the filesystem.'''
+    statobj = statobj or os.stat(fullpath)
+    info = StaticFile(fullpath, statobj)
+    if not info.encoding:
+        gzpath = fullpath + '.gz'
+        if os.path.isfile(gzpath):
+            info.gzip = gzip_sibling(fullpath, statobj, os.stat(gzpath))
+    return info
+
+
+def directory_listing(fullpath):
+    '''A two elements tuple with the sorted names of visible directories
+and files in *fullpath*.'''
+    dirs, files = [], []
+    for name in sorted(os.listdir(fullpath)):
+        if not name.startswith('.'):
+            if os.path.isdir(os.path.join(fullpath, name)):
+                dirs.append(name)
+            else:
+                files.append(name)
+    return dirs, files
+
+
+class MediaIndex(object):
+    '''Index of the files in the media directories of a *mapping* of
+application names to :class:`djpcms.apps.static.pathHandler`.
+
+:parameter refresh: number of seconds after which the index is rebuilt from
+    the filesystem. If ``0`` the index is never rebuilt.
+'''
+    def __init__(self, mapping, refresh=0):
+        self.mapping = mapping
+        self.refresh = refresh
+        self._lock = Lock()
+        self._building = False
+        self.build()
+
+    def build(self):
+        '''Walk the media directories and build the index.'''
+        files, directories = {}, {}
+        for name, handler in self.mapping.items():
+            self._walk(name, handler.absolute_path, files, directories)
+        self._index = files, directories
+        self.built = time.time()
+
+    def check(self):
+        '''Start rebuilding the index in a background thread if it is older
+than :attr:`refresh` seconds. The current index is used until the new one is
+built. Return the thread or ``None``.'''
+        if self.refresh and time.time() - self.built > self.refresh:
+            with self._lock:
+                if self._building or time.time() - self.built <= self.refresh:
+                    return
+                self._building = True
+            thread = Thread(target=self._rebuild)
+            thread.daemon = True
+            thread.start()
+            return thread
+
+    def get(self, path):
+        '''The :class:`StaticFile` at the url *path* or ``None``. Paths
+missing from the index are looked up in the filesystem.'''
+        self.check()
+        info = self._index[0].get(path)
+        if info is None:
+            fullpath = self.fullpath(path)
+            if fullpath and os.path.isfile(fullpath):
+                info = static_file(fullpath)
+                self._index[0][path] = info
+        return info
+
+    def discard(self, path):
+        '''Remove the file at the url *path* from the index. It is looked up
+in the filesystem the next time it is requested.'''
+        self._index[0].pop(path, None)
+
+    def fullpath(self, path):
+        '''The absolute file name of the url *path* or ``None`` if *path*
+is not in a media directory.'''
+        bits = path.split('/')
+        handler = self.mapping.get(bits.pop(0))
+        if handler is not None and not [b for b in bits if b in ('.', '..')]:
+            return os.path.join(handler.absolute_path, *bits)
+
+    def listing(self, path):
+        '''The :func:`directory_listing` of the directory at the url *path*
+or ``None``.'''
+        self.check()
+        return self._index[1].get(path)
+
+    def __len__(self):
+        return len(self._index[0])
+
+    def _rebuild(self):
+        try:
+            self.build()
+        finally:
+            self._building = False
+
+    def _walk(self, name, path, files, directories):
+        for root, dirnames, filenames in os.walk(path, followlinks=True):
+            rel = os.path.relpath(root, path)
+            base = name if rel == os.curdir else\
+                    '/'.join([name] + rel.split(os.sep))
+            stats = {}
+            for filename in filenames:
+                try:
+                    stats[filename] = os.stat(os.path.join(root, filename))
+                except OSError:
+                    continue
+            for filename, statobj in stats.items():
+                fullpath = os.path.join(root, filename)
+                info = StaticFile(fullpath, statobj)
+                if not info.encoding:
+                    info.gzip = gzip_sibling(fullpath, statobj,
+                                             stats.get(filename + '.gz'))
+                files['%s/%s' % (base, filename)] = info
+            directories[base] = (
+                sorted((d for d in dirnames if not d.startswith('.'))),
+                sorted((f for f in stats if not f.startswith('.'))))
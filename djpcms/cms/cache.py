@@ -1,6 +1,358 @@
+'''Full page response cache for anonymous GET requests.
+
+The site ``cache`` handler is an instance of :class:`CacheHandler`. It is
+enabled by setting ``RESPONSE_CACHE_BACKEND`` to one of:
+
+* ``"memory"`` for an in-process :class:`MemoryCache`.
+* ``"file:///path/to/directory"`` for a :class:`FileCache`.
+
+and it stores the response of views returning a positive value from
+:meth:`djpcms.cms.RendererMixin.get_cache_timeout`.
+
+The handler also stores the HTML of content block plugins with a positive
+:attr:`djpcms.cms.plugins.DJPplugin.cache_timeout` in the
+``FRAGMENT_CACHE_BACKEND``, the html rendered from markup text, for
+``PAGINATION_COUNT_TIMEOUT`` seconds, the total number of elements of
+paginated queries and, for ``CHOICES_CACHE_TIMEOUT`` seconds, the choices of
+model backed select fields.
+'''
+import os
+import time
+import tempfile
+from hashlib import md5
+try:
+    import cPickle as pickle
+except ImportError:     # pragma    nocover
+    import pickle
+
+from djpcms.utils.httpurl import to_bytes
+from djpcms.utils.structures import LRUCache
+from djpcms.utils.markups import MarkupCache
+
+from .messages import MESSAGE_KEY
+
+
+__all__ = ['CacheBackend', 'MemoryCache', 'FileCache', 'CacheHandler']
+
+
+class CacheBackend(object):
+    '''Interface for :class:`CacheHandler` backends. Values are stored with
+an optional *timeout* in seconds.'''
+    def get(self, key):
+        '''Return the value at *key* or ``None`` if not available or
+expired.'''
+        raise NotImplementedError
+
+    def set(self, key, value, timeout=None):
+        raise NotImplementedError
+
+    def delete(self, key):
+        raise NotImplementedError
+
+    def clear(self):
+        raise NotImplementedError
+
+    def _expiry(self, timeout):
+        return time.time() + timeout if timeout else None
+
+    def _expired(self, expiry):
+        return expiry is not None and expiry <= time.time()
+
+
+class MemoryCache(CacheBackend):
+    '''In process :class:`CacheBackend` holding at most *max_entries*
+values. The least recently used are discarded first.'''
+    def __init__(self, max_entries=1000):
+        self._cache = LRUCache(max_entries)
+
+    def get(self, key):
+        value = self._cache.get(key)
+        if value is not None:
+            expiry, value = value
+            if not self._expired(expiry):
+                return value
+            self._cache.pop(key)
+
+    def set(self, key, value, timeout=None):
+        self._cache.set(key, (self._expiry(timeout), value))
+
+    def delete(self, key):
+        self._cache.pop(key)
+
+    def clear(self):
+        self._cache.clear()
+
+
+class FileCache(CacheBackend):
+    '''A :class:`CacheBackend` which pickles values into files in the
+*location* directory. It can be shared by several processes.'''
+    suffix = '.djpcache'
+
+    def __init__(self, location):
+        self.location = location
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as f:
+                expiry, value = pickle.load(f)
+        except Exception:
+            return None
+        if not self._expired(expiry):
+            return value
+        self._remove(path)
+
+    def set(self, key, value, timeout=None):
+        path = self._path(key)
+        directory = os.path.dirname(path)
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+        fd, tmp = tempfile.mkstemp(dir=directory)
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                pickle.dump((self._expiry(timeout), value), f,
+                            pickle.HIGHEST_PROTOCOL)
+            os.rename(tmp, path)
+        except Exception:
+            self._remove(tmp)
+            raise
+
+    def delete(self, key):
+        self._remove(self._path(key))
+
+    def clear(self):
+        for dirpath, _, filenames in os.walk(self.location):
+            for name in filenames:
+                if name.endswith(self.suffix):
+                    self._remove(os.path.join(dirpath, name))
+
+    def _path(self, key):
+        key = md5(to_bytes(key)).hexdigest()
+        return os.path.join(self.location, key[:2], key + self.suffix)
+
+    def _remove(self, path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+def environ_key(header):
+    '''The WSGI environ key for an HTTP *header*.'''
+    header = header.upper().replace('-', '_')
+    return header if header.startswith('HTTP_') else 'HTTP_' + header
+
+
+def cache_backend(backend):
+    '''Build a :class:`CacheBackend` from a *backend* string.'''
+    if not backend or isinstance(backend, CacheBackend):
+        return backend
+    if backend == 'memory':
+        return MemoryCache()
+    elif backend.startswith('file://'):
+        return FileCache(backend[7:])
+    raise ValueError('Unknown cache backend "{0}"'.format(backend))
 
 
 class CacheHandler(object):
-    
-    def __init__(self, backend = None):
-        self.backend = backend
\ No newline at end of file
+    '''The site ``cache`` handler. It stores full responses of anonymous,
+non ajax, GET requests in :attr:`backend`.
+
+.. attribute:: backend
+
+    A :class:`CacheBackend` or ``None``, in which case nothing is cached.
+
+.. attribute:: vary
+
+    Tuple of request headers always used to build cache keys, in addition
+    to the headers in the ``Vary`` header of each response.
+
+.. attribute:: fragments
+
+    A :class:`CacheBackend` for rendered content block fragments or ``None``.
+
+.. attribute:: counts
+
+    A :class:`MemoryCache` for pagination counts or ``None``.
+
+.. attribute:: choices
+
+    A :class:`MemoryCache` for the ``(id, label)`` choices of model backed
+    :class:`djpcms.forms.ChoiceFieldOptions` or ``None``.
+
+.. attribute:: markups
+
+    A :class:`djpcms.utils.markups.MarkupCache` for html rendered from
+    markup text, holding ``MARKUP_CACHE_SIZE`` entries in process and
+    backed by the ``MARKUP_CACHE_BACKEND``, if available.
+'''
+    def __init__(self, settings=None, backend=None, vary=None,
+                 fragments=None, count_timeout=None, markups=None,
+                 choices_timeout=None):
+        markup_size = 500
+        if settings is not None:
+            backend = backend or settings.get('RESPONSE_CACHE_BACKEND')
+            vary = vary or settings.get('RESPONSE_CACHE_VARY')
+            fragments = fragments or settings.get('FRAGMENT_CACHE_BACKEND')
+            if count_timeout is None:
+                count_timeout = settings.get('PAGINATION_COUNT_TIMEOUT')
+            if choices_timeout is None:
+                choices_timeout = settings.get('CHOICES_CACHE_TIMEOUT')
+            markups = markups or settings.get('MARKUP_CACHE_BACKEND')
+            markup_size = settings.get('MARKUP_CACHE_SIZE', markup_size)
+        self.backend = cache_backend(backend)
+        self.vary = tuple(vary or ())
+        self.fragments = cache_backend(fragments)
+        self.count_timeout = count_timeout or 0
+        self.counts = MemoryCache() if self.count_timeout else None
+        self.choices_timeout = choices_timeout or 0
+        self.choices = MemoryCache() if self.choices_timeout else None
+        self.markups = MarkupCache(markup_size, cache_backend(markups))
+
+    def cacheable(self, request):
+        '''Check if the response for *request* can be served from or stored
+in the cache.'''
+        if self.backend is None or request.method != 'get' or request.is_xhr:
+            return False
+        user = request.user
+        if user is not None and user.is_authenticated():
+            return False
+        session = request.session
+        if session and MESSAGE_KEY in session:
+            return False
+        return True
+
+    def get_response(self, request, response_class):
+        '''Return an instance of *response_class* from the cached data for
+*request* or ``None``.'''
+        if not self.cacheable(request):
+            return None
+        vary = self.backend.get(self._vary_key(request))
+        if vary is None:
+            return None
+        data = self.backend.get(self._key(request, vary))
+        if data is not None:
+            status, headers, content = data
+            return response_class(status=status, content=content,
+                                  response_headers=headers)
+
+    def set_response(self, request, response, timeout):
+        '''Store *response* for *timeout* seconds. Only responses with a
+``200`` status code, no cookies and a content which is not streamed are
+stored.'''
+        if not timeout or response.status_code != 200 or response.cookies or\
+                not isinstance(response.content, (list, tuple)) or\
+                not self.cacheable(request):
+            return False
+        headers = [(k, v) for k, v in response.headers\
+                   if k.lower() not in ('content-length', 'set-cookie')]
+        vary = set(self.vary)
+        for k, v in headers:
+            if k.lower() == 'vary':
+                vary.update((h.strip() for h in v.split(',') if h.strip()))
+        if '*' in vary:
+            return False
+        vary = tuple(sorted((environ_key(h) for h in vary)))
+        content = b''.join(response.content)
+        self.backend.set(self._vary_key(request), vary, timeout)
+        self.backend.set(self._key(request, vary),
+                         (response.status_code, headers, content), timeout)
+        return True
+
+    def fragment_key(self, block, plugin, vary=None):
+        '''The key of the fragment rendered by *plugin* in *block*. It
+depends on the block id and version, the plugin name, its arguments and the
+optional *vary* value returned by
+:meth:`djpcms.cms.plugins.DJPplugin.cache_vary`.'''
+        arguments = md5(to_bytes(block.arguments or '')).hexdigest()
+        vary = md5(to_bytes('%s' % (vary,))).hexdigest() if vary else ''
+        version = self._version(self.fragments, 'djpcms-block:%s' % block.id)
+        return 'djpcms-fragment:%s:%s:%s:%s:%s' % (block.id, version,
+                                                   plugin.name, arguments,
+                                                   vary)
+
+    def get_fragment(self, key):
+        if self.fragments is not None:
+            return self.fragments.get(key)
+
+    def set_fragment(self, key, html, timeout):
+        if self.fragments is not None and timeout:
+            self.fragments.set(key, html, timeout)
+
+    def invalidate_block(self, block):
+        '''Invalidate all fragments rendered for *block* by bumping its
+version. The version is stored in the fragment backend, therefore with the
+``"memory"`` backend only the current process is invalidated and other
+processes serve stale fragments until the plugin
+:attr:`djpcms.cms.plugins.DJPplugin.cache_timeout` expires. Use a shared
+``FRAGMENT_CACHE_BACKEND`` to invalidate all processes.'''
+        if self.fragments is not None:
+            self._version(self.fragments, 'djpcms-block:%s' % block.id, True)
+
+    def count_key(self, model, *bits):
+        '''The key of the total number of elements of a query on *model*.
+*bits* identify the query, for example the application and the normalised
+filtering inputs. Return ``None`` if counts are not cached.'''
+        if self.counts is not None:
+            model_key = self._model_key(model)
+            version = self._version(self.counts, model_key)
+            bits = md5(to_bytes(repr(bits))).hexdigest()
+            return 'djpcms-count:%s:%s:%s' % (model_key, version, bits)
+
+    def get_count(self, key):
+        if key and self.counts is not None:
+            return self.counts.get(key)
+
+    def set_count(self, key, total):
+        if key and self.counts is not None:
+            self.counts.set(key, total, self.count_timeout)
+
+    def choices_key(self, model, *bits):
+        '''The key of the ``(id, label)`` choices of a query on *model*
+identified by *bits*. Return ``None`` if choices are not cached.'''
+        if self.choices is not None:
+            model_key = self._model_key(model)
+            version = self._version(self.choices, model_key)
+            bits = md5(to_bytes(repr(bits))).hexdigest()
+            return 'djpcms-choices:%s:%s:%s' % (model_key, version, bits)
+
+    def get_choices(self, key):
+        if key and self.choices is not None:
+            return self.choices.get(key)
+
+    def set_choices(self, key, choices):
+        if key and self.choices is not None:
+            self.choices.set(key, choices, self.choices_timeout)
+
+    def invalidate_model(self, model):
+        '''Invalidate the counts and choices cached for queries on *model*.
+Called when instances of *model* are created, changed or removed. Counts and
+choices are cached in process, therefore other processes are not
+invalidated and serve them until their timeout expires.'''
+        if model is not None:
+            model_key = self._model_key(model)
+            if self.counts is not None:
+                self._version(self.counts, model_key, True)
+            if self.choices is not None:
+                self._version(self.choices, model_key, True)
+
+    def _model_key(self, model):
+        return 'djpcms-model:%s.%s' % (model.__module__, model.__name__)
+
+    def _version(self, backend, key, new=False):
+        version = None if new else backend.get(key)
+        if version is None:
+            version = '%x' % int(time.time()*1000000)
+            backend.set(key, version)
+        return version
+
+    def _vary_key(self, request):
+        return 'djpcms-vary:%s%s' % (request.get_host(), request.path)
+
+    def _key(self, request, vary):
+        environ = request.environ
+        bits = [request.get_host(), request.path,
+                environ.get('QUERY_STRING', '')]
+        bits.extend((environ.get(h, '') for h in vary))
+        key = md5(to_bytes('\n'.join(bits))).hexdigest()
+        return 'djpcms-page:%s' % key
@@ -2,6 +2,14 @@ import djpcms
 
 DEBUG = False
 PROFILING_KEY = None
+# Directory where the statistics of profiled requests are saved as .prof files
+PROFILING_DIRECTORY = None
+# Seconds after which an incomplete multi-request profiling session is dropped
+PROFILING_TIMEOUT = 300
+# Aggregate per-view response time histograms in the site timing handler
+REQUEST_TIMING = True
+# Add the Server-Timing header with request phase durations to responses
+SERVER_TIMING = True
 DESCRIPTION = 'DYNAMIC CONTENT MANAGEMENT SYSTEM FOR PYTHON AND JQUERY'
 EPILOG = 'HAVE FUN!'
 
@@ -25,6 +33,46 @@ TIME_ZONE = 'Europe/London'
 LANGUAGE_CODE = 'en-uk'
 
 CACHE_VIEW_OBJECTS = True
+# Full page cache of anonymous GET requests. None, "memory" or "file://<dir>"
+RESPONSE_CACHE_BACKEND = None
+# Default number of seconds a response is cached, 0 for views not cached
+RESPONSE_CACHE_TIMEOUT = 0
+# Request headers always used to build response cache keys
+RESPONSE_CACHE_VARY = ()
+# Cache for the HTML of content block plugins with a positive cache_timeout:
+# None, "memory" or "file://<dir>". Edited blocks are invalidated in the
+# backend, therefore with "memory" only in the process which handled the edit.
+# Use a backend shared by all processes, such as "file://<dir>".
+FRAGMENT_CACHE_BACKEND = None
+# Html rendered from markup text, cached in process and in an optional
+# persistent backend: None, "memory" or "file://<dir>"
+MARKUP_CACHE_SIZE = 500
+MARKUP_CACHE_BACKEND = None
+# Codes of markup engines imported when the site is loaded, rather than when
+# first used. For example ('markdown', 'rst')
+MARKUP_PRELOAD = ()
+# Seconds the total count of ajax paginated queries is cached, 0 to disable
+PAGINATION_COUNT_TIMEOUT = 10
+# Seconds the (id, label) choices of model backed select fields are cached,
+# 0 to disable. The cache is in process and it is invalidated only in the
+# process which saves or deletes instances of the model, other processes
+# serve stale choices until the timeout expires.
+CHOICES_CACHE_TIMEOUT = 0
+# Reuse the page tree across requests when the Page model supports it
+PAGE_TREE_CACHE = True
+# Seconds a cached page tree is reused, 0 for no limit. Pages are invalidated
+# by the page_tree_update signal in the process which saved them, the timeout
+# bounds the time other processes serve a stale tree.
+PAGE_TREE_TIMEOUT = 60
+# Resolve urls with a trie of url segments built when the site is loaded
+COMPILE_URL_RESOLVER = True
+# Number of resolved (and not found) paths kept by the page tree
+RESOLVE_CACHE_SIZE = 1000
+RESOLVE_404_CACHE_SIZE = 100
+# Stream html pages to the client as widgets are rendered. The head is sent
+# first, css media added by widgets is linked at the end of the body and an
+# error while streaming aborts the chunked response.
+HTML_STREAMING = False
 DJPCMS_IMAGE_UPLOAD_FUNCTION = None
 DJPCMS_EMPTY_VALUE = '(None)'
 SITEMAP_TIMEOUT = 60
@@ -63,6 +111,16 @@ SWFOBJECT_VERSION = '2.2'
 BOOTSTRAP_VERSION = '1.4.0'
 BOOTSTRAP_LIBS = ()
 DEFAULT_STYLE_SHEET = {}
+# Concatenate local css and javascript files into fingerprinted bundles.
+# Bundles are rebuilt when their files change, checked at every request with
+# DEBUG or every MEDIA_BUNDLES_CHECK seconds (0 for never).
+MEDIA_BUNDLES = False
+MEDIA_BUNDLES_CHECK = 10
+# Index static media files in memory, rebuilt in a background thread every
+# MEDIA_INDEX_REFRESH seconds (0 for never). Files missing from the index are
+# looked up in the filesystem.
+MEDIA_INDEX = False
+MEDIA_INDEX_REFRESH = 2
 DEFAULT_JAVASCRIPT = djpcms.DEFAULT_JAVASCRIPT()
 
 
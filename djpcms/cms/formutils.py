@@ -196,6 +196,11 @@ has been submitted, including possible asynchronous behaviour.'''
 def _finish(request, editing, fhtml, force_redirect, response):
     view = request.view
     f = fhtml.form
+    appmodel = getattr(view, 'appmodel', None)
+    if appmodel is not None:
+        appmodel.invalidate_counts()
+    elif view.cache_handler is not None:
+        view.cache_handler.invalidate_model(view.model)
     if is_renderer(response):
         return response
     elif response == f:
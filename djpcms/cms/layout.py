@@ -7,10 +7,13 @@ import sys
 import re
 import logging
 
-from djpcms.html import NON_BREACKING_SPACE, htmldoc
+from djpcms.html import NON_BREACKING_SPACE, htmldoc, render
 from djpcms.html.layout import grid
 from djpcms.utils import markups
-from djpcms.utils.text import escape, to_string, NOTHING
+from djpcms.utils.async import is_async
+from djpcms.utils.dispatch import Signal
+from djpcms.utils.httpurl import is_string, iteritems
+from djpcms.utils.text import escape, to_string, mark_safe, NOTHING
 
 from .exceptions import BlockOutOfBound
 from .routing import Route
@@ -20,7 +23,11 @@ from .plugins import get_wrapper, default_content_wrapper, get_plugin
 
 __all__ = ['PageModel',
            'BlockModel',
-           'MarkupMixin']
+           'MarkupMixin',
+           'page_tree_update']
+
+# Sent, with the page model as sender, when pages are saved or deleted
+page_tree_update = Signal()
 
 
 def block_htmlid(pageid, block):
@@ -114,7 +121,16 @@ The following attributes must be implemented by subclasses.
 
     @classmethod
     def register_tree_update(cls, tree_update):
-        pass
+        '''Register a *tree_update* callable which must be invoked every time
+a page is saved or deleted. Return ``True`` so that the :class:`Site` can
+reuse its page tree across requests.
+
+By default *tree_update* is connected to the :data:`page_tree_update` signal
+which djpcms applications writing pages, such as the site-map application,
+send with the page model as sender. Models written by other means should
+send the signal or override this method to connect to their ORM signals.'''
+        page_tree_update.connect(tree_update, sender=cls)
+        return True
 
     @classmethod
     def blocks(cls, pageobj):
@@ -125,6 +141,51 @@ The following attributes must be implemented by subclasses.
     def make_block(cls, **kwargs):
         raise NotImplementedError()
 
+    @classmethod
+    def renumber_blocks(cls, blocks, page=None, namespace='content', column=0):
+        '''Normalise the *blocks* of a column, given in display order, with
+:meth:`renumber_columns`. Return the list of blocks of the column.'''
+        return cls.renumber_columns({column: blocks}, page, namespace)[column]
+
+    @classmethod
+    def renumber_columns(cls, columns, page=None, namespace='content'):
+        '''Normalise the blocks of several columns of *page*. *columns* is a
+dictionary mapping column numbers to the blocks of the column in display
+order. For each column, empty blocks which are not the last are deleted,
+blocks are moved to the column, positions are renumbered from ``0`` and an
+empty block is appended if the column does not end with one, so that plugins
+can be dropped into it. All changes are written with a single call to
+:meth:`BlockModel.save_blocks`. Return a dictionary mapping column numbers to
+the new list of blocks.
+
+This function is called when blocks are saved, deleted or moved, so that
+rendering a page never writes to the database.'''
+        result, save, delete = {}, [], []
+        for column, blocks in iteritems(columns):
+            blocks = list(blocks)
+            last = len(blocks) - 1
+            new_blocks = []
+            for idx, block in enumerate(blocks):
+                if not block.plugin_name and idx < last:
+                    delete.append(block)
+                    continue
+                if block.position != len(new_blocks) or\
+                        block.column != column:
+                    block.position = len(new_blocks)
+                    block.column = column
+                    save.append(block)
+                new_blocks.append(block)
+            if not new_blocks or new_blocks[-1].plugin_name:
+                block = cls.make_block(page=page, column=column,
+                                       position=len(new_blocks),
+                                       namespace=namespace)
+                save.append(block)
+                new_blocks.append(block)
+            result[column] = new_blocks
+        if save or delete:
+            type((save or delete)[0]).save_blocks(save, delete)
+        return result
+
 
 class BlockModel(object):
     '''Content Block Interface.'''
@@ -142,7 +203,11 @@ with the wrapper callable.'''
         if plugin and request.has_permission(permissions.VIEW, instance=self):
             try:
                 request.media.add(plugin.media(request))
-                plugin_response = plugin(request, self.arguments, block=self)
+                if plugin is self.plugin:
+                    plugin_response = self.render_plugin(request, plugin)
+                else:
+                    plugin_response = plugin(request, self.arguments,
+                                             block=self)
             except Exception as e:
                 exc_info = sys.exc_info()
                 request.cache.traces.append(exc_info)
@@ -159,6 +224,42 @@ with the wrapper callable.'''
                 plugin_response = NON_BREACKING_SPACE
             return wrapper(request, self, plugin_response)
 
+    def render_plugin(self, request, plugin):
+        '''Render *plugin* using the site fragment cache if the plugin
+:attr:`djpcms.cms.plugins.DJPplugin.cache_timeout` is positive.'''
+        handler = request.view.cache_handler if plugin.cache_timeout else None
+        if handler is None or handler.fragments is None:
+            return plugin(request, self.arguments, block=self)
+        key = handler.fragment_key(self, plugin,
+                                   plugin.cache_vary(request, self))
+        html = handler.get_fragment(key)
+        if html is None:
+            html = render(request, plugin(request, self.arguments, block=self))
+            if is_async(html):
+                html.add_callback(lambda r: self._set_fragment(handler, key,
+                                                               plugin, r))
+            else:
+                self._set_fragment(handler, key, plugin, html)
+        return html
+
+    def _set_fragment(self, handler, key, plugin, html):
+        if is_string(html):
+            handler.set_fragment(key, html, plugin.cache_timeout)
+        return html
+
+    @classmethod
+    def save_blocks(cls, save, delete=()):
+        '''Delete the blocks in *delete* and save the blocks in *save*. It is
+the single write hook used when blocks are renumbered by
+:meth:`PageModel.renumber_columns`. The default implementation writes the
+blocks one at a time, one round trip each. Models whose backend supports
+transactions should override it to write all the blocks in one
+transaction.'''
+        for block in delete:
+            block.delete()
+        for block in save:
+            block.save()
+
     def pluginid(self, extra = ''):
         p = 'plugin-{0}'.format(self)
         if extra:
@@ -230,14 +331,17 @@ Return an iterable over ordered items (by position) in block
 
 
 class MarkupMixin(object):
-
-    def tohtml(self, text):
+    '''Mixin for models with a ``markup`` attribute.'''
+    def tohtml(self, text, request=None):
+        '''Convert *text* into html with the markup handler of this
+instance. Rendered html is cached by :func:`djpcms.utils.markups.render`, in
+the site cache handler if *request* is given.'''
         if not text:
             return ''
-        mkp = markups.get(self.markup)
-        if mkp:
-            handler = mkp.get('handler')
-            text = handler(text)
-            text = loader.mark_safe(to_string(text))
-        return text
+        handler = request.view.cache_handler if request is not None else None
+        html = markups.render(request, self.markup, text,
+                              handler.markups if handler else None)
+        if html is not text:
+            html = mark_safe(to_string(html))
+        return html
 
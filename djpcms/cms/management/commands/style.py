@@ -1,23 +1,29 @@
 import os
+import time
 import logging
-from optparse import make_option
+import multiprocessing
 
 from djpcms import cms
 from djpcms.utils.importer import import_module
 from djpcms.media import site_media_file
 from djpcms.media.style import css, cssv, dump_theme
 
+from pulsar import process_local_data
+from pulsar.utils.system import convert_bytes
+
 LOGGER = logging.getLogger('djpcms.command.style')
 
-def render(site, theme, apps, mediaurl, dump_variables):
-    LOGGER.info('Building theme "%s"' % theme)
-    module = None
+
+def style_applications(site, apps=None):
     applications = list(apps or site.settings.INSTALLED_APPS)
-    imported = {}
-    mediaurl = mediaurl or site.settings.MEDIA_URL
     if site.settings.SITE_MODULE not in applications:
         applications.append(site.settings.SITE_MODULE)
-    # Import applications styles if available
+    return applications
+
+
+def import_styles(applications):
+    '''Import the ``style`` module of *applications* if available.'''
+    imported = {}
     for app in applications:
         modname = '{0}.style'.format(app)
         if modname in imported:
@@ -43,8 +49,80 @@ def render(site, theme, apps, mediaurl, dump_variables):
             if log:
                 LOGGER.error('Cannot import application {0}: "{1}"'\
                             .format(app,e))
+    return imported
+
+
+def render(site, theme, apps, mediaurl, dump_variables, minify=False):
+    LOGGER.info('Building theme "%s"' % theme)
+    mediaurl = mediaurl or site.settings.MEDIA_URL
+    import_styles(style_applications(site, apps))
     #mediaurl = mediaurl
-    return dump_theme(theme, dump_variables=dump_variables)
+    return dump_theme(theme, dump_variables=dump_variables, minify=minify)
+
+
+def build_theme(theme, target, minify=False):
+    '''Render *theme* into the *target* file and return a tuple
+containing the theme name, the target, the size of the output and the time
+taken in seconds.'''
+    start = time.time()
+    data = dump_theme(theme, minify=minify)
+    with open(target, 'w') as f:
+        f.write(data)
+    return theme, target, len(data), time.time() - start
+
+
+def _build_theme(args):
+    return build_theme(*args)
+
+
+def _init_worker(applications, parent_css=None):
+    if parent_css is not None:
+        # forked worker, use the css tree of the parent process
+        process_local_data()._css_local = parent_css
+    else:
+        import_styles(applications)
+
+
+def _forked_workers():
+    '''``True`` if pool workers are forked from the current process, in which
+case the initializer arguments are inherited rather than pickled.'''
+    get_start_method = getattr(multiprocessing, 'get_start_method', None)
+    if get_start_method is not None:
+        return get_start_method() == 'fork'
+    return os.name != 'nt'
+
+
+def build_themes(site, themes, apps=None, minify=False, workers=None):
+    '''Build *themes* in a pool of *workers* processes. Each theme is
+rendered into the ``<theme>.css`` file of the site media directory.'''
+    applications = style_applications(site, apps)
+    import_styles(applications)
+    tasks = []
+    for theme in themes:
+        target = '{0}.css'.format(theme)
+        target = site_media_file(site.settings, target, directory=True)\
+                 or target
+        tasks.append((theme, target, minify))
+    workers = min(workers or multiprocessing.cpu_count(), len(tasks))
+    if workers <= 1:
+        return [build_theme(*task) for task in tasks]
+    parent_css = css.local() if _forked_workers() else None
+    pool = multiprocessing.Pool(workers, _init_worker,
+                                (applications, parent_css))
+    try:
+        return pool.map(_build_theme, tasks)
+    finally:
+        pool.close()
+        pool.join()
+
+
+def all_themes(site, apps=None):
+    '''The site theme and all themes registered in the style modules of
+installed applications.'''
+    import_styles(style_applications(site, apps))
+    themes = cssv.themes()
+    themes.add(site.settings.STYLING)
+    return sorted(themes)
 
 
 class Command(cms.Command):
@@ -70,20 +148,38 @@ class Command(cms.Command):
                    cms.CommandOption('mediaurl',('-m','--media'),
                                 default='',
                                 description='Specify the media url.\
- Override settings value.')
+ Override settings value.'),
+                   cms.CommandOption('all',('--all',),
+                                action='store_true',
+                                default=False,
+                                description='Build the site theme and all\
+ themes registered by installed applications, each one in its\
+ {{ THEME }}.css file, using a pool of processes.'),
+                   cms.CommandOption('workers',('-w','--workers'),
+                                type=int,
+                                default=0,
+                                description='Number of processes used by\
+ --all. If 0 the number of CPUs.'),
+                   cms.CommandOption('minify',('--minify',),
+                                action='store_true',
+                                default=False,
+                                description='Minify the css')
                    )
 
     def handle(self, options, dump=True):
         site = self.website(options)
-        target = options.file
+        if options.all:
+            return self.handle_all(site, options)
+        self.target = target = options.file
         mediaurl = options.mediaurl
         apps = options.apps
         self.theme = options.theme or site.settings.STYLING
         if not target and not options.variables:
             target = '{0}.css'.format(self.theme)
-            target = site_media_file(site.settings, target, directory=True)\
-                     or target
-        data = render(site, self.theme, apps, mediaurl, options.variables)
+            self.target = target = site_media_file(site.settings, target,
+                                                   directory=True) or target
+        data = render(site, self.theme, apps, mediaurl, options.variables,
+                      options.minify)
         if dump:
             if target:
                 with open(target, 'w') as f:
@@ -92,4 +188,15 @@ class Command(cms.Command):
                 print(data)
         return data
 
-
+    def handle_all(self, site, options):
+        start = time.time()
+        themes = all_themes(site, options.apps)
+        LOGGER.info('Building %s themes: %s' % (len(themes), ', '.join(themes)))
+        results = build_themes(site, themes, options.apps, options.minify,
+                               options.workers)
+        for theme, target, size, taken in results:
+            LOGGER.info('Theme "%s": %s in %.3f seconds, "%s".' %
+                        (theme, convert_bytes(size), taken, target))
+        LOGGER.info('Built %s themes in %.3f seconds.' %
+                    (len(results), time.time() - start))
+        return results
@@ -276,6 +276,14 @@ if needed.
 '''
         return True
 
+    def has_many(self, request, perm_code, instances, model=None, user=None):
+        '''Check for *perm_code* permission on several *instances* at once.
+Return a list of booleans, one for each instance. By default it calls
+:meth:`has` for each instance, override it to fetch all the decisions with
+a single query.'''
+        return [self.has(request, perm_code, instance, model, user)\
+                for instance in instances]
+
     def level(self, model, instance, user):
         '''The level of permission for *user* on *instance*.'''
         return DELETE 
@@ -141,6 +141,12 @@ instance for editing the plugin parameters.
 Default: ``None``, the plugin has no arguments.'''
     permission = 'authenticated'
     css_name = None
+    cache_timeout = 0
+    '''Number of seconds the rendered plugin is kept in the site fragment
+cache. Cacheable plugins must add their media via the :meth:`media` method
+rather than during rendering.
+
+Default: ``0``, the plugin is rendered at every request.'''
 
     def js(self, **kwargs):
         '''Function which can be used to inject javascript dynamically.'''
@@ -187,6 +193,18 @@ parameters if :attr:`form` is set. By default do nothing.
     def edit_url(self, request, args = None):
         return None
 
+    def cache_vary(self, request, block):
+        '''Return a value which, together with the block and the plugin
+arguments, identifies the rendered fragment when :attr:`cache_timeout` is
+positive. Override for plugins depending on the user or on the page instance,
+for example::
+
+    def cache_vary(self, request, block):
+        return request.user.id if request.user else None
+
+By default it returns ``None``.'''
+        return None
+
     def render(self, request, **kwargs):
         '''Render the plugin. It returns a safe string to be included in the
  HTML page. This is the function subclasses need to implement.
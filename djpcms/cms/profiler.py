@@ -1,24 +1,40 @@
-import sys
+'''Profile requests with cProfile.
+
+A request is profiled when the ``PROFILING_KEY`` setting is in its query
+string. The value of the key is a comma separated list of options:
+
+* a positive integer ``N`` profiles ``N`` requests to the same path, with
+  the same options, and merges their statistics. The report is returned by
+  the last of them, the other requests are served as usual.
+* ``json`` returns the report as JSON rather than as an html page.
+
+For example, if ``PROFILING_KEY`` is ``prof``, ten requests to
+``/blog/?prof=10,json`` profile ``/blog/``. Requests without the key are
+never profiled. A session which does not receive its ``N`` requests within
+``PROFILING_TIMEOUT`` seconds is discarded.
+
+The statistics are read from :attr:`pstats.Stats.stats` and aggregated by
+application, module file and function. When the ``PROFILING_DIRECTORY``
+setting is available, the merged statistics are also saved there as a
+``.prof`` file which can be loaded by :mod:`pstats`.
+'''
 import os
 import re
-import tempfile
+import time
+import json
 import cProfile as profiler
 import pstats
-from io import StringIO
+from threading import Lock
+from operator import itemgetter
 
 from djpcms.html import Pagination, Widget, tabs, html_doc_stream
-from djpcms.utils.httpurl import ispy3k, to_bytes
+from djpcms.utils.httpurl import iteritems, to_bytes
+from djpcms.utils.text import slugify
 
-if ispy3k:
-    from io import StringIO as Stream
-else:
-    from io import BytesIO as Stream
-
-words_re = re.compile( r'\s+' )
-line_func = re.compile(r'(?P<line>\d+)\((?P<func>\w+)\)')
-
-group_prefix_re = None
+__all__ = ['ProfileSession', 'profile_session', 'profile_data',
+           'profile_generator']
 
+OTHER = 'other'
 
 profile_table1 = Pagination(('calls','totcalls','tottime','percall','cumtime',
                              'percall','module', 'filename','lineno','function'),
@@ -34,183 +50,280 @@ profile_table3 = Pagination(('module','filename','time','cumtime'),
                             sortable = True,
                             html_data = {'options':{'sDom':'t'}})
 
+_groups = {}
+_sessions = {}
+_lock = Lock()
 
-class mod_helper(object):
-
-    def __init__(self, app = None):
-        self.app = app
-
-    def __call__(self, res):
-        app = self.app
-        res = res.groups()
-        if app:
-            bits = res[0]
-        else:
-            app,bits = res
-        return app,bits
-
-
-
-def add_app_group(app,apps,groupre):
-    app = app.split('.')[0]
-    if app not in apps:
-        rex = "^.*/" + app + "/(.*)"
-        groupre.append((mod_helper(app),re.compile(rex)))
-        apps.add(app)
 
-
-def group_prefix(settings):
-    '''Loop over applications so that we can group them during profiling'''
-    global group_prefix_re
-    if group_prefix_re is None:
-        group_prefix_re = []
+class ModuleGroups(object):
+    '''Map the file name of a profiled function into a two elements tuple
+containing the application, or site-packages module, and the file name
+relative to it. Matches are cached by file name.'''
+    def __init__(self, installed_apps):
+        self.rules = []
         apps = set()
         deferred = ['jinja2']
-        for app in settings.INSTALLED_APPS:
+        for app in installed_apps:
             if app == 'djpcms':
                 deferred.append(app)
-                continue
-            add_app_group(app,apps,group_prefix_re)
+            else:
+                self.add_app(app, apps)
         for app in deferred:
-            add_app_group(app,apps,group_prefix_re)
-
-        # module in site_packages
+            self.add_app(app, apps)
         for rex in ("^.*/site-packages/(\w+)/(.*)",
                     "^.*/dist-packages/(\w+)/(.*)"):
-            group_prefix_re.append((mod_helper(),re.compile(rex)))
-    return group_prefix_re
-
-
-def get_group(filename,settings):
-    for func,rex in group_prefix(settings):
+            self.rules.append((None, re.compile(rex)))
+        self.cache = {}
+
+    def add_app(self, app, apps):
+        app = app.split('.')[0]
+        if app not in apps:
+            self.rules.append((app, re.compile("^.*/" + app + "/(.*)")))
+            apps.add(app)
+
+    def __call__(self, filename):
+        group = self.cache.get(filename)
+        if group is None:
+            group = self.cache[filename] = self.match(filename)
+        return group
+
+    def match(self, filename):
         filename = filename.replace('\\','/')
-        x = rex.match(filename)
-        if x:
-            return func(x)
-
-
-def summary_for_files(stats_str, mygroups, sum, sumc, settings):
-    other = 'other'
-    for fields in stats_str:
-        ncalls = fields[1].split('/')
-        tcalls,ncalls = int(ncalls[0]),int(ncalls[-1])
-        time = float(fields[2])
-        percall = float(fields[3])
-        cumtime = float(fields[4])
-        percall2 = float(fields[5])
-        filename = fields[6]
-        filenames = filename.split(':')
-        linefunc = filenames.pop()
-        match = line_func.match(linefunc)
-        if match:
-            lineno,func = match.groups()
-            filename = ''.join(filenames)
-            filename = filename.replace('\\','/')
-            mod,filename = get_group(filename,settings) or (other,filename)
-        else:
-            mod,lineno,func = other,'',''
-        sum += time
-        sumc += cumtime
-
-        if not mod in mygroups:
-            mygroups[mod] = {'time':0,
-                             'cumtime':0,
-                             'files':{}}
-        g = mygroups[mod]
-        g['time'] += time
-        g['cumtime'] += cumtime
-        files = g['files']
-        if not filename in files:
-            files[filename] = {'time':0,
-                               'cumtime':0}
-        files[filename]['time'] += time
-        files[filename]['cumtime'] += cumtime
-
-        yield ncalls,tcalls,time,percall,cumtime,percall2,mod,filename,\
-                lineno,func
-
-
-def make_stat_table(request, stats_str):
-    groups = {}
-    sum = 0
-    sumc = 0
+        for app, rex in self.rules:
+            m = rex.match(filename)
+            if m:
+                return (app, m.group(1)) if app else m.groups()
+        return OTHER, filename
+
+
+def module_groups(settings):
+    '''The :class:`ModuleGroups` for the ``INSTALLED_APPS`` of *settings*.'''
+    apps = tuple(settings.get('INSTALLED_APPS', ()))
+    groups = _groups.get(apps)
+    if groups is None:
+        groups = _groups[apps] = ModuleGroups(apps)
+    return groups
+
+
+def function_stats(stats, groups):
+    '''Generator of dictionaries with the statistics of each function in
+*stats*, a :class:`pstats.Stats` instance.'''
+    for (filename, lineno, func), (cc, nc, tt, ct, callers) in\
+            iteritems(stats.stats):
+        module, filename = groups(filename)
+        yield {'module': module,
+               'filename': filename,
+               'lineno': lineno,
+               'function': func,
+               'calls': cc,
+               'totcalls': nc,
+               'tottime': tt,
+               'percall': tt/nc if nc else 0,
+               'cumtime': ct,
+               'cumpercall': ct/cc if cc else 0}
+
+
+def aggregate(functions):
+    '''Aggregate *functions* statistics by module and by file. Return a two
+elements tuple of lists of dictionaries.'''
+    modules, files = {}, {}
+    for f in functions:
+        key = f['module']
+        m = modules.get(key)
+        if m is None:
+            m = modules[key] = {'module': key, 'time': 0, 'cumtime': 0}
+        m['time'] += f['tottime']
+        m['cumtime'] += f['cumtime']
+        key = key, f['filename']
+        m = files.get(key)
+        if m is None:
+            m = files[key] = {'module': key[0], 'filename': key[1],
+                              'time': 0, 'cumtime': 0}
+        m['time'] += f['tottime']
+        m['cumtime'] += f['cumtime']
+    bytime = itemgetter('time')
+    return (sorted(modules.values(), key=bytime, reverse=True),
+            sorted(files.values(), key=bytime, reverse=True))
+
+
+def profile_data(stats, settings, limit=None, sortby='tottime'):
+    '''A JSON serializable dictionary with the statistics of *stats*
+aggregated by function, module and file.
+
+:parameter limit: optional maximum number of functions returned. Modules and
+    files are always aggregated over all functions.
+:parameter sortby: function statistics used to sort functions.
+'''
+    functions = sorted(function_stats(stats, module_groups(settings)),
+                       key=itemgetter(sortby), reverse=True)
+    modules, files = aggregate(functions)
+    return {'total_calls': stats.total_calls,
+            'primitive_calls': stats.prim_calls,
+            'total_time': stats.total_tt,
+            'functions': functions[:limit] if limit else functions,
+            'modules': modules,
+            'files': files}
+
+
+class ProfileSession(object):
+    '''Profile and merge the statistics of :attr:`requests` consecutive
+requests.
+
+.. attribute:: stats
+
+    The merged :class:`pstats.Stats` or ``None``.
+'''
+    def __init__(self, path, requests=1, format='html', key=None):
+        self.path = path
+        self.key = key or path
+        self.requests = max(requests, 1)
+        self.format = format
+        self.created = time.time()
+        self.started = 0
+        self.profiled = 0
+        self.stats = None
+        self._lock = Lock()
+
+    def start(self):
+        '''Reserve a request and return ``True`` if it is the last of the
+session.'''
+        with self._lock:
+            self.started += 1
+            return self.started == self.requests
+
+    def run(self, callback):
+        '''Profile *callback* and merge its statistics.'''
+        prof = profiler.Profile()
+        result = prof.runcall(callback)
+        with self._lock:
+            if self.stats is None:
+                self.stats = pstats.Stats(prof)
+            else:
+                self.stats.add(prof)
+            self.profiled += 1
+        return result
+
+    def expired(self, timeout):
+        return bool(timeout) and time.time() - self.created > timeout
+
+    def save(self, directory):
+        '''Save the merged statistics in *directory* and return the file
+name.'''
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+        name = '%s-%s.prof' % (time.strftime('%Y%m%d-%H%M%S'),
+                               slugify(self.path) or 'root')
+        fullpath = os.path.join(directory, name)
+        self.stats.dump_stats(fullpath)
+        return fullpath
+
+
+def profile_session(request, settings):
+    '''The :class:`ProfileSession` profiling *request* or ``None`` if
+*request* does not carry the ``PROFILING_KEY``. Requests to the same path with
+the same options join the same session.'''
+    PK = settings.get('PROFILING_KEY')
+    if not PK or PK not in request.GET:
+        return None
+    options = request.GET.get(PK) or ''
+    if isinstance(options, list):
+        options = ','.join(options)
+    requests, format = 1, 'html'
+    for option in options.split(','):
+        option = option.strip().lower()
+        if option.isdigit():
+            requests = int(option)
+        elif option:
+            format = option
+    path = request.path
+    session = ProfileSession(path, requests, format,
+                             key='%s?%s' % (path, options))
+    if session.requests > 1:
+        timeout = settings.get('PROFILING_TIMEOUT')
+        with _lock:
+            for key, s in list(_sessions.items()):
+                if s.expired(timeout):
+                    _sessions.pop(key)
+            session = _sessions.setdefault(session.key, session)
+    return session
+
+
+def make_stat_table(request, data):
+    data1 = [(f['calls'], f['totcalls'], f['tottime'], f['percall'],
+              f['cumtime'], f['cumpercall'], f['module'], f['filename'],
+              f['lineno'], f['function']) for f in data['functions']]
+    data2 = [(m['module'], m['time'], m['cumtime']) for m in data['modules']]
+    data3 = [(m['module'], m['filename'], m['time'], m['cumtime'])\
+             for m in data['files']]
+    return (('global', profile_table1.widget(data1).render(request)),
+            ('modules', profile_table2.widget(data2).render(request)),
+            ('files', profile_table3.widget(data3).render(request)))
+
+
+def make_header(data):
+    yield '<p>{0} requests</p>'.format(data['requests'])
+    yield '<p>{0} function calls ({1} primitive calls) in {2:.3f} seconds</p>'\
+            .format(data['total_calls'], data['primitive_calls'],
+                    data['total_time'])
+    if data.get('file'):
+        yield '<p>{0}</p>'.format(data['file'])
+
+
+def profile_report(request, session, Response):
+    '''The :class:`Response` with the report of *session*.'''
     settings = request.settings
-    data1 = list(summary_for_files(stats_str, groups, sum, sumc, settings))
-    table1 = profile_table1.widget(data1)
-
-    data2 = []
-    data3 = []
-    for mod,val in groups.items():
-        data2.append((mod,val['time'],val['cumtime']))
-        for filename,ft in val['files'].items():
-            data3.append((mod,filename,ft['time'],ft['cumtime']))
-    table2 = profile_table2.widget(data2)
-    table3 = profile_table3.widget(data3)
-    return (('global',table1.render(request)),
-            ('modules',table2.render(request)),
-            ('files',table3.render(request)))
-
-
-def data_stream(lines, num = None):
-    if num:
-        lines = lines[:num]
-    for line in lines:
-        if not line:
-            continue
-        fields = words_re.split(line)
-        if len(fields) == 7:
-            try:
-                time = float(fields[2])
-            except:
-                continue
-            yield fields
-
-
-def make_header(headers):
-    for h in headers:
-        if h:
-            yield '<p>{0}</p>'.format(h)
-
-def profile(request, callback, Response):
-    tmp = tempfile.mktemp()
-    out = Stream()
-    prof = profiler.Profile()
-    response = prof.runcall(callback)
-    prof.dump_stats(tmp)
-    stats = pstats.Stats(tmp, stream=out)
-    #stats.strip_dirs()          # Must happen prior to sort_stats
-    stats.sort_stats('time', 'calls')
-    stats.print_stats()
-    stats_str = out.getvalue()
-    os.unlink(tmp)
-    stats_str = stats_str.split('\n')
-    headers = '\n'.join(make_header(stats_str[:4]))
-    data = data_stream(stats_str[6:],100)
-    tables = make_stat_table(request, data)
-    w = Widget(cn = 'profiler')
-    w.add(Widget('div', headers, cn = 'legend'))
-    w.add(tabs(tables))
-    content = w.render(request)
-    return to_bytes('\n'.join(html_doc_stream(request, content, 200)))
+    json_format = session.format == 'json'
+    data = profile_data(session.stats, settings,
+                        limit=None if json_format else 100)
+    data['requests'] = session.profiled
+    directory = settings.get('PROFILING_DIRECTORY')
+    if directory:
+        data['file'] = session.save(directory)
+    if json_format:
+        content = json.dumps(data)
+        content_type = 'application/json'
+    else:
+        w = Widget(cn = 'profiler')
+        w.add(Widget('div', '\n'.join(make_header(data)), cn = 'legend'))
+        w.add(tabs(make_stat_table(request, data)))
+        content = '\n'.join(html_doc_stream(request, w.render(request), 200))
+        content_type = 'text/html'
+    return Response(content=to_bytes(content), content_type=content_type,
+                    encoding='utf-8')
+
+
+def start_response_ignored(status, response_headers, exc_info=None):
+    pass
 
 
 class profile_generator(object):
-
-    def __init__(self, request, gen, Response):
+    '''Wrap the response generator *gen* of a profiled *request*. When
+*start_response* is given, the request is the last of *session* and the
+profile report is returned in place of the response, whose generator must be
+created with :func:`start_response_ignored`.'''
+    def __init__(self, request, gen, Response, session, start_response=None):
         self.request = request
         self.gen = gen
         self.Response = Response
+        self.session = session
+        self.start_response = start_response
 
     def __iter__(self):
-        yield profile(self.request, self.generate, self.Response)
+        session = self.session
+        data = session.run(self.generate)
+        if self.start_response is not None:
+            with _lock:
+                if _sessions.get(session.key) is session:
+                    _sessions.pop(session.key)
+            response = profile_report(self.request, session, self.Response)
+            for c in response(self.gen.environ, self.start_response):
+                yield c
+        else:
+            for d in data:
+                yield d
 
     def generate(self):
         data = []
         for d in self.gen:
             data.append(d)
         return data
-
-
-
-
-
@@ -5,13 +5,14 @@ import time
 from inspect import isclass
 from functools import partial
 from datetime import datetime, timedelta
+from timeit import default_timer
 
 # IMPORT PULSAR STUFF
 from pulsar.apps.wsgi import WsgiResponse, WsgiHandler, WsgiResponseGenerator
 
 from djpcms import media, is_renderer
 from djpcms.cms import permissions
-from djpcms.html import html_doc_stream
+from djpcms.html import html_doc_stream, Widget, classes, error_title
 from djpcms.utils.async import is_async, async, maybe_async, is_failure,\
                                 safe_async, as_failure
 from djpcms.utils.decorators import lazyproperty, lazymethod
@@ -23,11 +24,19 @@ from djpcms.utils.httpurl import parse_cookie, BytesIO, urljoin,\
                                  iri_to_uri, parse_form_data,\
                                  has_empty_content
 
-from .tree import DjpcmsTree, BadNode
-from .profiler import profile_generator
+from .tree import BadNode
+from .profiler import profile_session, profile_generator,\
+                      start_response_ignored
+from .timing import RequestTimer
 from .exceptions import *
 
 absolute_http_url_re = re.compile(r"^https?://", re.I)
+logger = logging.getLogger('djpcms.request')
+# Html id of the element appended to a streamed page which failed to render
+STREAM_ERROR_ID = 'djpcms-stream-error'
+stream_error_html = "<div id='%s' class='%s'>%s</div>" % (STREAM_ERROR_ID,
+                                                          classes.error,
+                                                          error_title(500))
 
 __all__ = ['Response', 'Request', 'is_xhr']
 
@@ -92,6 +101,21 @@ def build_request(environ, node, cache, instance):
     return request
 
 
+def permission_key(code, instance=None, model=None, user=None):
+    '''The key of a permission check in the :class:`RequestCache` or
+``None`` if the check can't be cached because *instance* has no id.'''
+    instance_key = None
+    if instance is not None:
+        iid = getattr(instance, 'id', None)
+        if iid is None:
+            return None
+        instance_key = (instance.__class__, iid)
+    user_key = None
+    if user is not None:
+        user_key = (user.__class__, getattr(user, 'id', None))
+    return (code, model, instance_key, user_key)
+
+
 class RequestCache(dict):
 
     def __init__(self, request):
@@ -99,6 +123,42 @@ class RequestCache(dict):
         super(RequestCache, self).__init__({'REQUESTS': r})
         self.request = request
         self.traces = []
+        self.permissions = {}
+
+    def has_permission(self, handler, request, code, instance=None,
+                       model=None, user=None):
+        '''Memoised version of the :meth:`PermissionHandler.has` method of
+*handler*. Decisions are stored for the lifetime of the request.'''
+        key = permission_key(code, instance, model, user)
+        if key is not None and key in self.permissions:
+            return self.permissions[key]
+        result = handler.has(request, code, instance, model, user)
+        if key is not None and not is_async(result):
+            self.permissions[key] = result
+        return result
+
+    def has_permissions(self, handler, request, code, instances, model=None,
+                        user=None):
+        '''Check permissions for several *instances* with a single call to
+:meth:`PermissionHandler.has_many` for the decisions not yet in the cache.
+Return a list of decisions, one for each instance.'''
+        keys = [permission_key(code, instance, model, user)\
+                for instance in instances]
+        missing = [(key, instance) for key, instance in zip(keys, instances)\
+                   if key is None or key not in self.permissions]
+        decisions = {}
+        if missing:
+            result = handler.has_many(request, code,
+                                      [instance for _, instance in missing],
+                                      model, user)
+            if is_async(result):
+                return result
+            for (key, instance), value in zip(missing, result):
+                decisions[id(instance)] = value
+                if key is not None:
+                    self.permissions[key] = value
+        return [self.permissions[key] if key is not None else\
+                decisions[id(instance)] for key, instance in zip(keys, instances)]
 
     @property
     def view(self):
@@ -462,7 +522,17 @@ required.'''
 
     @lazymethod
     def auth_children(self):
-        return tuple((c for c in self.children() if c.has_permission()))
+        children = self.children()
+        # Check the view permission of children pages in one go
+        Page = self.view.Page
+        if Page and children:
+            pages = [c.closest_page for c in children]
+            pages = [p for p in pages if p is not None]
+            if pages:
+                self.cache.has_permissions(self.view.permissions, self,
+                                           permissions.VIEW, pages,
+                                           Page.model, self.user)
+        return tuple((c for c in children if c.has_permission()))
 
     def render(self, **kwargs):
         '''\
@@ -575,26 +645,39 @@ class DjpcmsResponseGenerator(WsgiResponseGenerator, RequestMiddleware):
     def __init__(self, website, environ, start_response):
         super(DjpcmsResponseGenerator, self).__init__(environ, start_response)
         RequestMiddleware.__init__(self, website)
+        self.timer = RequestTimer()
 
     def __iter__(self):
+        timer = self.timer
+        timing = self.site.timing
+        with timer('cache'):
+            response = self.cached_response()
+        if response is not None:
+            timing.add_header(response, timer)
+            for c in self.start(response):
+                yield c
+            return
         path = self.environ.get('PATH_INFO','/')
-        tree = maybe_async(safe_async(self.page_tree))
-        while is_async(tree):
-            yield b''
-            tree = maybe_async(tree)
+        with timer('page_tree'):
+            tree = maybe_async(safe_async(self.page_tree))
+            while is_async(tree):
+                yield b''
+                tree = maybe_async(tree)
         if is_failure(tree):
             request = self.bad_request(tree, route=path)
         else:
             try:
-                node = tree.resolve(path)
+                with timer('resolve'):
+                    node = tree.resolve(path)
             except Exception as e:
                 request = self.bad_request(as_failure(e), tree=tree)
             else:
-                request = maybe_async(safe_async(make_request,
-                                                 (self.environ, node)))
-                while is_async(request):
-                    yield b''
-                    request = maybe_async(request)
+                with timer('request'):
+                    request = maybe_async(safe_async(make_request,
+                                                     (self.environ, node)))
+                    while is_async(request):
+                        yield b''
+                        request = maybe_async(request)
                 if is_failure(request):
                     request = self.bad_request(request, node=node)
         for processor in self.site.request_processors:
@@ -606,33 +689,42 @@ class DjpcmsResponseGenerator(WsgiResponseGenerator, RequestMiddleware):
             if response is not None:
                 break
             yield b''
+        timing.add_header(response, timer)
         for c in self.start(response):
             yield c
+        timing.record(request, timer)
 
     def response(self, request):
         '''Generate the Response'''
         self.content_type, response = request.content_type, None
+        timer = self.timer
         if not request.exc_info:
             try:
                 if request.method not in request.methods():
                     raise HttpException(status=405)
-                perm = maybe_async(request.has_permission())
-                while is_async(perm):
-                    yield None
-                    perm = maybe_async(perm)
+                with timer('permission'):
+                    perm = maybe_async(request.has_permission())
+                    while is_async(perm):
+                        yield None
+                        perm = maybe_async(perm)
                 if is_failure(perm):
                     request.exc_info = perm.trace
                 elif not perm:
                     raise PermissionDenied()
                 else:
-                    content = request.view(request)
+                    with timer('view'):
+                        content = request.view(request)
             except Exception as e:
                 request.exc_info = sys.exc_info()
         if request.exc_info is None:
-            content = self.safe_render(request, content)
-            while is_async(content):
-                yield
-                content = self.safe_render(request, content)
+            stream = self.stream_html(request)
+            with timer('render'):
+                content = self.safe_render(request, content, stream)
+                while is_async(content):
+                    waited = default_timer()
+                    yield
+                    timer.add('wait', default_timer() - waited)
+                    content = self.safe_render(request, content, stream)
             if is_failure(content):
                 request.exc_info = content.trace
                 content = b''
@@ -644,20 +736,41 @@ class DjpcmsResponseGenerator(WsgiResponseGenerator, RequestMiddleware):
                                 encoding=request.encoding)
             if request.exc_info is not None:
                 content = self.website.handle_error(request, response)
-            if response.content_type == 'text/html' and not request.is_xhr:
-                content = '\n'.join(html_doc_stream(request, content,
-                                                    response.status_code))
-            response.content = (to_bytes(content, response.encoding),)
+            if isinstance(content, Widget):
+                response.content = self.html_stream(request, content,
+                                                    response.status_code,
+                                                    response.encoding)
+            else:
+                if response.content_type == 'text/html' and\
+                        not request.is_xhr:
+                    with timer('html'):
+                        content = '\n'.join(html_doc_stream(
+                                                request, content,
+                                                response.status_code))
+                response.content = (to_bytes(content, response.encoding),)
         yield self.cache(request, response)
 
     def cache(self, request, response):
-        '''Apply cache control headers of successful non ajax GET requests'''
+        '''Apply cache control headers of successful non ajax GET requests
+and store the response in the site cache handler if the view allows it.'''
         if request.method == 'get' and response.status_code == 200 and\
                 not request.is_xhr:
-            cache_control = request.view.get_cache_control()
+            view = request.view
+            cache_control = view.get_cache_control()
             if cache_control:
                 cache_control(response.headers)
+            handler = view.cache_handler
+            if handler is not None and not request.cache.traces:
+                handler.set_response(request, response,
+                                     view.get_cache_timeout())
         return response
+
+    def cached_response(self):
+        '''Return a response from the site cache handler if available.'''
+        handler = self.site.cache_handler
+        if handler is not None:
+            request = get_request(self.environ)
+            return handler.get_response(request, Response)
         
     def bad_request(self, failure, tree=None, node=None, route=None):
         exc_info = failure.trace
@@ -670,28 +783,63 @@ class DjpcmsResponseGenerator(WsgiResponseGenerator, RequestMiddleware):
         return request
 
     def page_tree(self):
-        site = self.site
-        Page = site.Page
-        tree = site.tree
-        if Page:
-            pages = Page.query().all()
-            if is_async(pages):
-                return pages.add_callback(lambda pg: DjpcmsTree(tree, pg))
-            else:
-                return DjpcmsTree(tree, pages)
-        else:
-            return DjpcmsTree(tree)
+        return self.site.page_tree()
 
-    def safe_render(self, request, content):
+    def safe_render(self, request, content, stream=False):
         content = maybe_async(content)
         try:
             if is_renderer(content):
                 self.content_type = content.content_type()
-                content = maybe_async(content.render(request))
+                if not (stream and isinstance(content, Widget) and
+                        self.content_type == 'text/html'):
+                    content = maybe_async(content.render(request))
             return content
         except Exception as e:
             return as_failure(e)
 
+    def stream_html(self, request):
+        '''``True`` if the html document is streamed to the client as its
+widgets are rendered rather than joined in memory. Controlled by the
+``HTML_STREAMING`` setting.'''
+        return bool(request.view.settings.get('HTML_STREAMING')) and\
+                not request.is_xhr
+
+    def html_stream(self, request, widget, status_code, encoding):
+        '''Generator of encoded chunks of the html document containing
+*widget*. The head is yielded before the widget is rendered and, since the
+response has no content length, the server uses a chunked transfer encoding.
+Style sheets added by widgets after the head was sent are linked at the end
+of the body.
+
+The status code can't be changed once the head is sent. An error in the
+middle of the stream is logged, an error element with the
+:data:`STREAM_ERROR_ID` id is yielded and the exception is raised again, so
+that the server drops the connection without terminating the chunked
+response and the client can tell the page is incomplete.'''
+        error = None
+        try:
+            for chunk in html_doc_stream(request, widget.stream(request),
+                                         status_code):
+                chunk = maybe_async(chunk)
+                while is_async(chunk):
+                    yield b''
+                    chunk = maybe_async(chunk)
+                if is_failure(chunk):
+                    chunk.log()
+                    error = chunk.trace[1]
+                    break
+                elif chunk is not None:
+                    if not isinstance(chunk, bytes):
+                        chunk = to_bytes('%s' % chunk, encoding)
+                    yield chunk
+        except Exception as e:
+            logger.error('Error while streaming %s' % request, exc_info=True,
+                         extra={'request': request})
+            error = e
+        if error is not None:
+            yield to_bytes(stream_error_html, encoding)
+            raise error
+
 
 class request_start_middleware(RequestMiddleware):
 
@@ -715,9 +863,15 @@ class request_end_middleware(RequestMiddleware):
     def __call__(self, environ, start_response):
         settings = self.site.settings
         request = get_request(environ, settings.DEFAULT_CHARSET)
-        query = request.GET
-        PK = settings.get('PROFILING_KEY')
-        g = DjpcmsResponseGenerator(self.website, environ, start_response)
-        if PK and PK in query:
-            g = profile_generator(request, g, Response)
-        return g
+        session = profile_session(request, settings)
+        if session is None:
+            return DjpcmsResponseGenerator(self.website, environ,
+                                           start_response)
+        elif session.start():
+            g = DjpcmsResponseGenerator(self.website, environ,
+                                        start_response_ignored)
+            return profile_generator(request, g, Response, session,
+                                     start_response)
+        else:
+            g = DjpcmsResponseGenerator(self.website, environ, start_response)
+            return profile_generator(request, g, Response, session)
@@ -1,13 +1,16 @@
 import os
 import sys
+import time
 import logging
 import traceback
 from inspect import isclass
 from copy import copy
+from functools import partial
 
 from djpcms import is_renderer, ajax
-from djpcms.utils import orms
+from djpcms.utils import orms, markups
 from djpcms.html import layout, Widget, error_title, classes, html_trace
+from djpcms.utils.async import is_async
 from djpcms.utils.decorators import lazyproperty
 from djpcms.utils.text import escape
 from djpcms.utils.httpurl import iteritems, itervalues, native_str, iri_to_uri,\
@@ -21,10 +24,12 @@ from .conf import Config
 from .request import request_start_middleware, request_end_middleware,\
                      WsgiHandler
 from .exceptions import *
+from .tree import DjpcmsTree
 from .urlresolvers import ResolverMixin
 from .management import find_commands
 from .permissions import PermissionHandler, SimpleRobots
 from .cache import CacheHandler
+from .timing import TimingHandler
 from .views import ViewRenderer
 from .submit import SubmitDataMiddleware
 
@@ -85,7 +90,8 @@ Default ``None``
 
 DEFAULT_SITE_HANDLERS = {
     'meta_robots': SimpleRobots,
-    'cache': CacheHandler()
+    'cache': CacheHandler,
+    'timing': TimingHandler
 }
 
 
@@ -192,6 +198,62 @@ Attributes available:
     def _site(self):
         return self
 
+    def on_bound(self):
+        if self.is_root:
+            cache = self.settings.get('PAGE_TREE_CACHE', True)
+            Page = self.Page
+            if cache and Page:
+                register = getattr(Page.model, 'register_tree_update', None)
+                cache = bool(register and register(self.invalidate_page_tree))
+            self.local['page_tree_cache'] = cache
+            self._build_model_index()
+            preload = self.settings.get('MARKUP_PRELOAD')
+            if preload:
+                markups.load(*preload)
+
+    def page_tree(self):
+        '''Return the :class:`djpcms.cms.tree.DjpcmsTree` for the root site,
+including flat pages when a :attr:`Page` model is available.
+
+The tree is built once and reused across requests until
+:meth:`invalidate_page_tree` is called, which happens when :attr:`Page`
+instances are saved or deleted. It may return an asynchronous result.'''
+        if not self.is_root:
+            return self.root.page_tree()
+        version = self.local.get('page_tree_version', 0)
+        cached = self.local.get('page_tree')
+        if cached is not None and cached[0] == version and\
+                (not cached[2] or cached[2] > time.time()):
+            return cached[1]
+        Page = self.Page
+        pages = None
+        if Page:
+            pages = Page.query().all()
+            if is_async(pages):
+                return pages.add_callback(partial(self._build_page_tree,
+                                                  version))
+        return self._build_page_tree(version, pages)
+
+    def invalidate_page_tree(self, *args, **kwargs):
+        '''Invalidate the cached page tree by bumping the page table
+version. It accepts any positional and key-valued parameters so that it can be
+used directly as a signal receiver.'''
+        root = self.root
+        root.local['page_tree_version'] = \
+                                root.local.get('page_tree_version', 0) + 1
+        cached = root.local.pop('page_tree', None)
+        if cached is not None:
+            cached[1].clear_cache()
+
+    def _build_page_tree(self, version, pages):
+        cache = bool(self.local.get('page_tree_cache'))
+        tree = DjpcmsTree(self.tree, pages, cache=cache)
+        if cache:
+            timeout = self.settings.get('PAGE_TREE_TIMEOUT')
+            expiry = time.time() + timeout if timeout else None
+            self.local['page_tree'] = (version, tree, expiry)
+        return tree
+
     def addsite(self, settings=None, route=None, APPLICATION_URLS=None,
                 **handlers):
         '''Add a new :class:`Site` to ``self``.
@@ -215,7 +277,13 @@ Attributes available:
         '''Obtain a :class:`Application` for model *model*.
 If the application is not available, it returns ``None``. It never fails.
 If *all* is set to ``True`` it returns a list of all the :class:`Application`
-for that model.'''
+for that model. *start* is ignored and kept for backward compatibility.
+
+The application registered with this site is returned first, followed by the
+applications of children sites, depth first, and, when *all* is ``True``, by
+the applications of the parent site. Lookups use the index built by
+:meth:`_build_model_index` when the root site is loaded or, if the site is
+not loaded, at the first lookup.'''
         if not model:
             return
         if hasattr(model, 'model'):
@@ -223,27 +291,12 @@ for that model.'''
         mapper = orms.mapper(model)
         if not mapper:
             return None
-        model = mapper.model
-        app = self._model_registry.get(model)
-        if not app or all:
-            apps = [app] if app is not None else []
-            for site in self:
-                if not isinstance(site,Site):
-                    break
-                app = site.for_model(model,all)
-                if app is not None:
-                    if all:
-                        apps.extend(app)
-                    else:
-                        return app
-            if all:
-                if start and self.parent:
-                    for a in self.parent.for_model(model,all=True,start=False):
-                        if a not in apps:
-                            apps.append(a)
-                return apps
-        else:
-            return app
+        index = self.local.get('model_index')
+        if index is None:
+            self.root._build_model_index()
+            index = self.local.get('model_index', {})
+        first, apps = index.get(mapper.model, (None, ()))
+        return list(apps) if all else first
 
     def for_hash(self, model_hash, safe = True, all = False):
         '''Obtain a :class:`Application` for model
@@ -296,6 +349,40 @@ consequently its children.'''
                     pass # No management module
         return self._commands
 
+    def _model_applications(self):
+        # Dictionary of models to the list of applications registered with
+        # this site and, depth first, with its children sites.
+        apps = dict(((m, [a]) for m, a in iteritems(self._model_registry)))
+        for site in self:
+            if not isinstance(site, Site):
+                break
+            for model, sapps in iteritems(site._model_applications()):
+                target = apps.setdefault(model, [])
+                target.extend((a for a in sapps if a not in target))
+        return apps
+
+    def _build_model_index(self, parent_apps=None):
+        '''Build the index used by :meth:`for_model` for this site and its
+children sites. It maps models to a two elements tuple containing the first
+application found and the list of all applications for the model.'''
+        apps = self._model_applications()
+        index = dict(((m, (a[0], a)) for m, a in iteritems(apps)))
+        if parent_apps:
+            for model, papps in iteritems(parent_apps):
+                first, all = index.get(model, (None, []))
+                index[model] = (first,
+                                all + [a for a in papps if a not in all])
+        self.local['model_index'] = index
+        for site in self:
+            if isinstance(site, Site):
+                site._build_model_index(apps)
+
+    def _clear_model_index(self):
+        self.local.pop('model_index', None)
+        for site in self:
+            if isinstance(site, Site):
+                site._clear_model_index()
+
     def register_app(self, application):
         model = application.model
         if model:
@@ -303,6 +390,7 @@ consequently its children.'''
                 raise AlreadyRegistered('Model %s already registered\
  as application' % model)
             self._model_registry[model] = application
+            self.root._clear_model_index()
 
     def applications(self):
         sites = []
@@ -330,6 +418,9 @@ consequently its children.'''
         name = name.lower()
         if page is None:
             page = layout.page()
+        settings = self.settings
+        if settings is not None:
+            page.compile(settings.get('LAYOUT_GRID_SYSTEM'))
         self._page_layout_registry[name] = page
         return self
 
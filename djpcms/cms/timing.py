@@ -0,0 +1,201 @@
+'''Low overhead timing of the phases of a request.
+
+Each request handled by :class:`djpcms.cms.request.DjpcmsResponseGenerator`
+has a :class:`RequestTimer` which measures, using wall clock time, the phases
+of the response:
+
+* ``page_tree`` loading the page tree.
+* ``resolve`` resolving the path into a node of the tree.
+* ``request`` creating the :class:`djpcms.cms.Request`.
+* ``permission`` checking the view permission.
+* ``view`` calling the view.
+* ``render`` rendering the view content, including ``wait``.
+* ``wait`` the time spent waiting for asynchronous content.
+* ``html`` building the html document.
+
+The phases are sent to the client in the ``Server-Timing`` header when the
+``SERVER_TIMING`` setting is on. When the ``REQUEST_TIMING`` setting is on, the
+site ``timing`` handler, an instance of :class:`TimingHandler`, aggregates
+per-view histograms of response times in the process. Streamed html documents
+are built while the response is written, therefore their ``html`` phase is
+not in the header but it is part of the recorded total.
+'''
+from threading import Lock
+from timeit import default_timer
+
+__all__ = ['RequestTimer', 'ViewTiming', 'TimingHandler', 'TIMING_BUCKETS']
+
+# Upper bounds, in milliseconds, of the response time histogram buckets
+TIMING_BUCKETS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+
+
+class phase(object):
+    __slots__ = ('timer', 'name', 'start')
+
+    def __init__(self, timer, name):
+        self.timer = timer
+        self.name = name
+
+    def __enter__(self):
+        self.start = default_timer()
+        return self
+
+    def __exit__(self, type, value, traceback):
+        self.timer.add(self.name, default_timer() - self.start)
+
+
+class RequestTimer(object):
+    '''Collect the duration, in seconds, of the phases of a request. A phase
+entered more than once accumulates its durations::
+
+    timer = RequestTimer()
+    with timer('resolve'):
+        ...
+'''
+    def __init__(self):
+        self.start = default_timer()
+        self.phases = []
+        self.durations = {}
+
+    def __call__(self, name):
+        return phase(self, name)
+
+    def add(self, name, duration):
+        if name not in self.durations:
+            self.phases.append(name)
+            self.durations[name] = duration
+        else:
+            self.durations[name] += duration
+
+    def total(self):
+        '''The number of seconds since the timer was created.'''
+        return default_timer() - self.start
+
+    def items(self):
+        '''Iterator over ``(phase, duration)`` pairs in the order the phases
+were first entered.'''
+        durations = self.durations
+        for name in self.phases:
+            yield name, durations[name]
+
+    def header(self):
+        '''The value of the ``Server-Timing`` header, with durations in
+milliseconds and a ``total`` metric.'''
+        metrics = ['%s;dur=%.2f' % (name, 1000*d) for name, d in self.items()]
+        metrics.append('total;dur=%.2f' % (1000*self.total()))
+        return ', '.join(metrics)
+
+
+class ViewTiming(object):
+    '''Aggregated timings of a view.
+
+.. attribute:: count
+
+    Number of recorded requests.
+
+.. attribute:: histogram
+
+    List of request counts per bucket of :attr:`TimingHandler.buckets`. The
+    last element counts the requests slower than the last bucket.
+
+.. attribute:: phases
+
+    Dictionary of the total number of seconds spent in each phase.
+'''
+    def __init__(self, path, buckets):
+        self.path = path
+        self.buckets = buckets
+        self.count = 0
+        self.total = 0
+        self.max = 0
+        self.histogram = [0]*(len(buckets) + 1)
+        self.phases = {}
+
+    def add(self, timer, total):
+        self.count += 1
+        self.total += total
+        self.max = max(self.max, total)
+        ms = 1000*total
+        idx = 0
+        for bound in self.buckets:
+            if ms <= bound:
+                break
+            idx += 1
+        self.histogram[idx] += 1
+        phases = self.phases
+        for name, duration in timer.items():
+            phases[name] = phases.get(name, 0) + duration
+
+    @property
+    def mean(self):
+        return self.total/self.count if self.count else 0
+
+    def as_dict(self):
+        return {'path': self.path,
+                'count': self.count,
+                'total': self.total,
+                'mean': self.mean,
+                'max': self.max,
+                'histogram': list(self.histogram),
+                'phases': dict(self.phases)}
+
+
+class TimingHandler(object):
+    '''The site ``timing`` handler. It aggregates, in the process,
+:class:`ViewTiming` for each view path.
+
+.. attribute:: enabled
+
+    ``True`` if requests are recorded, from the ``REQUEST_TIMING`` setting.
+
+.. attribute:: header
+
+    ``True`` if the ``Server-Timing`` header is added to responses, from the
+    ``SERVER_TIMING`` setting.
+'''
+    def __init__(self, settings=None, enabled=None, header=None,
+                 buckets=None):
+        if settings is not None:
+            if enabled is None:
+                enabled = settings.get('REQUEST_TIMING')
+            if header is None:
+                header = settings.get('SERVER_TIMING')
+        self.enabled = bool(enabled)
+        self.header = bool(header)
+        self.buckets = tuple(buckets or TIMING_BUCKETS)
+        self._views = {}
+        self._lock = Lock()
+
+    def add_header(self, response, timer):
+        '''Add the ``Server-Timing`` header to *response* if :attr:`header`
+is on.'''
+        if self.header:
+            response.headers['Server-Timing'] = timer.header()
+
+    def record(self, request, timer):
+        '''Record the phases of *timer* for the view of *request*.'''
+        if not self.enabled:
+            return
+        total = timer.total()
+        path = request.view.path
+        with self._lock:
+            view = self._views.get(path)
+            if view is None:
+                view = ViewTiming(path, self.buckets)
+                self._views[path] = view
+            view.add(timer, total)
+
+    def get(self, path):
+        '''The :class:`ViewTiming` of the view at *path* or ``None``.'''
+        return self._views.get(path)
+
+    def stats(self, sortby='total'):
+        '''List of dictionaries with the aggregated timings of views, sorted
+in descending order by *sortby*.'''
+        with self._lock:
+            data = [view.as_dict() for view in self._views.values()]
+        return sorted(data, key=lambda d: d[sortby], reverse=True)
+
+    def clear(self):
+        with self._lock:
+            self._views.clear()
@@ -2,9 +2,10 @@ from copy import copy
 
 from djpcms.utils.httpurl import unquote_unreserved, itervalues
 from djpcms.utils.decorators import lazyproperty, lazymethod
+from djpcms.utils.structures import LRUCache
 from djpcms.utils.text import UnicodeMixin
 
-from .exceptions import Http404
+from .exceptions import Http404, HttpRedirect
 from .views import pageview
 
 
@@ -97,6 +98,24 @@ class NRT(dict):
                     if route.path in m:
                         node.parent = m[route.path]
                         break
+        # index nodes without a parent by the url bits of their parent route.
+        # When the parent route has variables, index the parent route and the
+        # node by the static bits preceding the first variable.
+        self._orphans = orphans = {}
+        self._dynamic_orphans = dynamic = {}
+        for node in sorted(itervalues(m), key = lambda x : x.level):
+            if node.level and node.parent is None:
+                route = node.route.split()[0]
+                prefix = []
+                for is_dynamic, bit in route.breadcrumbs:
+                    if is_dynamic:
+                        break
+                    prefix.append(bit)
+                prefix = tuple(prefix)
+                if len(prefix) == route.level:
+                    orphans.setdefault(prefix, []).append(node)
+                else:
+                    dynamic.setdefault(prefix, []).append((route, node))
         super(NRT,self).__init__(m)
         
     @property
@@ -105,6 +124,24 @@ class NRT(dict):
     
     def nodes(self):
         return itervalues(self)
+    
+    def orphans(self, bits):
+        '''List of nodes without a parent in the tree and with parent route
+matching the url with bits given by the tuple *bits*. Parent routes with
+variables are matched only when their static prefix is a prefix of *bits*.'''
+        nodes = self._orphans.get(bits, ())
+        if self._dynamic_orphans:
+            url = '/'.join(bits) + '/'
+            matched = []
+            for i in range(len(bits)):
+                for route, node in self._dynamic_orphans.get(bits[:i], ()):
+                    match = route.match(url)
+                    if match is not None and '__remaining__' not in match:
+                        matched.append(node)
+            if matched:
+                nodes = list(nodes)
+                nodes.extend(matched)
+        return nodes
         
 
 class MultiNode(UnicodeMixin):
@@ -163,9 +200,36 @@ class MultiNode(UnicodeMixin):
         return self.route.safe_url(self.__urlargs)
     
     
+def resolve_failure(e):
+    '''The exception class, positional and key-valued arguments needed to
+raise a new copy of the resolve failure *e*.'''
+    headers = list(e.headers) if e.headers else None
+    if isinstance(e, HttpRedirect):
+        return type(e), (dict(headers)['location'],), {'status': e.status}
+    return type(e), (str(e),), {'status': e.status, 'handler': e.handler,
+                                'strict': e.strict, 'headers': headers}
+
+
 class MultiTree(object):
-    '''handle multiple non-recombining tree'''
-    def __init__(self, *trees):
+    '''handle multiple non-recombining tree.
+
+.. attribute:: resolve_cache
+
+    A :class:`djpcms.utils.structures.LRUCache` of paths resolved by
+    :meth:`resolve`. Its size is given by the ``RESOLVE_CACHE_SIZE`` setting.
+
+.. attribute:: resolve_404_cache
+
+    A smaller :class:`djpcms.utils.structures.LRUCache` of paths which could
+    not be resolved, so that a scan of unknown urls cannot evict the
+    :attr:`resolve_cache`. Its size is given by the ``RESOLVE_404_CACHE_SIZE``
+    setting. It stores the data of the failure, a new exception is raised
+    for each request.
+
+Both caches are disabled when *cache* is ``False``, which is the case when
+the tree is rebuilt on every request.
+'''
+    def __init__(self, *trees, **kwargs):
         self.trees = trees
         self.site = None
         level = None
@@ -178,6 +242,12 @@ class MultiTree(object):
         if not self.site:
             raise ValueError('Critical. No sites')
         self.__level = level
+        settings = self.site.settings
+        cache = kwargs.get('cache', True)
+        self.resolve_cache = LRUCache(
+                    settings.get('RESOLVE_CACHE_SIZE', 0) if cache else 0)
+        self.resolve_404_cache = LRUCache(
+                    settings.get('RESOLVE_404_CACHE_SIZE', 0) if cache else 0)
         
     @property
     def level(self):
@@ -208,7 +278,28 @@ class MultiTree(object):
         '''Resolve the *path* on the multi tree. This is the main function
  of this class. It return an instance of :class:`MultiNode` if the *path*
  matches a node. Otherwise it raises a :class:`Http404` exception.'''
-        return self.node(*self.__resolve(path))
+        match = self.resolve_cache.get(path)
+        if match is None:
+            failure = self.resolve_404_cache.get(path)
+            if failure is not None:
+                cls, args, kwargs = failure
+                raise cls(*args, **kwargs)
+            try:
+                match = self.__resolve(path)
+            except (Http404, HttpRedirect) as e:
+                self.resolve_404_cache.set(path, resolve_failure(e))
+                raise
+            self.resolve_cache.set(path, match)
+        return self.node(*match)
+    
+    def clear_cache(self):
+        '''Clear the :attr:`resolve_cache` and :attr:`resolve_404_cache`.'''
+        self.resolve_cache.clear()
+        self.resolve_404_cache.clear()
+        
+    def cache_info(self):
+        return {'resolve': self.resolve_cache.info(),
+                'resolve_404': self.resolve_404_cache.info()}
         
     def __resolve(self, path):
         # first loop check for static urls (with no arguments)
@@ -237,12 +328,9 @@ class MultiTree(object):
             if path in tree:
                 for child in tree[path].children:
                     yield child
-            elif url:
-                for child in tree.nodes():
-                    if child.level == level+1 and not child.parent:
-                        child = self.node(child)
-                        if child.route.bits[:level] == bits:
-                            yield child
+            elif url and len(bits) == level:
+                for child in tree.orphans(bits):
+                    yield self.node(child)
         
 
 class DjpNode(MultiNode):
@@ -278,7 +366,7 @@ class BadNode(DjpNode):
 class DjpcmsTree(MultiTree):
     '''The multitree used by djpcms. It contains two trees, one
 for the application views and one for flat pages.'''
-    def __init__(self, tree, pages = None):
+    def __init__(self, tree, pages = None, cache = True):
         # create the tree for flat pages
         self.tree_pages = tree_pages = {}
         if pages:
@@ -291,11 +379,12 @@ for the application views and one for flat pages.'''
                     flat_pages_trees[page.url] = page
             if flat_pages_trees:
                 flat_pages_trees = NRT(itervalues(flat_pages_trees))
-                super(DjpcmsTree,self).__init__(flat_pages_trees, tree)
+                super(DjpcmsTree,self).__init__(flat_pages_trees, tree,
+                                                cache=cache)
             else:
-                super(DjpcmsTree,self).__init__(tree)
+                super(DjpcmsTree,self).__init__(tree, cache=cache)
         else:
-            super(DjpcmsTree,self).__init__(tree)
+            super(DjpcmsTree,self).__init__(tree, cache=cache)
     
     def node(self, node, urlargs=None):
         if not isinstance(node, DjpNode):
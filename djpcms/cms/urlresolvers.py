@@ -9,12 +9,12 @@ from djpcms.utils.httpurl import iteritems, itervalues
 from djpcms.utils.structures import OrderedDict
 
 from .exceptions import *
-from .routing import Route
+from .routing import Route, PathConverter
 from .tree import NRT
 from .views import RouteMixin, url_match
 
 
-__all__ = ['ResolverMixin']
+__all__ = ['ResolverMixin', 'CompiledResolver']
         
 
 class resolver_manager(object):
@@ -44,6 +44,110 @@ class resolver_manager(object):
                     value.url = '/'+path
     
     
+class TrieNode(object):
+    __slots__ = ('static', 'dynamic', 'views')
+    
+    def __init__(self):
+        self.static = {}
+        self.dynamic = []
+        self.views = []
+        
+    def static_child(self, bit):
+        node = self.static.get(bit)
+        if node is None:
+            node = self.static[bit] = TrieNode()
+        return node
+    
+    def dynamic_child(self, variable, converter):
+        for v, c, _, node in self.dynamic:
+            if v == variable and c.__class__ == converter.__class__ and\
+                    c.__dict__ == converter.__dict__:
+                return node
+        node = TrieNode()
+        regex = re.compile('^(?:%s)$' % converter.regex, re.UNICODE)
+        self.dynamic.append((variable, converter, regex, node))
+        return node
+    
+    
+class CompiledResolver(object):
+    '''A trie of the url segments of all views served by a
+:class:`ResolverMixin`. It is built once when the resolver is loaded and
+matches static segments with a dictionary lookup, using converter regular
+expressions only for dynamic segments. Views with a ``path`` converter, which
+can span several segments, are matched with their full route.
+
+The :meth:`resolve` method returns the same ``(view, urlargs)`` pair as the
+recursive :meth:`ResolverMixin.resolve`, picking the first matching view in
+:meth:`ResolverMixin.all_views` order, or ``None`` if no view matches.'''
+    def __init__(self, resolver):
+        self.prefix = resolver.route.rule
+        self.root = TrieNode()
+        self.fallback = []
+        level = resolver.route.level
+        for index, view in enumerate(resolver.all_views()):
+            route = view.route
+            bits = route.breadcrumbs[level:]
+            converters = route._converters
+            if [b for d, b in bits if d and\
+                    isinstance(converters[b], PathConverter)]:
+                self.fallback.append((index, view))
+                continue
+            node = self.root
+            for dynamic, bit in bits:
+                if dynamic:
+                    node = node.dynamic_child(bit, converters[bit])
+                else:
+                    node = node.static_child(bit)
+            node.views.append((index, view, route.is_leaf))
+            
+    @classmethod
+    def build(cls, resolver):
+        '''Build a :class:`CompiledResolver` for *resolver* if its route
+has no variables, otherwise return ``None``.'''
+        if not resolver.route.arguments:
+            return cls(resolver)
+        
+    def resolve(self, path):
+        if path.endswith('/'):
+            leaf = False
+            segments = path[:-1].split('/')
+        else:
+            leaf = bool(path)
+            segments = path.split('/') if path else []
+        best = []
+        self._match(self.root, segments, 0, leaf, {}, best)
+        for index, view in self.fallback:
+            if best and best[0] < index:
+                break
+            match = view.route.match(self.prefix + path)
+            if match is not None and '__remaining__' not in match:
+                best[:] = (index, view, match)
+                break
+        if best:
+            return best[1], best[2]
+        
+    def _match(self, node, segments, i, leaf, urlargs, best):
+        if i == len(segments):
+            for index, view, is_leaf in node.views:
+                if is_leaf == leaf:
+                    if not best or index < best[0]:
+                        best[:] = (index, view, dict(urlargs))
+                    break
+            return
+        segment = segments[i]
+        child = node.static.get(segment)
+        if child is not None:
+            self._match(child, segments, i+1, leaf, urlargs, best)
+        for variable, converter, regex, child in node.dynamic:
+            if regex.match(segment):
+                try:
+                    urlargs[variable] = converter.to_python(segment)
+                except UrlException:
+                    continue
+                self._match(child, segments, i+1, leaf, urlargs, best)
+                urlargs.pop(variable)
+        
+        
 class ResolverMixin(RouteMixin):
     '''A :class:`RouteMixin` for classes with several sub-routes. An instance
  of this class has always :attr:`is_leaf` equal to ``False``, it is guaranteed
@@ -88,6 +192,11 @@ class ResolverMixin(RouteMixin):
             self.on_bound()
             if self.is_root and self:
                 self.local['tree'] = NRT(self.all_views(),self)
+                settings = self.settings
+                if settings is None or\
+                        settings.get('COMPILE_URL_RESOLVER', True):
+                    self.local['compiled_resolver'] = \
+                                                CompiledResolver.build(self)
         
     def _isbound(self):
         return 'urls' in self.local
@@ -130,7 +239,15 @@ class ResolverMixin(RouteMixin):
                 pass
             
     def resolve(self, path, urlargs=None):
-        '''Resolve a *path* recursively.'''
+        '''Resolve a *path* recursively. When a :class:`CompiledResolver`
+is available, it is used to find the view first and the recursive resolution
+is performed only when no view matches, so that :class:`Http404` and
+:class:`HttpRedirect` are raised as usual.'''
+        compiled = self.local.get('compiled_resolver')
+        if compiled is not None and urlargs is None:
+            match = compiled.resolve(path)
+            if match is not None:
+                return match
         try:
             with resolver_manager(self, path) as rm:
                 urlargs = urlargs if urlargs is not None else {}
@@ -220,6 +220,16 @@ routing and handler classes in djpcms including, but not only, :class:`Site`,
     def storage(self):
         return self.internal_data('storage')
 
+    @property
+    def cache_handler(self):
+        '''Access the site :class:`djpcms.cms.cache.CacheHandler`.'''
+        return self.internal_data('cache')
+
+    @property
+    def timing(self):
+        '''Access the site :class:`djpcms.cms.timing.TimingHandler`.'''
+        return self.internal_data('timing')
+
     def encoding(self, request):
         '''Encoding for this route'''
         return self.settings.DEFAULT_CHARSET
@@ -406,11 +416,20 @@ and :class:`ViewHandler`.
 
     Default: ``True``.
 
+.. attribute:: cache_timeout
+
+    Number of seconds the full response of this renderer is stored in the
+    site :class:`djpcms.cms.cache.CacheHandler`. If ``None`` the
+    :attr:`appmodel` value or the ``RESPONSE_CACHE_TIMEOUT`` setting is used.
+
+    Default: ``None``.
+
 .. attribute:: settings
 
     proxy of the :attr:`ApplicationSite.settings` from :attr:`site` attribute
 '''
     cache_control = None
+    cache_timeout = None
     appmodel = None
     template_file = None
     name = None
@@ -431,7 +450,7 @@ and :class:`ViewHandler`.
                  ajax_enabled=None, form=None, template_file=None,
                  description=None, in_nav=None, has_plugins=None,
                  insitemap=None, body_class=None, hidden=None,
-                 cache_control=None):
+                 cache_control=None, cache_timeout=None):
         self.name = name if name is not None else self.name
         self.description = description if description is not None else\
                             self.description
@@ -440,6 +459,8 @@ and :class:`ViewHandler`.
         self.pagination = pagination if pagination is not None\
                                      else self.pagination
         self.cache_control = cache_control or self.cache_control
+        self.cache_timeout = cache_timeout if cache_timeout is not None else\
+                                self.cache_timeout
         self.form = form if form is not None else self.form
         self.template_file = template_file or self.template_file
         if self.template_file:
@@ -543,6 +564,16 @@ belongs to a user, otherwise returns ``None``.'''
             cache_control = self.appmodel.cache_control
         return cache_control
 
+    def get_cache_timeout(self):
+        '''Number of seconds the full response can be kept in the site
+:class:`djpcms.cms.cache.CacheHandler`. Check :attr:`cache_timeout`.'''
+        timeout = self.cache_timeout
+        if timeout is None and self.appmodel:
+            timeout = self.appmodel.cache_timeout
+        if timeout is None:
+            timeout = self.settings.get('RESPONSE_CACHE_TIMEOUT')
+        return timeout or 0
+
 
 class ViewHandler(RouteMixin, RendererMixin):
     '''A virtual class inheriting from :class:`RouteMixin` and
@@ -713,23 +744,25 @@ This default implementation should suffice'''
 
     def has_permission(self, request, code=None, model=None, instance=None,
                        **kwargs):
-        '''Check view permissions.'''
+        '''Check view permissions. Decisions are memoised in the
+:class:`RequestCache` for the lifetime of the request.'''
         perm = self.permissions
+        cache = request.cache
         user = kwargs.pop('user', request.user)
         # if code is not provided we check if the page can be viewed
         # A page model must be available
         if code is None:
             page = request.closest_page
             if page and page != instance:
-                if not perm.has(request, permissions.VIEW, page,
-                                self.Page.model, user):
+                if not cache.has_permission(perm, request, permissions.VIEW,
+                                            page, self.Page.model, user):
                     return False
             code = self.PERM
         model = model or request.model
         instance = instance or request.instance
         if not model or not isinstance(instance, model):
             instance = None
-        return perm.has(request, code, instance, model, user)
+        return cache.has_permission(perm, request, code, instance, model, user)
 
 
 class pageview(ViewHandler):
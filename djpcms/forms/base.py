@@ -529,7 +529,7 @@ factory.'''
         attr = field.widget_attrs
         if hasattr(attr, '__call__'):
             attr = attr(self)
-        widget = field.widget(data=data, **attr).addData(fdata)
+        widget = field.get_widget(self)(data=data, **attr).addData(fdata)
         widget.internal['bfield'] = self
         widget.addAttrs({'id': self.id,
                          'name':self.html_name,
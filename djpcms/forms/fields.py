@@ -228,6 +228,11 @@ attribute. By default return ``None``. Override for custom behaviour.
 :rtype: an instance of ``dict`` or ``None``.'''
         return None
 
+    def get_widget(self, bfield):
+        '''The :class:`djpcms.html.WidgetMaker` rendering *bfield*. By
+default it is :attr:`widget`.'''
+        return self.widget
+
 
 class CharField(Field):
     '''\
@@ -417,9 +422,20 @@ queries on models as well as list of two-elements tuples ``(value, label)``.
 .. attribute:: autocomplete
 
     An optional boolean indicating if the field is rendered as
-    an autocomplete widget.
+    an autocomplete widget. If ``None``, model choices are rendered as an
+    autocomplete widget when they are more than :attr:`max_options` and the
+    root view of the :attr:`model` application handles autocomplete
+    requests.
 
-    Default: ``False``.
+    Default: ``None``.
+
+.. attribute:: max_options
+
+    The maximum number of model choices rendered as a select widget when
+    :attr:`autocomplete` is ``None``. If ``0`` model choices are always
+    rendered as a select widget.
+
+    Default: ``500``.
 
 .. attribute:: multiple
 
@@ -442,13 +458,14 @@ queries on models as well as list of two-elements tuples ``(value, label)``.
     model = None
     query = None
     field = 'id'
-    autocomplete = False
     search = False
     autocomplete = None
+    max_options = 500
     empty_label = '-----------'
     with_empty_label = None
     minLength = 2
     maxRows = 30
+    _values = None
 
     def __init__(self, **kwargs):
         cls = self.__class__
@@ -471,15 +488,67 @@ queries on models as well as list of two-elements tuples ``(value, label)``.
             self._setmodel(query)
         # The choice field is based on a model and therefore a query
         if self.mapper:
-            if not self.autocomplete:
-                query = query if query is not None else self.mapper.query()
-                for v in query:
-                    #TODO: allow for diferent attribute name for id
-                    yield v.id, v
+            if not self.use_autocomplete(bfield):
+                for v in self.model_choices(bfield, query):
+                    yield v
         elif query:
             for v in query:
                 yield v
 
+    def model_choices(self, bfield, query=None):
+        '''List of ``(id, label)`` pairs of the :attr:`model` instances in
+*query*, or of all instances if *query* is ``None``. Unless :attr:`query` is
+a callable, the list is cached by the site cache handler when
+``CHOICES_CACHE_TIMEOUT`` is set.'''
+        handler, key = self._cache_key(bfield, 'choices_key')
+        choices = handler.get_choices(key) if key else None
+        if choices is None:
+            query = query if query is not None else self.mapper.query()
+            #TODO: allow for diferent attribute name for id
+            choices = [(v.id, to_string(v)) for v in query]
+            if key:
+                handler.set_choices(key, choices)
+        return choices
+
+    def count(self, bfield):
+        '''The number of :attr:`model` choices. It uses the cached
+:meth:`model_choices` or query counts when available.'''
+        handler, key = self._cache_key(bfield, 'choices_key')
+        choices = handler.get_choices(key) if key else None
+        if choices is not None:
+            return len(choices)
+        handler, key = self._cache_key(bfield, 'count_key')
+        total = handler.get_count(key) if key else None
+        if total is None:
+            query = self.query
+            if hasattr(query, '__call__'):
+                query = query(bfield)
+            query = query if query is not None else self.mapper.query()
+            total = query.count()
+            if key:
+                handler.set_count(key, total)
+        return total
+
+    def use_autocomplete(self, bfield):
+        '''Check if *bfield* is rendered as an autocomplete widget. The
+result is stored in *bfield*, since it may require counting the choices.'''
+        if self.autocomplete is not None:
+            return self.autocomplete
+        use = getattr(bfield, '_use_autocomplete', None)
+        if use is None:
+            use = False
+            if self.mapper and self.max_options and\
+                    not hasattr(self.query, '__call__'):
+                request = bfield.request
+                app = self._autocomplete_app(request)
+                if app is not None and self.count(bfield) > self.max_options:
+                    view = request.for_app(app)
+                    if view is not None:
+                        bfield._autocomplete_url = view.url
+                        use = True
+            bfield._use_autocomplete = use
+        return use
+
     def values(self, bfield):
         '''Generator of values in select'''
         for o in self.all(bfield):
@@ -535,7 +604,13 @@ clean its values.'''
 
     def _clean_simple(self, value, bfield):
         '''Invoked by :meth:`clean` if :attr:`model` is not defined.'''
-        ch = set(self.values(bfield))
+        if isinstance(self.query, (list, tuple)):
+            # fixed choices, computed once
+            ch = self._values
+            if ch is None:
+                ch = self._values = frozenset(self.values(bfield))
+        else:
+            ch = set(self.values(bfield))
         values = value if self.multiple else (value,)
         if not isinstance(values, (list, tuple)):
             raise ValidationError('Critical error. {0} is not a list'\
@@ -565,8 +640,24 @@ is ``True``, in which case the value is returned.'''
                     '{0} is not a valid {1}'.format(value,self.mapper))
 
     def _clean_multiple_model_value(self, value, bfield):
-        field = '{0}__in'.format(self.field)
-        return self.mapper.filter(**{field: value})
+        '''Invoked by :meth:`clean` if :attr:`model` is defined
+and :attr:`multiple` is ``True``. It fetches the instances of :attr:`model`
+with a single query and raises a validation exception if some of them are
+not found, unless :attr:`search` is ``True``.'''
+        if not isinstance(value, (list, tuple)):
+            value = (value,)
+        instances = [v for v in value if isinstance(v, self.model)]
+        values = set((to_string(v) for v in value\
+                      if not isinstance(v, self.model)))
+        if values:
+            field = '{0}__in'.format(self.field)
+            found = list(self.mapper.filter(**{field: tuple(values)}))
+            values -= set((to_string(getattr(v, self.field)) for v in found))
+            if values and not self.search:
+                raise ValidationError('{0} are not valid {1}'.format(
+                                      ', '.join(sorted(values)), self.mapper))
+            instances.extend(found)
+        return instances
 
     def widget_value(self, value):
         model = self.model
@@ -580,17 +671,19 @@ is ``True``, in which case the value is returned.'''
     def get_widget_data(self, bfield):
         '''Called by the :meth:`Field.get_widget_data` method of
 :class:`ChoiceField`.'''
-        if not self.autocomplete:
+        if not self.use_autocomplete(bfield):
             return
         value = bfield.value
-        ch = self.all(bfield)
+        # model choices are retrieved from the search url
+        ch = () if self.mapper else self.all(bfield)
         if not hasattr(ch, '__len__'):
             ch = tuple(ch)
         data = {'multiple':self.multiple,
                 'minlength':self.minLength,
                 'maxrows':self.maxRows,
                 'search_string':bfield.name,
-                'url': self.url(bfield.request),
+                'url': getattr(bfield, '_autocomplete_url', None) or
+                       self.url(bfield.request),
                 'choices': ch}
         if self.model:
             if value:
@@ -622,6 +715,27 @@ is ``True``, in which case the value is returned.'''
             if self.model:
                 self.mapper = orms.mapper(self.model)
 
+    def _autocomplete_app(self, request):
+        # The application for the model if its root view handles
+        # autocomplete requests, otherwise None.
+        if request is not None:
+            app = request.app_for_model(self.model)
+            view = getattr(app, 'root_view', None)
+            if hasattr(view, 'ajax__autocomplete'):
+                return app
+
+    def _cache_key(self, bfield, name):
+        # The site cache handler and the key returned by its method *name*
+        # or (None, None) if not available.
+        request = bfield.request
+        if request is not None and not hasattr(self.query, '__call__'):
+            handler = request.view.cache_handler
+            if handler is not None:
+                bits = () if self.query is None else (id(self),)
+                return handler, getattr(handler, name)(self.model, 'choices',
+                                                       *bits)
+        return None, None
+
 
 class ChoiceField(MultipleMixin, Field):
     '''A :class:`Field` which validates against a set of ``choices``.
@@ -635,6 +749,7 @@ via the :class:`ChoiceFieldOptions` class.
     attribute.
 '''
     widget = html.Select()
+    autocomplete_widget = html.TextInput(cn='autocomplete')
 
     def get_initial(self, form):
         # Delegate to choices
@@ -677,6 +792,13 @@ form as only argument'''
     def get_widget_data(self, bfield):
         return self.choices.get_widget_data(bfield)
 
+    def get_widget(self, bfield):
+        # Switch to an autocomplete widget when there are too many choices
+        if not self.choices.autocomplete and\
+                self.choices.use_autocomplete(bfield):
+            return self.autocomplete_widget
+        return self.widget
+
 
 class EmailField(CharField):
     pass
@@ -134,7 +134,8 @@ def html_doc_stream(request, stream, status=200):
     if page:
         for h in page.additional_head:
             yield h
-    for css in media.render_css:
+    head_css = media.css_media()
+    for css in head_css.render_css:
         yield css
     yield '</head>'
     # ENDS HEAD
@@ -147,6 +148,10 @@ def html_doc_stream(request, stream, status=200):
             yield s
     else:
         yield stream
+    # Style sheets added by widgets once the head was sent, when the body is
+    # streamed
+    for css in media.css_media(head_css).render_css:
+        yield css
     js = media.all_js
     if js:
         yield js
@@ -1,8 +1,8 @@
 '''Page layout and grids'''
 from collections import deque, namedtuple
 
-from djpcms.utils.async import on_result
-from .base import WidgetMaker, Widget
+from djpcms.utils.async import on_result, maybe_async
+from .base import WidgetMaker, Widget, iterable_for_widget
 from . import classes
 
 __all__ = ['LayoutDoesNotExist',
@@ -14,6 +14,7 @@ __all__ = ['LayoutDoesNotExist',
            'page',
            'container',
            'Grid',
+           'CompiledGrid',
            'row',
            'column']
 
@@ -31,7 +32,7 @@ _grid_layouts = {}
 grid_system = namedtuple('grid_system','fixed columns')
 namespace_columns = namedtuple('namespace_columns','namespace columns')
 
-def get_grid_system(request=None):
+def get_grid_system(request=None, system=None):
     if request: 
         page = request.underlying().page
         system = page.grid_system if page else None
@@ -68,43 +69,79 @@ def get_or_update_dict(d, key, val = None):
         d[key] = val if val is not None else {}
     return d[key]
 
+def normalised_blocks(blocks):
+    '''``True`` if *blocks*, a list of blocks in display order, have
+consecutive positions starting from ``0`` and a single empty block at the
+end, the state :meth:`djpcms.cms.layout.PageModel.renumber_blocks` leaves a
+column in.'''
+    if not blocks or blocks[-1].plugin_name:
+        return False
+    last = len(blocks) - 1
+    for idx, block in enumerate(blocks):
+        if block.position != idx or (idx < last and not block.plugin_name):
+            return False
+    return True
+
+def normalise_columns(request, pageobj, numcolumns):
+    '''Normalise, with :meth:`djpcms.cms.layout.PageModel.renumber_columns`,
+the columns of *pageobj* which are not in the state checked by
+:func:`normalised_blocks`. *numcolumns* is a dictionary mapping namespaces to
+their number of columns, as returned by :meth:`page.container_columns`.
+
+It is called when a page is opened for editing, so that every column has
+saved blocks to edit and drop plugins into. Potentially an asynchronous
+result.'''
+    Page = request.view.Page
+    if not Page:
+        return
+    model = Page.model
+    def _normalise(blocks):
+        namespaces = {}
+        for b in blocks:
+            column = get_or_update_dict(get_or_update_dict(namespaces,
+                                                           b.namespace),
+                                        b.column, [])
+            column.append(b)
+        for namespace, num_columns in numcolumns.items():
+            columns = namespaces.get(namespace, {})
+            changed = {}
+            for column in range(num_columns):
+                blocks = sorted(columns.get(column, ()),
+                                key=lambda b: b.position)
+                if not normalised_blocks(blocks):
+                    changed[column] = blocks
+            if changed:
+                page = pageobj if namespace == 'content' else None
+                model.renumber_columns(changed, page, namespace)
+    return on_result(model.blocks(pageobj), _normalise)
+
 def columns_deque(request, namespace, all_columns, grid):
-    '''Return a `deque` containing all columns for a given namespace'''
+    '''Return a `deque` containing all columns for a given namespace.
+
+Blocks are normalised when they are saved, deleted or moved, and when the
+page is opened for editing by :func:`normalise_columns`, therefore columns
+are rendered from the blocks read by :func:`all_columns` without writing to
+the database. Columns which were never written are completed in memory, with
+an unsaved empty block for empty columns.'''
     num_columns = grid.numcolumns
     new_columns = deque()
     columns = all_columns.get(namespace, {})
+    Page = request.view.Page
+    pageobj = request.page if namespace == 'content' else None
+    build = Page and (pageobj or namespace != 'content')
     for column in range(num_columns):
-        blocks = columns.get(column)
-        if blocks is None:
-            blocks = {}
-        new_blocks = []
-        new_columns.append((column,new_blocks))
-        np = 0
-        build = True
-        for p in sorted(blocks):
-            block = blocks.pop(p)
-            if not block.plugin_name and blocks:
-                block.delete()
-                continue
-            if block.position != np:
-                block.position = np
-                block.save()
-            if not block.plugin_name:
-                build = False
-            new_blocks.append(block)
-            np += 1
-        if build and request.view.Page:
-            model = request.view.Page.model
-            pageobj = request.page
-            if namespace=='content':
-                if not pageobj:
-                    continue
+        blocks = columns.get(column) or {}
+        blocks = [blocks[p] for p in sorted(blocks)]
+        if build and not normalised_blocks(blocks):
+            model = Page.model
+            if blocks:
+                last = len(blocks) - 1
+                blocks = [b for i, b in enumerate(blocks)\
+                          if b.plugin_name or i == last]
             else:
-                pageobj = None
-            block = model.make_block(page=pageobj, column=column, position=np,
-                                     namespace=namespace)
-            block.save()
-            new_blocks.append(block)
+                blocks = [model.make_block(page=pageobj, column=column,
+                                           position=0, namespace=namespace)]
+        new_columns.append((column, blocks))
     return namespace_columns(namespace, new_columns)
 
 def all_columns(request):
@@ -246,6 +283,33 @@ the body tag. A page contains a list of :class:`container`.'''
             request = self.context_request(request, widget)
             context['all_columns'] = all_columns(request)
         return context
+    
+    def container_columns(self, pageobj=None):
+        '''Dictionary mapping the key of each :class:`container` of the page
+to the number of columns of its grid when rendering *pageobj*.'''
+        columns = {}
+        for c in self.allchildren():
+            children = list(c.allchildren())
+            inner_grid = children[0] if children else None
+            if c.key == 'content' and pageobj and\
+                    pageobj.inner_grid is not None:
+                inner_grid = pageobj.inner_grid
+            if inner_grid is None:
+                inner_grid = c.default_inner_grid(None)
+            if c.key and inner_grid is not None:
+                columns[c.key] = inner_grid.numcolumns
+        return columns
+
+    def compile(self, system=None):
+        '''Compile the grids of the page containers for the *system* grid,
+a string such as ``"fixed_12"``. Return ``self``.'''
+        grid = get_grid_system(system=system)
+        for c in self.allchildren():
+            children = list(c.allchildren())
+            inner_grid = children[0] if children else c.default_inner_grid(None)
+            if isinstance(inner_grid, Grid):
+                inner_grid.compiled(grid)
+        return self
                 
         
 class Grid(elem):
@@ -255,6 +319,7 @@ class Grid(elem):
     def __init__(self, *rows, **kwargs):
         cleaned_rows = []
         self.default_columns = kwargs.pop('default_columns', 12)
+        self._compiled = {}
         for row in rows:
             if isinstance(row, Grid):
                 cleaned_rows.extend(row.allchildren())
@@ -287,12 +352,110 @@ class Grid(elem):
     def add_css_data(self, widget, grid):
         #ADD CLASS ONLY IF PARENT IS A CONTAINER
         if not self.is_nested(widget):
-            suffix = ('{0}' if grid.fixed else 'fluid-{0}').format(grid.columns)
-            widget.addClass('grid-container-'+suffix)
+            self.add_container_class(widget, grid)
+            
+    def add_container_class(self, widget, grid):
+        suffix = ('{0}' if grid.fixed else 'fluid-{0}').format(grid.columns)
+        widget.addClass('grid-container-'+suffix)
     
     def is_nested(self, widget):
         parent = widget.parent
         return parent is None or not isinstance(parent.maker, container)
+    
+    def compiled(self, grid, nested=False):
+        '''Return a :class:`CompiledGrid` of this :class:`Grid` for the
+*grid* system or ``None`` if the grid contains nested grids and cannot
+be compiled. Compiled grids are cached.'''
+        key = (grid, nested)
+        try:
+            return self._compiled[key]
+        except KeyError:
+            compiled = None
+            if self.is_static():
+                compiled = CompiledGrid(self, grid, nested)
+            self._compiled[key] = compiled
+            return compiled
+        
+    def is_static(self):
+        '''``True`` if the structure of the grid does not depend on the
+request, that is to say all its rows contain :class:`column` elements only.'''
+        if self.key or self.inline:
+            return False
+        for row in self.allchildren():
+            if row.key or row.inline:
+                return False
+            for col in row.allchildren():
+                if col.key or col.inline or not col.is_column():
+                    return False
+        return True
+
+
+class CompiledGrid(WidgetMaker):
+    '''A :class:`Grid` compiled for a :class:`grid_system`. The html of the
+grid, its rows and its columns never changes for a given grid system and it
+is rendered once. At every request, rendering is a concatenation of the
+constant strings in :attr:`parts` with the content of the dynamic slots,
+the :class:`column` elements in :attr:`parts`.'''
+    def __init__(self, grid, system, nested):
+        super(CompiledGrid, self).__init__()
+        self.grid = grid
+        self.makers = []
+        parts = []
+        if nested:
+            system = grid_system(False, grid.default_columns)
+        self._compile(grid, system, parts, not nested)
+        self.parts = []
+        for part in parts:
+            if self.parts and not isinstance(part, column) and\
+                    not isinstance(self.parts[-1], column):
+                self.parts[-1] += part
+            else:
+                self.parts.append(part)
+    
+    def _compile(self, maker, system, parts, container_class=False):
+        self.makers.append(maker)
+        widget = Widget(maker)
+        if isinstance(maker, Grid):
+            if container_class:
+                maker.add_container_class(widget, system)
+        else:
+            maker.add_css_data(widget, system)
+        parts.append('<' + widget.tag + widget.flatatt() + '>')
+        if isinstance(maker, column):
+            parts.append(maker)
+        else:
+            for child in maker.allchildren():
+                self._compile(child, system, parts)
+        parts.append('</' + widget.tag + '>')
+        
+    def stream_from_widget(self, request, widget, context):
+        columns = context['columns']
+        renderer = context.get('renderer')
+        if request:
+            cr = widget.internal.get('context_request', context_request)
+            request = cr(request)
+        for part in self.parts:
+            if not isinstance(part, column):
+                yield part
+                continue
+            col, blocks = columns.columns.popleft()
+            if renderer:
+                data = renderer(request, columns.namespace, col, blocks)
+            else:
+                data = blocks
+            if data is None:
+                continue
+            for element in iterable_for_widget(data):
+                element = maybe_async(element)
+                if isinstance(element, Widget):
+                    element.internal['parent'] = widget
+                    for bit in element.stream(request, context):
+                        yield bit
+                elif element is not None:
+                    yield element
+        if request:
+            for maker in self.makers:
+                request.media.add(maker.media(request, widget))
 
 class grid_holder(elem):
     '''A grid holder can contain one :class:`Grid` element or nothing. If
@@ -360,6 +523,11 @@ default :class:`Grid` element is created.'''
                 context['renderer'] = self.renderer
             key = inner_grid.key or 0
             widget.children.clear()
+            if isinstance(inner_grid, Grid) and widget_data is None:
+                compiled = inner_grid.compiled(context['grid_system'],
+                                               not isinstance(self, container))
+                if compiled is not None:
+                    inner_grid = compiled
             if isinstance(inner_grid, WidgetMaker):
                 inner_grid = self.child_widget(inner_grid, widget)
             widget.children[key] = inner_grid
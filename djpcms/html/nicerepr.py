@@ -94,6 +94,8 @@ def results_for_item(request, headers, result, appmodel=None, actions=None,
 :parameter headers: iterable over attribute names.
 :parameter result: instance of obhject to estract attributes from.
 :parameter appmodel: optional instance of :class:`djpcms.views.Application`.
+:parameter links: optional dictionary shared by all the rows of a table so
+    that views linked by the rows are resolved once.
 '''
     if appmodel and appmodel.mapper:
         result = appmodel.mapper.instance(result)
@@ -162,7 +164,8 @@ class get_app_result(object):
                                                 field_name=head.code,
                                                 asbutton=False,
                                                 icon=False,
-                                                name=name)
+                                                name=name,
+                                                links=kwargs.get('links'))
         if link:
             var = link.render()
         else:
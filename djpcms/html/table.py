@@ -4,11 +4,15 @@ It uses the Datatable jQuery plugin on the client side.
 
 http://www.datatables.net/
 '''
+import json
+from base64 import urlsafe_b64encode, urlsafe_b64decode
 from functools import partial
+from itertools import groupby
 from copy import deepcopy
 from collections import namedtuple
 
 from djpcms import ajax, media
+from djpcms.utils.httpurl import to_bytes, to_string
 from djpcms.utils.text import nicename, slugify
 
 from .nicerepr import *
@@ -34,6 +38,64 @@ table_header_ = namedtuple('table_header_',
 simple_table_dom = {'sDom':'t'}
 
 
+def encode_cursor(sort_by, direction, value, pk):
+    '''Encode a keyset pagination cursor into an opaque url-safe string.
+*sort_by* is the sort field, prefixed by ``-`` for descending order, *value*
+and *pk* are the sort value and the id of the row at the page boundary.
+Return ``None`` if *value* cannot be serialized.'''
+    try:
+        cursor = json.dumps([sort_by, direction, value, pk])
+    except (TypeError, ValueError):
+        return None
+    return to_string(urlsafe_b64encode(to_bytes(cursor)))
+
+
+def decode_cursor(cursor, sort_by):
+    '''Decode a cursor created by :func:`encode_cursor` into a three elements
+tuple ``(direction, value, pk)``. Return ``None`` if the cursor is not
+valid or it was not created for *sort_by*, including the sort order.'''
+    if cursor:
+        try:
+            name, direction, value, pk = json.loads(
+                            to_string(urlsafe_b64decode(to_bytes(cursor))))
+        except Exception:
+            return None
+        if name == sort_by and direction in ('next', 'prev') and\
+                pk is not None:
+            return direction, value, pk
+
+
+def _keyset_rows(query, attrname, asc, cursor, start, size):
+    # Up to size rows of query, sorted by attrname, following the
+    # (value, pk) cursor or from start. Rows with the same sort value are
+    # ordered by id so that the order is unique and pages never skip or
+    # repeat rows.
+    key = lambda row: getattr(row, attrname, None)
+    after = '__gt' if asc else '__lt'
+    id_order = 'id' if asc else '-id'
+    rows = []
+    if cursor:
+        value, pk = cursor
+        rows.extend(query.filter(**{attrname: value, 'id'+after: pk})\
+                         .sort_by(id_order)[:size])
+        query = query.filter(**{attrname+after: value})
+        start = 0
+    if len(rows) < size:
+        n = size - len(rows)
+        tail = list(query[start:start+n])
+        last = key(tail[-1]) if len(tail) == n else None
+        for value, group in groupby(tail, key):
+            if len(tail) == n and value == last:
+                # the last group may be cut by the slice, load it by id
+                group = query.filter(**{attrname: value})\
+                             .sort_by(id_order)[:size-len(rows)]
+            else:
+                group = sorted(group, key=lambda row: row.id,
+                               reverse=not asc)
+            rows.extend(group)
+    return rows[:size]
+
+
 def attrname_from_header(header, code):
     if code and code in header:
         return header[code].attrname
@@ -171,8 +233,15 @@ javascript plugin'''
             headers = widget.internal['headers']
             appmodel = widget.internal.get('appmodel')
             actions = widget.internal.get('actions')
+            links = {}
+            data = widget.data_stream
+            if appmodel is not None and appmodel.mapper:
+                # check permissions of all rows at once
+                data = [appmodel.mapper.instance(res) for res in data]
+                appmodel.instances_permissions(request, data)
             return (results_for_item(request, headers, res, appmodel,
-                            actions = actions) for res in widget.data_stream)
+                            actions = actions, links = links)\
+                        for res in data)
         else:
             return ()
 
@@ -254,6 +323,20 @@ class Pagination(object):
 :parameter pagination_entry: An optional :class:`WidgetMaker` to render each
     element within a flat layout pagination (rather than table pagination).
 
+:parameter keyset: if ``True`` sorted queries are paginated with cursors on
+    the sort field rather than with offsets. Pages are loaded by filtering on
+    the last (or first) value displayed, so that deep pages are as fast as
+    the first one. Rows with the same sort value are ordered by ``id``.
+    The cursors to the next and previous pages are available
+    in the ``next`` and ``prev`` entries of the pagination dictionary.
+
+    Default: ``False``.
+
+:parameter approximate_count: if ``True`` keyset pagination does not count
+    the query but estimate the total from the pages loaded so far.
+
+    Default: ``False``.
+
 
 **Attributes**
 
@@ -278,7 +361,8 @@ class Pagination(object):
     def __init__(self, headers=None, actions=None, bulk_actions=None,
                  sortable=False, footer=False, ajax=True,
                  size=25, size_choices=(10,25,50,100,-1), ordering=None,
-                 html_data=None, sizetolerance=1, layout=None):
+                 html_data=None, sizetolerance=1, layout=None,
+                 keyset=False, approximate_count=False):
         self.actions = tuple(actions or ())
         self.bulk_actions = tuple(bulk_actions or ())
         self.footer = footer
@@ -288,6 +372,8 @@ class Pagination(object):
         self.ordering = ordering
         self.sizetolerance = sizetolerance
         self.ajax = ajax
+        self.keyset = keyset
+        self.approximate_count = approximate_count
         self.widget_factory = layout if layout is not None else ListItems()
         self.html_data = html_data or {}
         if not hasattr(headers, '__call__'):
@@ -324,7 +410,8 @@ class Pagination(object):
         else:
             return deepcopy(self.flat_defaults)
 
-    def paginate(self, data, start=0, per_page=None, withbody=True):
+    def paginate(self, data, start=0, per_page=None, withbody=True,
+                 sort_by=None, cursor=None, total=None):
         '''paginate *data* according to :attr:`size` and return a two elements
 tuple containing the pagination dictionary and the (possibly) reduced data.
 
@@ -332,20 +419,40 @@ tuple containing the pagination dictionary and the (possibly) reduced data.
 :parameter start: start point
 :parameter per_page: number of element per page
 :parameter withbody: if ``False`` the data set won't be reduced.
+:parameter sort_by: optional field *data* is sorted by, required by
+    ``keyset`` pagination.
+:parameter cursor: optional cursor from the ``next`` or ``prev`` entry of
+    a previous keyset pagination dictionary.
+:parameter total: optional number of elements in *data*. If not provided
+    *data* is counted.
 :rtype: two elements tuple
 '''
         per_page = per_page or self.size
         if not per_page:
             return self._paginate(None, data, withbody)
-        try:
-            total = data.count()
-        except:
-            total = len(data)
+        if self.keyset and sort_by and withbody and '__' not in sort_by and\
+                hasattr(data, 'filter'):
+            per_page = int(per_page)
+            if per_page > 0:
+                return self._keyset_paginate(data, sort_by, cursor, start,
+                                             per_page, total)
+        if total is None:
+            total = self._count(data)
         per_page = int(per_page)
         if per_page <= 0:
             return self._paginate(None,data,withbody)
         if total <= self.sizetolerance*per_page:
             return self._paginate(None,data,withbody)
+        return self._paginate(self._pagination_dict(total, start, per_page),
+                              data, withbody)
+    
+    def _count(self, data):
+        try:
+            return data.count()
+        except:
+            return len(data)
+        
+    def _pagination_dict(self, total, start, per_page):
         pages = int(total/per_page)
         if per_page*pages < total:
             pages += 1
@@ -358,7 +465,7 @@ tuple containing the pagination dictionary and the (possibly) reduced data.
         start = end - per_page
         end = min(end,total)
         page_menu = self.size_choices if multiple else None
-        pagi = {'total':total,
+        return {'total':total,
                 'per_page':per_page,
                 'pages':pages,
                 'page':page,
@@ -366,7 +473,51 @@ tuple containing the pagination dictionary and the (possibly) reduced data.
                 'start':start,
                 'end':end,
                 'page_menu':page_menu}
-        return self._paginate(pagi, data, withbody)
+    
+    def _keyset_paginate(self, data, sort_by, cursor, start, per_page, total):
+        # Keyset pagination on the (sort value, id) pair of the rows at
+        # the page boundary.
+        desc = sort_by.startswith('-')
+        attrname = sort_by[1:] if desc else sort_by
+        start = int(start)
+        cursor = decode_cursor(cursor, sort_by)
+        if cursor:
+            direction, cursor = cursor[0], cursor[1:]
+        else:
+            direction = 'next'
+        if direction == 'next':
+            query, asc = data, not desc
+        else:
+            query = data.sort_by(attrname if desc else '-'+attrname)
+            asc = desc
+        rows = _keyset_rows(query, attrname, asc, cursor, start, per_page+1)
+        more = len(rows) > per_page
+        rows = rows[:per_page]
+        if direction == 'next':
+            has_next, has_prev = more, bool(cursor or start)
+        else:
+            rows.reverse()
+            has_next, has_prev = True, more
+        if total is None:
+            if self.approximate_count:
+                total = start + len(rows) + (per_page if has_next else 0)
+            else:
+                total = self._count(data)
+        pagi = self._pagination_dict(max(total, 1), start, per_page)
+        pagi['total'] = total
+        pagi['start'] = start
+        pagi['end'] = start + len(rows)
+        pagi['next'] = pagi['prev'] = None
+        if rows:
+            if has_next:
+                last = rows[-1]
+                pagi['next'] = encode_cursor(sort_by, 'next',
+                                    getattr(last, attrname, None), last.id)
+            if has_prev:
+                first = rows[0]
+                pagi['prev'] = encode_cursor(sort_by, 'prev',
+                                    getattr(first, attrname, None), first.id)
+        return pagi, rows
 
     def _paginate(self, pagi, data, withbody):
         # Return a tuple with the pagination info dictionary and
@@ -434,6 +585,9 @@ a standard pagination.
                     'iTotalDisplayRecords':total,
                     'sEcho':inputs.get('sEcho'),
                     'aaData':aaData}
+            if pagination and self.keyset:
+                data['sNextCursor'] = pagination.get('next')
+                data['sPrevCursor'] = pagination.get('prev')
             return ajax.Text(request.environ, data)
         else:
             raise NotImplementedError()
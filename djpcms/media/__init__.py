@@ -6,6 +6,7 @@ from djpcms.utils.text import mark_safe, escape
 from djpcms.utils.httpurl import urljoin
 
 from .js import *
+from .bundle import bundle_media, is_local_media
 
 MEDIA_TYPES = ('css','js')
 
@@ -47,7 +48,7 @@ files such as style sheet and javascript.'''
         '''Generator over javascript scripts to be included in the page.'''
         prefix = self.settings.get('MEDIA_URL','')
         absolute = self.absolute_path
-        for path in self._js:
+        for path in self.bundled(self._js, 'js'):
             if not path.startswith('<script'):
                 path = '<script type="text/javascript" src="%s"></script>'\
                          % absolute(path, prefix)
@@ -63,7 +64,7 @@ files such as style sheet and javascript.'''
         absolute = self.absolute_path
         done = set()
         for medium in sorted(self._css):
-            paths = self._css[medium]
+            paths = self.bundled(self._css[medium], 'css')
             medium = '' if medium == 'all' else " media='%s'" % medium
             for path in paths:
                 url = path[0]
@@ -76,6 +77,36 @@ files such as style sheet and javascript.'''
                     link = '<!--[if %s]>%s<![endif]-->' % (path[1],link)
                 yield mark_safe(link)
         
+    def bundled(self, paths, extension):
+        '''Generator over *paths* where, if the ``MEDIA_BUNDLES`` setting
+is on, consecutive local media files are replaced by their bundle.'''
+        if not self.settings.get('MEDIA_BUNDLES'):
+            for path in paths:
+                yield path
+            return
+        css = extension == 'css'
+        run = []
+        for path in paths:
+            url = path[0] if css else path
+            if is_local_media(url) and not (css and len(path) > 1):
+                if url not in run:
+                    run.append(url)
+                continue
+            for bundle in self._bundle(run, extension, css):
+                yield bundle
+            run = []
+            yield path
+        for bundle in self._bundle(run, extension, css):
+            yield bundle
+
+    def _bundle(self, run, extension, css):
+        if run:
+            bundle = bundle_media(self.settings, run, extension)
+            if bundle:
+                run = (bundle,)
+            for url in run:
+                yield (url,) if css else url
+
     def absolute_path(self, path, prefix=None):
         if path.startswith('http://') or path.startswith('https://')\
          or path.startswith('/'):
@@ -106,6 +137,17 @@ files such as style sheet and javascript.'''
                         path = (path,)
                     medium.append(path)
 
+    def css_media(self, exclude=None):
+        '''A :class:`Media` with the style sheets of this instance which
+are not in the *exclude* :class:`Media`.'''
+        css = {}
+        for medium, paths in self._css.items():
+            done = exclude._css.get(medium, ()) if exclude is not None else ()
+            paths = [path for path in paths if path not in done]
+            if paths:
+                css[medium] = paths
+        return Media(settings=self._settings, css=css)
+
     def add(self, other):
         if isinstance(other, Media):
             for name in MEDIA_TYPES:
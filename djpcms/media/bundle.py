@@ -0,0 +1,147 @@
+'''Concatenate local media files into bundles with a content hash in their
+file name. Bundles are written in the ``bundles`` directory of the site media
+and, since their name changes when their content changes, they can be served
+with far-future cache headers.
+
+Bundling is enabled by the ``MEDIA_BUNDLES`` setting. The modification
+times of the bundled files are checked at every request when ``DEBUG`` is on,
+otherwise at most once every ``MEDIA_BUNDLES_CHECK`` seconds.
+'''
+import os
+import re
+import time
+import logging
+import tempfile
+from hashlib import md5
+from threading import Lock
+
+from djpcms.utils.httpurl import urljoin, to_bytes, to_string
+
+__all__ = ['BUNDLE_DIRECTORY',
+           'is_bundle',
+           'is_local_media',
+           'media_file',
+           'bundle_media']
+
+
+BUNDLE_DIRECTORY = 'bundles'
+BUNDLE_MAX_AGE = 365*24*60*60
+
+bundle_re = re.compile(r'^[0-9a-f]{16}\.(css|js)$')
+css_url_re = re.compile(r'''url\(\s*(['"]?)([^'"\)]+)\1\s*\)''')
+
+_bundles = {}
+_lock = Lock()
+
+logger = logging.getLogger('djpcms.media')
+
+
+def is_bundle(path):
+    '''``True`` if *path* is the path of a media bundle.'''
+    return bool(bundle_re.match(os.path.basename(path)))
+
+
+def is_local_media(path):
+    '''``True`` if *path* is a media path relative to ``MEDIA_URL``.'''
+    return not (path.startswith('http://') or path.startswith('https://') or
+                path.startswith('/') or path.startswith('<'))
+
+
+def media_file(settings, path):
+    '''The absolute file name of a local media *path* or ``None`` if the
+file does not exist.'''
+    from djpcms.apps.static import media_map
+    mapping = media_map(settings)
+    bits = path.split('?')[0].split('/')
+    app = bits.pop(0)
+    if app in mapping:
+        fullpath = os.path.join(mapping[app].absolute_path, *bits)
+        if os.path.isfile(fullpath):
+            return fullpath
+
+
+def bundle_media(settings, paths, extension):
+    '''Return the path, relative to ``MEDIA_URL``, of the bundle containing
+the local media *paths* or ``None`` if the bundle could not be created.
+Bundles are cached for each site by their media paths and rebuilt when the
+modification time of one of the files changes.'''
+    paths = tuple(paths)
+    key = (settings.get('SITE_MODULE'), settings.get('MEDIA_URL'),
+           tuple(settings.get('INSTALLED_APPS', ())), extension, paths)
+    entry = _bundles.get(key)
+    if entry is not None:
+        interval = settings.get('MEDIA_BUNDLES_CHECK', 0)
+        if not settings.get('DEBUG') and\
+                not (interval and time.time() - entry[2] > interval):
+            return entry[0]
+    mtimes = source_mtimes(settings, paths)
+    if mtimes is None:
+        return None
+    with _lock:
+        entry = _bundles.get(key)
+        if entry is None or entry[1] != mtimes:
+            try:
+                bundle = _build_bundle(settings, paths, extension)
+            except Exception:
+                logger.error('Could not bundle %s', ', '.join(paths),
+                             exc_info=True)
+                bundle = None
+            entry = [bundle, mtimes, 0]
+            _bundles[key] = entry
+        entry[2] = time.time()
+        return entry[0]
+
+
+def source_mtimes(settings, paths):
+    '''Tuple of modification times of the local media *paths* or ``None``
+if a file does not exist.'''
+    mtimes = []
+    for path in paths:
+        fullpath = media_file(settings, path)
+        if not fullpath:
+            return None
+        mtimes.append(os.stat(fullpath).st_mtime)
+    return tuple(mtimes)
+
+
+def _build_bundle(settings, paths, extension):
+    from . import site_media_file
+    media_url = settings.get('MEDIA_URL', '')
+    chunks = []
+    for path in paths:
+        fullpath = media_file(settings, path)
+        if not fullpath:
+            return None
+        with open(fullpath, 'rb') as f:
+            data = f.read()
+        if extension == 'css':
+            data = to_bytes(rewrite_css_urls(to_string(data),
+                                             urljoin(media_url, path)))
+        chunks.append(data)
+    content = b'\n'.join(chunks)
+    name = '%s.%s' % (md5(content).hexdigest()[:16], extension)
+    directory = site_media_file(settings, BUNDLE_DIRECTORY, directory=True)
+    if not directory:
+        return None
+    if not os.path.isdir(directory):
+        os.makedirs(directory)
+    fullpath = os.path.join(directory, name)
+    if not os.path.isfile(fullpath):
+        fd, tmp = tempfile.mkstemp(dir=directory)
+        with os.fdopen(fd, 'wb') as f:
+            f.write(content)
+        os.rename(tmp, fullpath)
+    return '%s/%s/%s' % (settings.get('SITE_MODULE'), BUNDLE_DIRECTORY, name)
+
+
+def rewrite_css_urls(css, url):
+    '''Make relative ``url()`` references in *css* absolute, given the *url*
+of the style sheet, so that they are still valid once bundled.'''
+    def _replace(m):
+        quote, ref = m.groups()
+        ref = ref.strip()
+        if not (ref.startswith('data:') or ref.startswith('#')) and\
+                is_local_media(ref):
+            ref = urljoin(url, ref)
+        return 'url(%s%s%s)' % (quote, ref, quote)
+    return css_url_re.sub(_replace, css)
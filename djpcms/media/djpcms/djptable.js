@@ -81,6 +81,7 @@ $.djpcms.decorator({
                 function server_request (input) {
                     var sPreviousSearch = input.data('sPreviousSearch'),
                         current;
+                    // Chrome has issues when accessing the val jQuery method on inputs
                     if (input.is('input')) {
                         current = input[0].value;
                     } else {
@@ -281,13 +282,49 @@ $.djpcms.decorator({
                     this.updateDraw(settings, instance.data('datasize'));
                 }
             },
+            /*
+             * A key for the search and sorting inputs. Keyset pagination
+             * cursors are valid only while it does not change.
+             */
+            query_key: function (info) {
+                var key = [info.sSearch, info.iSortingCols],
+                    i;
+                for (i = 0; i < info.iSortingCols; i++) {
+                    key.push(info['iSortCol_' + i], info['sSortDir_' + i]);
+                }
+                return key.join(',');
+            },
             ajaxServerData: function (sSource, aoData, fnCallback) {
+                var self = this,
+                    info = this.to_obj(aoData),
+                    start = parseInt(info.iDisplayStart, 10),
+                    length = parseInt(info.iDisplayLength, 10),
+                    query = this.query_key(info),
+                    cursor = this.cursor;
+                // Send back the keyset pagination cursor received with the
+                // current page when moving to the next or previous page.
+                if (cursor && cursor.query === query && cursor.length === length) {
+                    if (start === cursor.start + length && cursor.next) {
+                        aoData.push({name: 'cursor', value: cursor.next});
+                    } else if (start === cursor.start - length && cursor.prev) {
+                        aoData.push({name: 'cursor', value: cursor.prev});
+                    }
+                }
                 $.ajax({
                     "dataType": 'json',
                     "type": "POST",
                     "url": sSource,
                     "data": aoData,
-                    "success": fnCallback
+                    "success": function (data) {
+                        self.cursor = {
+                            query: query,
+                            start: start,
+                            length: length,
+                            next: data.sNextCursor,
+                            prev: data.sPrevCursor
+                        };
+                        fnCallback(data);
+                    }
                 });
             },
             _create: function () {
@@ -42,6 +42,18 @@
                 }
                 return data;
             }
+            // The complete new ordering of the column containing elem
+            function ordering(elem) {
+                var column = elem.closest(sortblock),
+                    ids = [];
+                column.children(cmsblock).each(function () {
+                    ids.push(this.id);
+                });
+                return {
+                    column: column.attr('id').split('-').pop(),
+                    order: ids.join(',')
+                };
+            }
             //
             function moveblock(elem, pos, callback) {
                 var form = $(classes.cmsform, elem),
@@ -87,7 +99,7 @@
                         if (pos.next === curposition.next) {return; }
                     }
                     columns.sortable('disable');
-                    moveblock(elem, pos, function (e, s) {
+                    moveblock(elem, ordering(elem), function (e, s) {
                         columns.sortable('enable');
                         $.djpcms.jsonCallBack(e, s);
                     });
@@ -1,6 +1,7 @@
 '''A python CSS framework'''
 import sys
 import os
+import re
 import argparse
 import json
 import threading
@@ -21,11 +22,13 @@ __all__ = ['css', 'cssa', 'cssb', 'css_stream',
            'Variable', 'NamedVariable', 'mixin',
            'cssv', 'lazy', 'px', 'em', 'pc',
            'spacing', 'dump_theme', 'Variables',
-           'Spacing']
+           'Spacing', 'cssmin']
 
 LOGGER = logging.getLogger('djpcms.media.style')
 nan = float('nan')
 conversions = {}
+css_tokens = re.compile(r'''("(?:\\.|[^"\\])*"|'(?:\\.|[^'\\])*')|(/\*.*?\*/)''',
+                        re.DOTALL)
 
 def clamp(val, maxval = 1):
     return min(maxval, max(0, val))
@@ -271,6 +274,9 @@ different themes. Themes override the default value.
         return getattr(value, name)
     
     def tocss(self):
+        dependencies = css.local().dependencies
+        if dependencies is not None:
+            dependencies[id(self)] = self
         theme = self.theme
         if theme in self._value:
             return self._value[theme]
@@ -526,6 +532,8 @@ class css(object):
                             .format(name))
         name = name.replace('_','-')
         self._attributes.append((name,value))
+        if not self._clone and (self._parent is not None or self.is_body):
+            self.changed()
     
     def __getitem__(self, name):
         raise NotImplementedError('cannot get item')
@@ -539,6 +547,7 @@ class css(object):
                 c(self)
             else:
                 self._children[str(c)] = c
+                self.changed()
         else:
             raise TypeError('"{0}" is not a valid type'.format(c))
     
@@ -607,6 +616,8 @@ class css(object):
                     self._children.pop(code)
         elif isinstance(child, mixin):
             self._children.pop(str(child), None)
+        if not self._clone:
+            self.changed()
                 
     def extend(self, elem):
         '''Extend by adding *elem* attributes and children.'''
@@ -616,11 +627,15 @@ class css(object):
                 child._set_parent(self) 
     
     def stream(self):
-        '''This function convert the :class:`css` element into a string.'''
+        '''This function convert the :class:`css` element into a string.
+The body element is rendered by :meth:`_stream_body`.'''
         self.lock.acquire()
         try:
-            elem = self.clone()
-            for s in elem._stream():
+            if self.is_body:
+                stream = self._stream_body()
+            else:
+                stream = self.clone()._stream()
+            for s in stream:
                 yield s
         finally:
             self.lock.release()
@@ -666,11 +681,21 @@ class css(object):
             c.append(self)
         else:
             parent._children[self.code] = [self]
+        if not self._clone:
+            self.changed()
                 
     def _stream(self):
         if self.rendered:
             raise StopIteration()
         self.rendered = True
+        for s in self._stream_self():
+            yield s
+        # yield mixins and children
+        for child_list in itervalues(self._children):
+            for s in self._stream_group(child_list):
+                yield s
+
+    def _stream_self(self):
         data = []
         for k,v in self._attributes:
             v = Variable.cssvalue(v)
@@ -686,13 +711,85 @@ class css(object):
             for s in data:
                 yield s
             yield '}\n'
-        # yield mixins and children
-        for child_list in itervalues(self._children):
-            child = child_list[0]
-            for c in child_list[1:]:
-                child.extend(c)
-            for s in child._stream():
+
+    @staticmethod
+    def _stream_group(child_list):
+        # Elements with the same tag are aggregated into the first one
+        child = child_list[0]
+        for c in child_list[1:]:
+            child.extend(c)
+        return child._stream()
+
+    def _stream_body(self):
+        '''Clone and stream the body element. The output of each group of
+top level elements with the same tag is memoised together with the values
+of the :class:`NamedVariable` it depends on, so that it is rendered again only
+when one of these values or the tree of :class:`css` elements change.'''
+        elem = self._make_clone(recursive=False)
+        try:
+            # Execute body mixins first, they may add children and attributes
+            for child in itervalues(self._children):
+                if isinstance(child, mixin):
+                    child(elem)
+            groups = [(tag, list(cl)) for tag, cl in iteritems(elem._children)]
+            index = dict(((tag, i) for i, (tag, _) in enumerate(groups)))
+            for tag, child in iteritems(self._children):
+                if not isinstance(child, mixin):
+                    if tag in index:
+                        groups[index[tag]][1].extend(child)
+                    else:
+                        index[tag] = len(groups)
+                        groups.append((tag, list(child)))
+            elem._children = OrderedDict()
+            elem.rendered = True
+            for s in elem._stream_self():
                 yield s
+            i = 0
+            while i < len(groups):
+                tag, group = groups[i]
+                i += 1
+                for s in self._render_group(elem, tag, group, groups, index,
+                                            i):
+                    yield s
+        finally:
+            self.restore()
+
+    def _render_group(self, elem, tag, group, groups, index, position):
+        data = self.local()
+        key = (cssv.current_theme, cssv.MEDIAURL, tag)
+        # Groups containing elements created by body mixins are not memoised
+        memoise = not [c for c in group if c._clone]
+        if memoise:
+            memo = data.memo.get(key)
+            if memo is not None:
+                version, sources, dependencies, lines = memo
+                if version == data.version and len(sources) == len(group) and\
+                        not [s for s, c in zip(sources, group) if s is not c]\
+                        and not [v for v, value in dependencies\
+                                 if Variable.cssvalue(v) != value]:
+                    return lines
+        data.dependencies = dependencies = {}
+        try:
+            for c in group:
+                c._make_clone(parent=elem)
+            child_list = elem._children.pop(tag)
+            # elements added to the body while cloning the group
+            strays, elem._children = elem._children, OrderedDict()
+            lines = list(self._stream_group(child_list))
+        finally:
+            data.dependencies = None
+        for t, cl in iteritems(strays):
+            memoise = False
+            if index.get(t, -1) >= position:
+                groups[index[t]][1].extend(cl)
+            else:
+                index[t] = len(groups)
+                groups.append((t, cl))
+        if memoise:
+            dependencies = tuple(((v, Variable.cssvalue(v))\
+                                  for v in itervalues(dependencies)))
+            data.memo[key] = (data.version, tuple(group), dependencies, lines)
+        return lines
     
     def _make_clone(self, parent=None, recursive=True):
         '''Clone the current :class:`css` element and execute all
@@ -742,7 +839,17 @@ class css(object):
             bd = cls.make('body')
             data.real_body = None
             data.body = bd
+            data.version = 0
+            data.memo = {}
+            data.themes = {}
+            data.dependencies = None
         return elem._css_local
+
+    @classmethod
+    def changed(cls):
+        '''Signal a change in the tree of :class:`css` elements. It
+invalidates memoised outputs.'''
+        cls.local().version += 1
     
     @classmethod
     def body(cls):
@@ -774,8 +881,18 @@ class css(object):
         
     @classmethod
     def render_all(cls, media_url=None, charset='utf-8'):
+        '''Render the current theme. The output is cached and returned
+again if the theme, its variables values, the imported style modules and the
+tree of :class:`css` elements did not change.'''
         if media_url:
             cssv.MEDIAURL = media_url
+        data = cls.local()
+        key = (json.dumps(cssv.tojson(), default=str), cls.style_modules(),
+               data.version)
+        theme_key = (cssv.current_theme, cssv.MEDIAURL)
+        cached = data.themes.get(theme_key)
+        if cached is not None and cached[0] == key:
+            return cached[1]
         now = datetime.now()
         body = cls.body().render()
         dt = datetime.now() - now
@@ -791,8 +908,16 @@ Time taken {2} seconds
 ------------------------------------------------------------------ */
 
 '''.format(cssv.current_theme, now, nice_dt)
+        data.themes[theme_key] = (key, intro + body)
         return intro + body
 
+    @staticmethod
+    def style_modules():
+        '''Sorted tuple of imported style modules.'''
+        return tuple(sorted((name for name in list(sys.modules)\
+                             if name.split('.')[-1] == 'style' and\
+                             sys.modules.get(name) is not None)))
+
 def cssa(*args, **kwargs):
     kwargs['parent_relationship'] = 'attribute'
     return css(*args, **kwargs)
@@ -901,6 +1026,17 @@ If the body namespace is not available is automatically created.
     
     def tojson(self):
         return OrderedDict(((v.name, v.tojson()) for v in self))
+
+    def themes(self):
+        '''The set of theme names with values in this :class:`Variables`
+and its namespaces.'''
+        themes = set()
+        for v in self:
+            if isinstance(v, Variables):
+                themes.update(v.themes())
+            elif isinstance(v, NamedVariable):
+                themes.update((t for t in v._value if t))
+        return themes
         
     def params(self):
         d = self.__dict__
@@ -918,10 +1054,12 @@ If the body namespace is not available is automatically created.
             if isinstance(value, Variables):
                 v = value
                 v._reserved.update({'parent': self, 'name': name})
+                css.changed()
             else:
                 v = self.__dict__.get(name)
                 if v is None:
                     v = NamedVariable(self, name, value)
+                    css.changed()
                 else:
                     v.value = value 
             self.__dict__[name] = v
@@ -940,8 +1078,25 @@ cssv = Variables()
 ################################################################################
 ##    API FUNCTIONS
 ################################################################################
-def csscompress(target):  # pragma: no cover
-    os.system('yuicompressor.jar --type css -o {0} {0}'.format(target))
+def cssmin(text):
+    '''Minify the css *text* by removing comments, apart from the ones
+starting with ``/*!``, and unnecessary white spaces. Strings are left
+untouched.'''
+    strings = []
+    def _replace(m):
+        string, comment = m.groups()
+        if string:
+            strings.append(string)
+            return '"%s"' % (len(strings) - 1)
+        elif comment.startswith('/*!'):
+            strings.append(comment)
+            return '"%s"' % (len(strings) - 1)
+        return ' '
+    text = css_tokens.sub(_replace, text)
+    text = re.sub(r'\s+', ' ', text)
+    text = re.sub(r' ?([{};,>]) ?', r'\1', text)
+    text = text.replace(': ', ':').replace(';}', '}').strip()
+    return re.sub(r'"(\d+)"', lambda m: strings[int(m.group(1))], text)
 
 def dump_theme(theme=None, dump_variables=False, minify=False):
     target = Stream()
@@ -952,9 +1107,9 @@ def dump_theme(theme=None, dump_variables=False, minify=False):
             data = target.getvalue()
         else:
             data = css.render_all()
-            target.write(data)
             if minify:
-                target = csscompress(target)
+                data = cssmin(data)
+            target.write(data)
             data = target.getvalue()
             b = convert_bytes(len(data))
             LOGGER.info('Dumped css of %s in size.'% b)
@@ -6,35 +6,20 @@ handlers implemented:
 * restructuredText (requires sphinx package)
 * creole
 
-To use it::
+Handlers are registered by code and the library they require is imported the
+first time the handler is requested. To use it::
 
     from djpcms.utils import markups
     
-    html = markups.get('rst')(txt)
-'''
-import os
-from djpcms.utils.importer import import_module
+    html = markups.get('rst')(request, txt)
 
+:func:`load` imports handlers in advance, for example when the site starts
+via the ``MARKUP_PRELOAD`` setting, and logs which of them are available and
+how long they took to load.
+'''
 from .base import *
 
-_loaded = False
-def load():
-    '''Load markup applications.'''
-    global _loaded
-    if not _loaded:
-        path = os.path.split(os.path.abspath(__file__))[0]
-        for name in os.listdir(path):
-            if not (name.startswith('_') or name.endswith('.pyc')):
-                name = name.split('.')[0]
-                if name == 'base':
-                    continue
-                try:
-                    appmod = import_module('djpcms.utils.markups.'+name)
-                except:
-                    pass
-                else:
-                    add(appmod.Application())
-        _loaded = True
-        
 
-load()
\ No newline at end of file
+register('crl', 'creole', 'djpcms.utils.markups.crl', 'creole')
+register('markdown', 'Markdown', 'djpcms.utils.markups.md', 'markdown')
+register('rst', 'reStructuredText', 'djpcms.utils.markups.rst', 'sphinx')
@@ -1,15 +1,45 @@
 import os
+import logging
+from hashlib import md5
+from threading import Lock
+from timeit import default_timer
+try:
+    from importlib.util import find_spec
+except ImportError:   # pragma nocover
+    import imp
+
+    def find_spec(name):
+        try:
+            return imp.find_module(name)
+        except ImportError:
+            return None
+
+from djpcms.utils.httpurl import to_bytes
+from djpcms.utils.importer import import_module
+from djpcms.utils.structures import LRUCache, OrderedDict
+
+logger = logging.getLogger('djpcms.markups')
 
-_default_markup = None
 MARKUP_HANDLERS = {}
+MARKUP_ENGINES = OrderedDict()
 
 
-__all__ = ['Application', 'add', 'choices', 'default', 'get']
+__all__ = ['Application', 'MarkupEngine', 'MarkupCache', 'add', 'register',
+           'choices', 'default', 'get', 'load', 'report', 'render']
 
 
 class Application(object):
+    '''Base class for markup handlers.
+
+.. attribute:: version
+
+    The version of the handler, usually the version of the library it uses.
+    It is part of the :class:`MarkupCache` keys, so that upgrading the
+    library invalidates html rendered by the previous version.
+'''
     code = None
     name = None
+    version = None
             
     def setup_extension(self, extension):
         pass
@@ -18,31 +48,207 @@ class Application(object):
         raise NotImplementedError()
 
 
+class MarkupEngine(object):
+    '''A registered markup handler. The :attr:`module` implementing it,
+and the library it depends on, are imported the first time the handler is
+requested via :func:`get`.
+
+.. attribute:: requires
+
+    Optional name of the library :attr:`module` depends on. It is checked,
+    without importing it, by :attr:`available`.
+
+.. attribute:: handler
+
+    The :class:`Application` created by :meth:`load` or ``None``.
+
+.. attribute:: error
+
+    The exception raised while loading :attr:`module` or ``None``.
+
+.. attribute:: load_time
+
+    Number of seconds taken by :meth:`load` or ``None`` if not yet loaded.
+'''
+    def __init__(self, code, name, module, requires=None):
+        self.code = code
+        self.name = name
+        self.module = module
+        self.requires = requires
+        self.handler = None
+        self.error = None
+        self.load_time = None
+        self._installed = None
+        self._lock = Lock()
+
+    @property
+    def loaded(self):
+        return self.load_time is not None
+
+    @property
+    def available(self):
+        '''``False`` if :attr:`module` could not be loaded or the library it
+:attr:`requires` is not installed.'''
+        if self.error is not None:
+            return False
+        if self._installed is None:
+            try:
+                self._installed = not self.requires or\
+                                    find_spec(self.requires) is not None
+            except Exception:
+                self._installed = False
+        return self._installed
+
+    def load(self):
+        '''Import :attr:`module`, once, and return its handler.'''
+        if self.load_time is None:
+            with self._lock:
+                if self.load_time is None:
+                    start = default_timer()
+                    try:
+                        self.handler = import_module(self.module).Application()
+                    except Exception as e:
+                        self.error = e
+                    self.load_time = default_timer() - start
+                    if self.error is None:
+                        logger.info('Loaded markup "%s" in %.3f seconds',
+                                    self.code, self.load_time)
+                    else:
+                        logger.warning('Could not load markup "%s": %s',
+                                       self.code, self.error)
+        return self.handler
+
+    def as_dict(self):
+        return {'code': self.code,
+                'name': self.name,
+                'module': self.module,
+                'loaded': self.loaded,
+                'time': self.load_time,
+                'error': str(self.error) if self.error is not None else None}
+
+
+class MarkupCache(object):
+    '''Cache of html rendered by markup handlers, keyed on the handler code,
+the handler :attr:`Application.version` and a hash of the source text. It
+keeps the *maxsize* most recently used entries in process and, if *store* is
+given, it stores html there too. *store* can be any object with ``get`` and
+``set`` methods, such as a :class:`djpcms.cms.cache.CacheBackend`.'''
+    def __init__(self, maxsize=500, store=None):
+        self.lru = LRUCache(maxsize)
+        self.store = store
+
+    def key(self, handler, text):
+        return 'markup:%s:%s:%s' % (handler.code, handler.version or '',
+                                    md5(to_bytes(text)).hexdigest())
+
+    def render(self, handler, request, text):
+        '''Convert *text* into html with *handler*, if not already
+available in the cache.'''
+        key = self.key(handler, text)
+        html = self.lru.get(key)
+        if html is None:
+            store = self.store
+            html = store.get(key) if store is not None else None
+            if html is None:
+                html = handler(request, text)
+                if store is not None:
+                    store.set(key, html)
+            self.lru.set(key, html)
+        return html
+
+    def clear(self):
+        self.lru.clear()
+
+
+_cache = MarkupCache()
+
+
+def render(request, code, text, cache=None):
+    '''Convert *text* into html with the handler for markup *code*, using
+*cache*, or the default in process :class:`MarkupCache`. If the handler is
+not available, *text* is returned.'''
+    handler = get(code)
+    if not handler or not text:
+        return text
+    return (cache or _cache).render(handler, request, text)
+
+
 def add(handler):
     '''Add new markup handler'''
-    global _default_markup, MARKUP_HANDLERS
+    global MARKUP_HANDLERS
     code = handler.code
-    if not _default_markup:
-        _default_markup = code
     if not code in MARKUP_HANDLERS: 
         MARKUP_HANDLERS[code] = handler
 
 
+def register(code, name, module, requires=None):
+    '''Register a markup handler implemented by the ``Application`` class
+in *module*, which depends on the optional *requires* library. The module is
+not imported until the handler is needed.'''
+    global MARKUP_ENGINES
+    if not code in MARKUP_ENGINES:
+        MARKUP_ENGINES[code] = MarkupEngine(code, name, module, requires)
+    return MARKUP_ENGINES[code]
+
+
 def choices(*args,**kwargs):
-    global MARKUP_HANDLERS
+    '''Generator of ``(code, name)`` pairs of available markups. Registered
+engines are listed, without loading them, if the library they require is
+installed and they did not fail to load.'''
+    global MARKUP_HANDLERS, MARKUP_ENGINES
     yield ('','raw')
+    for k, engine in MARKUP_ENGINES.items():
+        if k not in MARKUP_HANDLERS and engine.available:
+            yield k, engine.name
     for k in MARKUP_HANDLERS:
         yield k, MARKUP_HANDLERS[k].name
 
 
 def default(*args,**kwargs):
-    global _default_markup
-    return _default_markup
+    for code, name in choices():
+        if code:
+            return code
 
 
 def get(name):
-    global MARKUP_HANDLERS
-    return MARKUP_HANDLERS.get(name)
+    global MARKUP_HANDLERS, MARKUP_ENGINES
+    handler = MARKUP_HANDLERS.get(name)
+    if handler is None:
+        engine = MARKUP_ENGINES.get(name)
+        if engine is not None:
+            handler = engine.load()
+    return handler
+
+
+def load(*codes):
+    '''Load the markup engines with *codes*, or all registered engines if
+none given, and log which engines are loaded and the time it took. Return the
+:func:`report`.'''
+    for code in codes or list(MARKUP_ENGINES):
+        engine = MARKUP_ENGINES.get(code)
+        if engine is None:
+            logger.warning('Unknown markup "%s"', code)
+        else:
+            engine.load()
+    data = report()
+    logger.info('Markup engines: %s',
+                ', '.join((engine_status(d) for d in data)))
+    return data
+
+
+def engine_status(data):
+    if not data['loaded']:
+        return '%s not loaded' % data['code']
+    elif data['error']:
+        return '%s failed' % data['code']
+    else:
+        return '%s %.3fs' % (data['code'], data['time'])
+
+
+def report():
+    '''List of dictionaries with the status of registered markup engines:
+whether they are loaded, the time it took and the loading error if any.'''
+    return [engine.as_dict() for engine in MARKUP_ENGINES.values()]
         
 
 def help(code = 'crl'):
@@ -6,6 +6,7 @@ from . import base
 class Application(base.Application):
     code = 'crl'
     name = 'creole'
+    version = getattr(creole, '__version__', None)
     
     def __call__(self, request, text):
         document = creole.Parser(text).parse()
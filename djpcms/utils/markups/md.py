@@ -6,6 +6,7 @@ from . import base
 class Application(base.Application):
     code = 'markdown'
     name = 'Markdown'
+    version = getattr(markdown, '__version__', getattr(markdown, 'version', None))
     
     def __call__(self, request, text):
         return markdown.markdown(text)
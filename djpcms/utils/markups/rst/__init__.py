@@ -1,6 +1,7 @@
 import os
 import time
 
+import sphinx
 from sphinx import application as Sphinx
 
 import djpcms
@@ -80,6 +81,7 @@ without a config file. The problem are the extensions.'''
 class Application(base.Application):
     code = 'rst'
     name = 'reStructuredText'
+    version = getattr(sphinx, '__version__', None)
     _setup = None
     
     def setup(self, request):
@@ -1,2 +1,59 @@
 '''Use pulsar structures'''
-from pulsar.utils.structures import *
\ No newline at end of file
+from threading import Lock
+
+from pulsar.utils.structures import *
+
+
+class LRUCache(object):
+    '''A bounded mapping which discards the least recently used items once
+it holds more than *maxsize* entries. It keeps count of :attr:`hits` and
+:attr:`misses` of the :meth:`get` method. A *maxsize* of ``0`` disables the
+cache.'''
+    def __init__(self, maxsize=128):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._lock = Lock()
+
+    def __len__(self):
+        return len(self._data)
+
+    def __contains__(self, key):
+        return key in self._data
+
+    def get(self, key, default=None):
+        with self._lock:
+            try:
+                value = self._data.pop(key)
+            except KeyError:
+                self.misses += 1
+                return default
+            self._data[key] = value
+            self.hits += 1
+            return value
+
+    def set(self, key, value):
+        if self.maxsize > 0:
+            with self._lock:
+                data = self._data
+                data.pop(key, None)
+                data[key] = value
+                while len(data) > self.maxsize:
+                    data.popitem(last=False)
+
+    def pop(self, key, default=None):
+        with self._lock:
+            return self._data.pop(key, default)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def info(self):
+        return {'hits': self.hits,
+                'misses': self.misses,
+                'size': len(self._data),
+                'maxsize': self.maxsize}
@@ -582,25 +582,32 @@ This method is called by both :meth:`variables_from_instance` and
 
     def instance_field_view(self, request, instance=None, field_name=None,
                             name=None, urlargs=None, asbutton=None,
-                            icon=True):
+                            icon=True, links=None):
         '''Obtain a link for instance field if possible.
 
 :parameter instance: an instance of :attr`model`
 :parameter name: optional view name. By default it is the object view.
 :parameter field_name: the instance field name.
 :parameter asbutton: optional boolean. If specified it returns a link widget.
+:parameter links: optional dictionary used as cache when links for several
+    instances are required, for example when rendering a table.
 :rtype: a url string or ``None``.
 
-It uses the :func:`instance_field_view_value` for the purpose.
+It uses the :func:`instance_field_view_value` for the purpose, or the
+:func:`instance_field_link` if *links* is provided.
 '''
         instance = instance or request.instance
-        req, value = instance_field_view_value(request, instance, field_name,
-                                                name=name, urlargs=urlargs)
-        #TODO
-        #We should check if the user has permission to see the view.
-        #however it can be quite expensive. Improve this by
-        #devising a better algorith for checking instance prmissions
-        #if req and req.has_permission():
+        if links is not None and not urlargs:
+            req, value = instance_field_link(request, instance, field_name,
+                                             name=name, cache=links)
+        else:
+            req, value = instance_field_view_value(request, instance,
+                                                   field_name, name=name,
+                                                   urlargs=urlargs)
+        # Instance permissions are checked only when rendering tables, where
+        # decisions for all rows are fetched at once by instances_permissions
+        if req and links is not None and not req.has_permission():
+            req = None
         if req:
             value = self.instance_field_value(request, instance, field_name,
                                               value)
@@ -615,8 +622,28 @@ It uses the :func:`instance_field_view_value` for the purpose.
 the instance.'''
         id = self.mapper.unique_id(instance)
         instance.delete()
+        self.invalidate_counts()
         return id
 
+    def invalidate_counts(self):
+        '''Invalidate the pagination counts and choices cached for
+:attr:`model`. Called when instances of :attr:`model` are saved or
+deleted.'''
+        handler = self.cache_handler
+        if handler is not None:
+            handler.invalidate_model(self.model)
+
+    def instances_permissions(self, request, instances, view=None):
+        '''Check the permission to access *view*, by default the
+:attr:`instance_view`, for all *instances* with a single call to
+:meth:`djpcms.cms.permissions.PermissionHandler.has_many`. Decisions are
+stored in the request cache and used when rendering links to the view.'''
+        view = view or self.instance_view
+        if view is not None and instances:
+            return request.cache.has_permissions(self.permissions, request,
+                                                 view.PERM, instances,
+                                                 self.model, request.user)
+
     def get_instances(self, request):
         data = request.REQUEST
         if 'ids[]' in data:
@@ -629,6 +656,7 @@ the instance.'''
         c = ajax.jcollection(request.environ)
         if objs is not None:
             objs = objs.delete()
+            self.invalidate_counts()
         if objs:
             for id in objs:
                 id = mapper.unique_id(id)
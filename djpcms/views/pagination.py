@@ -1,3 +1,4 @@
+import json
 from collections import namedtuple
 from inspect import isgenerator, isfunction, ismethod
 
@@ -13,12 +14,17 @@ __all__ = ['application_action',
            'application_links',
            'application_link',
            'instance_field_view_value',
+           'instance_field_link',
+           'instance_request',
            'application_views_links',
            'table_toolbox',
            'paginationResponse',
            'bulk_delete']
 
 
+# Inputs which do not change the number of elements of a paginated query
+PAGING_INPUTS = ('iDisplayStart', 'iDisplayLength', 'sEcho', 'cursor', 'sort')
+
 application_action = namedtuple('application_action',
                                 'view display permission')
 menu_link = namedtuple('menu_link',
@@ -137,6 +143,46 @@ an instance of a registered model) and its correspondent value.
 :rtype: a two element tuple ``(view, field_value)``
 
 It is used by :meth:`Application.viewurl`.'''
+    instance, value = _field_instance_value(instance, field_name, name)
+    if instance is None:
+        return None, None
+    return request.for_model(instance=instance,
+                             name=name,
+                             urlargs=urlargs), value
+
+
+def instance_field_link(request, instance, field_name, name=None, cache=None):
+    '''Same as :func:`instance_field_view_value` but the
+:class:`djpcms.cms.Request` for the view is built once for each view and
+stored in the *cache* dictionary. For each *instance* only the url variables
+are evaluated and an :class:`instance_request` is returned. Used when
+rendering tables, where the same views are linked by every row.'''
+    cache = cache if cache is not None else {}
+    instance, value = _field_instance_value(instance, field_name, name)
+    mapper = orms.mapper(instance) if instance is not None else None
+    if not mapper:
+        return None, value
+    model = mapper.model
+    if model not in cache:
+        cache[model] = request.app_for_model(model)
+    app = cache[model]
+    if not app:
+        return None, value
+    view = app.views.get(name) if name else None
+    if not view:
+        view = app.view_for_instance(request, instance)
+    view = view or app.root_view
+    if not view:
+        return None, value
+    if view not in cache:
+        cache[view] = request.for_path(view.path, instance=instance)
+    req = cache[view]
+    if req is None:
+        return None, value
+    return instance_request(req, instance), value
+
+
+def _field_instance_value(instance, field_name, name):
     if field_name:
         value = getattr(instance, field_name, None)
         if iscallable(value):
@@ -153,9 +199,43 @@ It is used by :meth:`Application.viewurl`.'''
             return None, None
     else:
         value = None
-    return request.for_model(instance=instance,
-                             name=name,
-                             urlargs=urlargs), value
+    return instance, value
+
+
+class instance_request(object):
+    '''A lightweight version of a :class:`djpcms.cms.Request` for a model
+*instance*. It shares everything with *request*, a request for the same view,
+but the :attr:`instance`, its url variables and the attributes used for
+rendering links.'''
+    def __init__(self, request, instance):
+        self.request = request
+        self.instance = instance
+        urlargs = dict(request.urlargs or ())
+        urlargs.update(request.view.variables_from_instance(instance))
+        self.urlargs = urlargs
+        self.url = request.node.route.safe_url(urlargs)
+
+    def __getattr__(self, name):
+        return getattr(self.request, name)
+
+    @property
+    def title(self):
+        return self.view.title(self)
+
+    @property
+    def linkname(self):
+        return self.view.linkname(self)
+
+    @property
+    def icon(self):
+        icon = self.view.ICON
+        if hasattr(icon, '__call__'):
+            icon = icon(self)
+        return icon
+
+    def has_permission(self, code=None, model=None, instance=None, **kwargs):
+        return self.view.has_permission(self, code=code, model=model,
+                                        instance=instance, **kwargs)
 
 
 def views_serializable(views):
@@ -309,6 +389,22 @@ def clean_inputs(input, search_string):
 
 
 
+def count_cache_key(request, model, appmodel, inputs):
+    '''The key of the total count of a paginated query on *model* in the
+site cache handler. It depends on the application, the url, the user and
+on *inputs*, the output of :func:`clean_inputs`, without paging parameters.
+Return ``None`` if counts are not cached.'''
+    handler = request.view.cache_handler
+    if handler is not None:
+        inputs = dict(((k, v) for k, v in inputs.items()\
+                       if k not in PAGING_INPUTS))
+        user = request.user
+        user = user.id if user and user.is_authenticated() else None
+        return handler.count_key(model, appmodel.name, request.path, user,
+                                 json.dumps(inputs, sort_keys=True,
+                                            default=str))
+
+
 def paginationResponse(request, query, block=None, toolbox=None,
                        perm_level=None, **kwargs):
     '''Used by :class:`Application` to perform pagination of a query.
@@ -319,6 +415,7 @@ it looks for the following inputs in the request data:
 
 * `sSearch` for performing search
 * `iSortingCols` for sorting.
+* `cursor` for :class:`djpcms.html.Pagination` with ``keyset`` pagination.
 '''
     render = True
     view = request.view
@@ -361,6 +458,8 @@ it looks for the following inputs in the request data:
     sort_by = None
     if pagination.ordering:
         sort_by = pagination.ordering
+    elif pagination.keyset:
+        sort_by = 'id'
     if pagination.astable:
         load_only = appmodel.load_fields(headers)
         for c, v in inputs.get('sort').items():
@@ -384,7 +483,16 @@ it looks for the following inputs in the request data:
     # Pagination
     start = inputs.get('iDisplayStart', 0)
     per_page = inputs.get('iDisplayLength', pagination.size)
-    pag, body = pagination.paginate(query, start, per_page, withbody=needbody)
+    count_key = None
+    if needbody and pagination.ajax and hasattr(query, 'model'):
+        count_key = count_cache_key(request, query.model, appmodel, inputs)
+    total = view.cache_handler.get_count(count_key) if count_key else None
+    pag, body = pagination.paginate(query, start, per_page, withbody=needbody,
+                                    sort_by=sort_by,
+                                    cursor=inputs.get('cursor'), total=total)
+    if count_key and total is None and pag and\
+            not (pagination.keyset and pagination.approximate_count):
+        view.cache_handler.set_count(count_key, pag['total'])
 
     if body is not None and pagination.astable:
         body = appmodel.table_generator(request, toolbox['headers'], body)
@@ -1,6 +1,37 @@
 '''Content edit application and forms'''
 import os
 from djpcms.utils import test
+from djpcms.cms.layout import PageModel, BlockModel
+
+
+class Dummy(object):
+
+    def __init__(self, **kwargs):
+        self.__dict__.update(kwargs)
+
+
+class Block(Dummy, BlockModel):
+    saved = 0
+    page = None
+
+    def save(self):
+        self.saved += 1
+
+
+class Page(PageModel):
+
+    @classmethod
+    def make_block(cls, **kwargs):
+        return Block(plugin_name='', **kwargs)
+
+
+class Mapper(object):
+
+    def __init__(self, blocks):
+        self.blocks = blocks
+
+    def filter(self, page=None):
+        return self.blocks
 
 @test.skipUnless(os.environ['stdcms'], 'Requires stdcms installed')
 class ContentEditApplication(test.TestCaseWidthAdmin):
@@ -89,4 +120,40 @@ class ContentEditApplication(test.TestCaseWidthAdmin):
         self.assertEqual(choices[0][0],'')
         self.assertEqual(choices[0][1],'raw')
 
-            
\ No newline at end of file
+            
+
+class TestRearrange(test.TestCase):
+
+    def blocks(self):
+        blocks = []
+        for column, names in enumerate((('a', 'b', 'c', ''), ('d', ''))):
+            for position, name in enumerate(names):
+                blocks.append(Block(id=len(blocks)+1, plugin_name=name,
+                                    namespace='content', column=column,
+                                    position=position))
+        return blocks
+
+    def rearrange(self, blocks, block, **data):
+        from djpcms.apps.contentedit.blocks import ChangeContentView
+        view = Dummy(mapper=Mapper(blocks), Page=Dummy(model=Page))
+        request = Dummy(instance=block, REQUEST=data, environ={}, view=view)
+        return ChangeContentView.ajax__rearrange(view, request)
+
+    def positions(self, blocks, column):
+        return [b.plugin_name for b in sorted(blocks, key=lambda b: b.position)
+                if b.column == column]
+
+    def testPartialOrder(self):
+        blocks = self.blocks()
+        # the client sends only some of the blocks of column 0
+        self.rearrange(blocks, blocks[2], column='0',
+                       order='block-3,block-1')
+        self.assertEqual(self.positions(blocks, 0), ['c', 'a', 'b', ''])
+        self.assertEqual(sorted(b.position for b in blocks if b.column == 0),
+                         [0, 1, 2, 3])
+
+    def testMoveColumn(self):
+        blocks = self.blocks()
+        self.rearrange(blocks, blocks[4], column='0', order='block-5')
+        self.assertEqual(self.positions(blocks, 0), ['d', 'a', 'b', 'c', ''])
+        self.assertEqual(self.positions(blocks, 1), [''])
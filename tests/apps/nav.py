@@ -0,0 +1,62 @@
+'''Navigation plugin'''
+from djpcms.utils import test
+from djpcms.cms.cache import CacheHandler
+from djpcms.cms.layout import BlockModel
+from djpcms.apps.nav import SoftNavigation
+
+
+class Dummy(object):
+
+    def __init__(self, **kwargs):
+        self.__dict__.update(kwargs)
+
+
+class Block(Dummy, BlockModel):
+    pass
+
+
+class Navigation(SoftNavigation):
+    virtual = True
+    calls = 0
+
+    def render(self, request, **kwargs):
+        self.calls += 1
+        return '<ul>%s</ul>' % request.path
+
+
+class TestSoftNavigation(test.TestCase):
+
+    def request(self, path='/', user=None, handler=None):
+        return Dummy(path=path, user=user,
+                     view=Dummy(cache_handler=handler))
+
+    def testCacheVary(self):
+        plugin = Navigation()
+        self.assertTrue(plugin.cache_timeout > 0)
+        block = Block(id=1, arguments='{}')
+        vary = plugin.cache_vary(self.request(), block)
+        self.assertEqual(plugin.cache_vary(self.request(), block), vary)
+        self.assertNotEqual(plugin.cache_vary(self.request('/a/'), block),
+                            vary)
+        self.assertNotEqual(plugin.cache_vary(
+                            self.request(user=Dummy(id=3)), block), vary)
+
+    def testFragment(self):
+        plugin = Navigation()
+        block = Block(id=1, arguments='{}')
+        handler = CacheHandler(fragments='memory')
+        request = self.request(handler=handler)
+        self.assertEqual(block.render_plugin(request, plugin), '<ul>/</ul>')
+        self.assertEqual(block.render_plugin(request, plugin), '<ul>/</ul>')
+        self.assertEqual(plugin.calls, 1)
+        request = self.request('/a/', handler=handler)
+        self.assertEqual(block.render_plugin(request, plugin), '<ul>/a/</ul>')
+        self.assertEqual(plugin.calls, 2)
+        handler.invalidate_block(block)
+        block.render_plugin(request, plugin)
+        self.assertEqual(plugin.calls, 3)
+        # not cached without a fragment backend
+        request = self.request(handler=CacheHandler())
+        block.render_plugin(request, plugin)
+        block.render_plugin(request, plugin)
+        self.assertEqual(plugin.calls, 5)
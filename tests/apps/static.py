@@ -1,4 +1,9 @@
 '''Application for static files'''
+import os
+import gzip
+import shutil
+import tempfile
+
 import djpcms
 from djpcms.utils import test
 
@@ -22,4 +27,254 @@ class TestStaticMeta(test.TestCase):
         from djpcms.apps.static import FavIconView
         view = FavIconView()
         self.assertEqual(view.path,'/favicon.ico')
-        self.assertFalse(view.isbound)
\ No newline at end of file
+        self.assertFalse(view.isbound)
+
+class Request(object):
+
+    def __init__(self, **environ):
+        self.environ = environ
+
+
+class TestStaticFiles(test.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'text.css')
+        self.data = b''.join((b'body {}' for _ in range(10000)))
+        with open(self.path, 'wb') as f:
+            f.write(self.data)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def serve(self, info=None, stale=None, **environ):
+        from djpcms.apps.static import StaticFileView
+        view = StaticFileView()
+        view.block_size = 1000
+        return view.serve_file(Request(**environ), self.path, info, stale)
+
+    def testParseRange(self):
+        from djpcms.apps.static import parse_range
+        self.assertEqual(parse_range('bytes=0-99', 1000), (0, 99))
+        self.assertEqual(parse_range('bytes=900-', 1000), (900, 999))
+        self.assertEqual(parse_range('bytes=900-2000', 1000), (900, 999))
+        self.assertEqual(parse_range('bytes=-100', 1000), (900, 999))
+        self.assertEqual(parse_range('bytes=-2000', 1000), (0, 999))
+        self.assertEqual(parse_range('bytes=1000-', 1000), False)
+        self.assertEqual(parse_range('bytes=-0', 1000), False)
+        self.assertEqual(parse_range('bytes=10-5', 1000), None)
+        self.assertEqual(parse_range('bytes=0-5,10-20', 1000), None)
+        self.assertEqual(parse_range('items=0-5', 1000), None)
+
+    def testEtagMatches(self):
+        from djpcms.apps.static import etag_matches
+        self.assertTrue(etag_matches('"a"', '"a"'))
+        self.assertTrue(etag_matches('"b", W/"a"', '"a"'))
+        self.assertTrue(etag_matches('*', '"a"'))
+        self.assertFalse(etag_matches('"b"', '"a"'))
+        self.assertFalse(etag_matches(None, '"a"'))
+
+    def testAcceptsGzip(self):
+        from djpcms.apps.static import accepts_gzip
+        self.assertTrue(accepts_gzip({'HTTP_ACCEPT_ENCODING': 'gzip'}))
+        self.assertTrue(accepts_gzip(
+                            {'HTTP_ACCEPT_ENCODING': 'deflate, gzip;q=0.5'}))
+        self.assertFalse(accepts_gzip({'HTTP_ACCEPT_ENCODING': 'gzip;q=0'}))
+        self.assertFalse(accepts_gzip({}))
+
+    def testStream(self):
+        response = self.serve()
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.is_streamed)
+        self.assertEqual(response.headers['Content-Length'],
+                         str(len(self.data)))
+        self.assertEqual(response.headers['Accept-Ranges'], 'bytes')
+        self.assertTrue(response.headers['ETag'])
+        chunks = list(response.content)
+        self.assertEqual(len(chunks), 70)
+        self.assertEqual(b''.join(chunks), self.data)
+
+    def testFileWrapper(self):
+        wrapped = []
+        def file_wrapper(f, block_size):
+            wrapped.append(block_size)
+            f.close()
+            return ()
+        response = self.serve(**{'wsgi.file_wrapper': file_wrapper})
+        self.assertEqual(wrapped, [1000])
+        response = self.serve(**{'wsgi.file_wrapper': file_wrapper,
+                                 'HTTP_RANGE': 'bytes=10-19'})
+        self.assertEqual(wrapped, [1000])
+        self.assertEqual(b''.join(response.content), self.data[10:20])
+
+    def testRange(self):
+        response = self.serve(HTTP_RANGE='bytes=1500-2600')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response.headers['Content-Range'],
+                         'bytes 1500-2600/%s' % len(self.data))
+        self.assertEqual(response.headers['Content-Length'], '1101')
+        self.assertEqual(b''.join(response.content), self.data[1500:2601])
+        response = self.serve(HTTP_RANGE='bytes=70000-')
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response.headers['Content-Range'],
+                         'bytes */%s' % len(self.data))
+        etag = response.headers['ETag']
+        response = self.serve(HTTP_RANGE='bytes=0-9', HTTP_IF_RANGE=etag)
+        self.assertEqual(response.status_code, 206)
+        response = self.serve(HTTP_RANGE='bytes=0-9', HTTP_IF_RANGE='"x"')
+        self.assertEqual(response.status_code, 200)
+
+    def testIfNoneMatch(self):
+        etag = self.serve().headers['ETag']
+        response = self.serve(HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.headers['ETag'], etag)
+        response = self.serve(HTTP_IF_NONE_MATCH='"x"')
+        self.assertEqual(response.status_code, 200)
+
+    def testGzipSibling(self):
+        with gzip.open(self.path + '.gz', 'wb') as f:
+            f.write(self.data)
+        response = self.serve()
+        self.assertEqual(response.headers['Vary'], 'Accept-Encoding')
+        self.assertFalse('Content-Encoding' in response.headers)
+        etag = response.headers['ETag']
+        response = self.serve(HTTP_ACCEPT_ENCODING='gzip, deflate')
+        self.assertEqual(response.headers['Content-Encoding'], 'gzip')
+        self.assertEqual(response.headers['Content-Type'], 'text/css')
+        self.assertNotEqual(response.headers['ETag'], etag)
+        data = b''.join(response.content)
+        self.assertTrue(len(data) < len(self.data))
+        self.assertEqual(gzip.decompress(data), self.data)
+
+    def testChangedFile(self):
+        from djpcms.apps.static import static_file
+        info = static_file(self.path)
+        data = self.data[:100]
+        with open(self.path, 'wb') as f:
+            f.write(data)
+        stale = []
+        response = self.serve(info, lambda: stale.append(True))
+        self.assertEqual(stale, [True])
+        self.assertEqual(response.headers['Content-Length'], '100')
+        self.assertNotEqual(response.headers['ETag'], info.etag)
+        self.assertEqual(b''.join(response.content), data)
+        # an up to date info is used as it is
+        response = self.serve(static_file(self.path),
+                              lambda: stale.append(True))
+        self.assertEqual(stale, [True])
+        self.assertEqual(b''.join(response.content), data)
+
+    def testRemovedFile(self):
+        from djpcms.apps.static import static_file
+        from djpcms.cms import Http404
+        info = static_file(self.path)
+        os.remove(self.path)
+        stale = []
+        self.assertRaises(Http404, self.serve, info,
+                          lambda: stale.append(True))
+        self.assertEqual(stale, [True])
+        self.assertRaises(Http404, self.serve)
+
+
+class Handler(object):
+
+    def __init__(self, absolute_path):
+        self.absolute_path = absolute_path
+
+
+class TestMediaIndex(test.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        os.makedirs(os.path.join(self.directory, 'css', 'images'))
+        for name in ('css/site.css', 'css/site.css.gz', 'css/images/a.png',
+                     'css/.hidden', 'main.js'):
+            with open(os.path.join(self.directory, *name.split('/')),
+                      'wb') as f:
+                f.write(name.encode('utf-8'))
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def testIndex(self):
+        from djpcms.apps.static import MediaIndex
+        index = MediaIndex({'site': Handler(self.directory)})
+        self.assertEqual(len(index), 5)
+        info = index.get('site/css/site.css')
+        self.assertEqual(info.fullpath,
+                         os.path.join(self.directory, 'css', 'site.css'))
+        self.assertEqual(info.size, 12)
+        self.assertEqual(info.mimetype, 'text/css')
+        self.assertTrue(info.etag)
+        self.assertEqual(info.gzip.size, 15)
+        self.assertNotEqual(info.gzip.etag, info.etag)
+        self.assertEqual(index.get('site/main.js').gzip, None)
+        self.assertEqual(index.get('site/css'), None)
+        self.assertEqual(index.listing('site'), (['css'], ['main.js']))
+        self.assertEqual(index.listing('site/css'),
+                         (['images'], ['site.css', 'site.css.gz']))
+        self.assertEqual(index.listing('site/css/images'), ([], ['a.png']))
+        self.assertEqual(index.listing('site/js'), None)
+
+    def testRefresh(self):
+        from djpcms.apps.static import MediaIndex
+        index = MediaIndex({'site': Handler(self.directory)})
+        os.makedirs(os.path.join(self.directory, 'js'))
+        self.assertEqual(index.listing('site/js'), None)
+        self.assertEqual(index.check(), None)
+        index.refresh = 0.001
+        index.built -= 1
+        thread = index.check()
+        self.assertTrue(thread)
+        # the request does not wait for the new index
+        self.assertEqual(index.check(), None)
+        thread.join()
+        self.assertEqual(index.listing('site/js'), ([], []))
+
+    def testMissing(self):
+        from djpcms.apps.static import MediaIndex
+        index = MediaIndex({'site': Handler(self.directory)})
+        path = os.path.join(self.directory, 'new.js')
+        with open(path, 'wb') as f:
+            f.write(b'new')
+        self.assertEqual(len(index), 5)
+        self.assertEqual(index.get('site/new.js').fullpath, path)
+        self.assertEqual(len(index), 6)
+        self.assertEqual(index.get('site/other.js'), None)
+        self.assertEqual(index.get('other/new.js'), None)
+        self.assertEqual(index.get('site/../site/new.js'), None)
+
+    def testDiscard(self):
+        from djpcms.apps.static import MediaIndex
+        index = MediaIndex({'site': Handler(self.directory)})
+        self.assertEqual(index.get('site/main.js').size, 7)
+        with open(os.path.join(self.directory, 'main.js'), 'wb') as f:
+            f.write(b'changed main.js')
+        self.assertEqual(index.get('site/main.js').size, 7)
+        index.discard('site/main.js')
+        self.assertEqual(index.get('site/main.js').size, 15)
+        index.discard('site/other.js')
+
+    def testMediaIndexSettings(self):
+        from djpcms.cms import get_settings
+        from djpcms.apps.static import media_index
+        index1 = media_index(get_settings(MEDIA_INDEX=True,
+                                          MEDIA_INDEX_REFRESH=0))
+        index2 = media_index(get_settings(MEDIA_INDEX=True,
+                                          MEDIA_INDEX_REFRESH=0,
+                                          INSTALLED_APPS=['djpcms.apps.nav']))
+        self.assertNotEqual(index1, index2)
+        self.assertTrue('djpcms' in index1.mapping)
+        self.assertEqual(media_index(get_settings(MEDIA_INDEX=True,
+                                                  MEDIA_INDEX_REFRESH=0)),
+                         index1)
+        self.assertEqual(media_index(get_settings()), None)
+
+    def testStaticFile(self):
+        from djpcms.apps.static import static_file, directory_listing
+        info = static_file(os.path.join(self.directory, 'css', 'site.css'))
+        self.assertEqual(info.size, 12)
+        self.assertTrue(info.gzip)
+        self.assertEqual(directory_listing(self.directory),
+                         (['css'], ['main.js']))
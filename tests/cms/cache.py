@@ -0,0 +1,138 @@
+import os
+import tempfile
+import shutil
+
+from djpcms.utils import test
+from djpcms.cms import Response
+from djpcms.cms.cache import MemoryCache, FileCache, CacheHandler
+
+
+class Dummy(object):
+
+    def __init__(self, **kwargs):
+        self.__dict__.update(kwargs)
+
+
+class BackendMixin(object):
+
+    def testSetGet(self):
+        cache = self.backend()
+        self.assertEqual(cache.get('foo'), None)
+        cache.set('foo', {'bla': 1})
+        self.assertEqual(cache.get('foo'), {'bla': 1})
+        cache.delete('foo')
+        self.assertEqual(cache.get('foo'), None)
+
+    def testExpiry(self):
+        cache = self.backend()
+        cache.set('foo', 'bla', -1)
+        self.assertEqual(cache.get('foo'), None)
+        cache.set('foo', 'bla', 60)
+        self.assertEqual(cache.get('foo'), 'bla')
+        cache.clear()
+        self.assertEqual(cache.get('foo'), None)
+
+
+class TestMemoryCache(BackendMixin, test.TestCase):
+
+    def backend(self):
+        return MemoryCache()
+
+    def testMaxEntries(self):
+        cache = MemoryCache(2)
+        cache.set('a', 1)
+        cache.set('b', 2)
+        cache.get('a')
+        cache.set('c', 3)
+        self.assertEqual(cache.get('a'), 1)
+        self.assertEqual(cache.get('b'), None)
+        self.assertEqual(cache.get('c'), 3)
+
+
+class TestFileCache(BackendMixin, test.TestCase):
+
+    def setUp(self):
+        self.location = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.location)
+
+    def backend(self):
+        return FileCache(self.location)
+
+
+class TestCacheHandler(test.TestCase):
+
+    def request(self, **environ):
+        environ.setdefault('REQUEST_METHOD', 'GET')
+        environ.setdefault('PATH_INFO', '/')
+        environ.setdefault('HTTP_HOST', 'example.com')
+        return self.dummy_request(**environ)
+
+    def testDisabled(self):
+        handler = CacheHandler()
+        self.assertFalse(handler.cacheable(self.request()))
+
+    def testStoreAndGet(self):
+        handler = CacheHandler(backend='memory')
+        request = self.request()
+        self.assertTrue(handler.cacheable(request))
+        self.assertEqual(handler.get_response(request, Response), None)
+        response = Response(content=b'Hello', content_type='text/html')
+        self.assertTrue(handler.set_response(request, response, 60))
+        cached = handler.get_response(self.request(), Response)
+        self.assertEqual(cached.status_code, 200)
+        self.assertEqual(cached.content, (b'Hello',))
+        self.assertEqual(cached.content_type, 'text/html')
+        self.assertEqual(
+            handler.get_response(self.request(QUERY_STRING='a=1'), Response),
+            None)
+
+    def testBypass(self):
+        handler = CacheHandler(backend='memory')
+        self.assertFalse(handler.cacheable(self.request(REQUEST_METHOD='POST')))
+        self.assertFalse(handler.cacheable(
+                self.request(HTTP_X_REQUESTED_WITH='XMLHttpRequest')))
+        response = Response(content=b'Hello')
+        self.assertFalse(handler.set_response(self.request(), response, 0))
+
+    def testFragments(self):
+        handler = CacheHandler(fragments='memory')
+        block = Dummy(id=4, arguments='{"a": 1}')
+        plugin = Dummy(name='text')
+        key = handler.fragment_key(block, plugin)
+        self.assertEqual(handler.fragment_key(block, plugin), key)
+        self.assertNotEqual(handler.fragment_key(block, plugin, 'user1'), key)
+        handler.set_fragment(key, '<p>Hello</p>', 60)
+        self.assertEqual(handler.get_fragment(key), '<p>Hello</p>')
+        handler.invalidate_block(block)
+        self.assertNotEqual(handler.fragment_key(block, plugin), key)
+        block.arguments = '{"a": 2}'
+        self.assertNotEqual(handler.fragment_key(block, plugin), key)
+
+    def testCounts(self):
+        handler = CacheHandler(count_timeout=10)
+        key = handler.count_key(Dummy, 'app', '/items/', None, '{}')
+        self.assertEqual(handler.get_count(key), None)
+        handler.set_count(key, 120)
+        self.assertEqual(handler.get_count(key), 120)
+        self.assertNotEqual(
+            handler.count_key(Dummy, 'app', '/items/', None, '{"a": 1}'), key)
+        handler.invalidate_model(Dummy)
+        key2 = handler.count_key(Dummy, 'app', '/items/', None, '{}')
+        self.assertNotEqual(key2, key)
+        self.assertEqual(handler.get_count(key2), None)
+        self.assertEqual(CacheHandler().count_key(Dummy, 'app'), None)
+
+    def testChoices(self):
+        handler = CacheHandler(choices_timeout=60)
+        key = handler.choices_key(Dummy, 'choices')
+        self.assertEqual(handler.get_choices(key), None)
+        handler.set_choices(key, [(1, 'foo'), (2, 'bla')])
+        self.assertEqual(handler.get_choices(key), [(1, 'foo'), (2, 'bla')])
+        self.assertNotEqual(handler.choices_key(Dummy, 'choices', 4), key)
+        handler.invalidate_model(Dummy)
+        key2 = handler.choices_key(Dummy, 'choices')
+        self.assertNotEqual(key2, key)
+        self.assertEqual(handler.get_choices(key2), None)
+        self.assertEqual(CacheHandler().choices_key(Dummy), None)
@@ -1,9 +1,11 @@
 import time
 from datetime import datetime, timedelta
 
+from djpcms import views, html
 from djpcms.utils import test
 from djpcms.cms import Response
-from djpcms.cms.request import RequestNode, Request, BytesIO
+from djpcms.cms.request import RequestNode, Request, BytesIO, STREAM_ERROR_ID
+from djpcms.media import Media
 
 
 class Http(test.TestCase):
@@ -62,3 +64,51 @@ class Http(test.TestCase):
         self.assertEqual(request.POST, {'name': ['value']})
         self.assertEqual(request.cache['raw_post_data'], b'name=value')
 
+
+
+styled = html.WidgetMaker(tag='div', media=Media(css={'all':
+                                                        ['streamed.css']}))
+
+
+def broken(request):
+    raise ValueError('Broken widget')
+    yield
+
+
+class TestHtmlStreaming(test.TestCase):
+
+    def urls(self, site):
+        return views.Application('/',
+                    routes = (
+                        views.View('/', renderer = lambda request:
+                                   html.Widget('div', 'Hello streaming!')),
+                        views.View('/styled', renderer = lambda request:
+                                   html.Widget(styled, 'Styled')),
+                        views.View('/broken', renderer = lambda request:
+                                   html.Widget('div', broken(request)))),
+                ),
+
+    def testStreamedPage(self):
+        self.site().settings.HTML_STREAMING = True
+        response = self.client().get('/')
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse('content-length' in response.headers)
+        text = response.content_string()
+        self.assertTrue('<div>Hello streaming!</div>' in text)
+        self.assertTrue(text.endswith('</html>'))
+
+    def testLateCss(self):
+        self.site().settings.HTML_STREAMING = True
+        response = self.client().get('/styled')
+        self.assertEqual(response.status_code, 200)
+        text = response.content_string()
+        head, body = text.split('</head>')
+        self.assertFalse('streamed.css' in head)
+        self.assertTrue('streamed.css' in body)
+        self.assertTrue(body.index('Styled') < body.index('streamed.css'))
+
+    def testError(self):
+        self.site().settings.HTML_STREAMING = True
+        # The chunked response is aborted rather than terminated
+        content = lambda: self.client().get('/broken').content_string()
+        self.assertRaises(ValueError, content)
@@ -30,4 +30,82 @@ class TestSites(test.TestCase):
         self.assertRaises(ValueError, p.authenticate_and_login, {})
         self.assertRaises(ValueError, p.create_user)
         self.assertRaises(ValueError, p.set_password, 'luca', 'bla')
-        
\ No newline at end of file
+        
+
+
+class Item(object):
+
+    def __init__(self, id):
+        self.id = id
+
+
+class User(Item):
+    pass
+
+
+class CountingHandler(permissions.PermissionHandler):
+
+    def __init__(self):
+        super(CountingHandler, self).__init__({})
+        self.calls = []
+
+    def has(self, request, perm_code, instance=None, model=None, user=None):
+        self.calls.append(('has', instance))
+        return instance is None or not instance.id or instance.id % 2 == 0
+
+    def has_many(self, request, perm_code, instances, model=None, user=None):
+        self.calls.append(('has_many', tuple(instances)))
+        return [instance.id % 2 == 0 for instance in instances]
+
+
+class FakeRequest(object):
+    path = '/'
+
+
+class TestPermissionCache(test.TestCase):
+
+    def cache(self):
+        from djpcms.cms.request import RequestCache
+        return RequestCache(FakeRequest())
+
+    def testHasMany(self):
+        p = permissions.PermissionHandler({})
+        self.assertEqual(p.has_many(None, permissions.VIEW,
+                                    [Item(1), Item(2)]), [True, True])
+
+    def testHasPermission(self):
+        cache, p, user = self.cache(), CountingHandler(), User(1)
+        item = Item(3)
+        self.assertFalse(cache.has_permission(p, None, permissions.VIEW, item,
+                                              Item, user))
+        self.assertFalse(cache.has_permission(p, None, permissions.VIEW,
+                                              Item(3), Item, User(1)))
+        self.assertEqual(len(p.calls), 1)
+        # different code, user or instance
+        cache.has_permission(p, None, permissions.CHANGE, item, Item, user)
+        cache.has_permission(p, None, permissions.VIEW, item, Item, User(2))
+        cache.has_permission(p, None, permissions.VIEW, item, Item, None)
+        self.assertTrue(cache.has_permission(p, None, permissions.VIEW,
+                                             Item(4), Item, user))
+        self.assertEqual(len(p.calls), 5)
+        # instances without id are not cached
+        cache.has_permission(p, None, permissions.VIEW, Item(None), Item, user)
+        cache.has_permission(p, None, permissions.VIEW, Item(None), Item, user)
+        self.assertEqual(len(p.calls), 7)
+
+    def testHasPermissions(self):
+        cache, p, user = self.cache(), CountingHandler(), User(1)
+        cache.has_permission(p, None, permissions.VIEW, Item(2), Item, user)
+        items = [Item(i) for i in range(1, 6)]
+        self.assertEqual(cache.has_permissions(p, None, permissions.VIEW,
+                                               items, Item, user),
+                         [False, True, False, True, False])
+        self.assertEqual(len(p.calls), 2)
+        self.assertEqual(p.calls[1][0], 'has_many')
+        self.assertEqual(len(p.calls[1][1]), 4)
+        self.assertEqual(cache.has_permissions(p, None, permissions.VIEW,
+                                               items, Item, user),
+                         [False, True, False, True, False])
+        self.assertTrue(cache.has_permission(p, None, permissions.VIEW,
+                                             Item(4), Item, user))
+        self.assertEqual(len(p.calls), 2)
@@ -0,0 +1,91 @@
+import os
+import json
+import shutil
+import tempfile
+
+from djpcms import views, html
+from djpcms.utils import test
+from djpcms.cms.profiler import _sessions, ModuleGroups, profile_data,\
+                                ProfileSession
+
+
+class TestProfileData(test.TestCase):
+
+    def testModuleGroups(self):
+        groups = ModuleGroups(('djpcms', 'myapp.blog'))
+        self.assertEqual(groups('/home/me/myapp/blog/views.py'),
+                         ('myapp', 'blog/views.py'))
+        self.assertEqual(groups('/usr/lib/site-packages/foo/bla.py'),
+                         ('foo', 'bla.py'))
+        self.assertEqual(groups('~'), ('other', '~'))
+        self.assertTrue('~' in groups.cache)
+
+    def testMergedStats(self):
+        session = ProfileSession('/foo/', requests=2)
+        self.assertFalse(session.start())
+        session.run(lambda: json.dumps(list(range(100))))
+        self.assertTrue(session.start())
+        session.run(lambda: json.dumps(list(range(100))))
+        self.assertEqual(session.profiled, 2)
+        data = profile_data(session.stats, {'INSTALLED_APPS': ('json',)})
+        data = json.loads(json.dumps(data))
+        functions = data['functions']
+        self.assertTrue(functions)
+        self.assertEqual(sum((f['totcalls'] for f in functions)),
+                         data['total_calls'])
+        dumps = [f for f in functions if f['function'] == 'dumps']
+        self.assertEqual(dumps[0]['calls'], 2)
+        self.assertEqual(dumps[0]['module'], 'json')
+        modules = dict(((m['module'], m) for m in data['modules']))
+        self.assertTrue('json' in modules)
+        limited = profile_data(session.stats, {}, limit=1)
+        self.assertEqual(len(limited['functions']), 1)
+
+
+class TestProfileRequests(test.TestCase):
+
+    def urls(self, site):
+        return views.Application('/',
+                    routes = (
+                        views.View('/', renderer = lambda request:
+                                   html.Widget('div', 'Hello profiler!')),)
+                ),
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        settings = self.site().settings
+        settings.PROFILING_KEY = 'prof'
+        settings.PROFILING_DIRECTORY = self.directory
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def testJson(self):
+        client = self.client()
+        response = client.get('/?prof=2,json')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue('Hello profiler!' in response.content_string())
+        self.assertTrue('/?2,json' in _sessions)
+        # requests without the profiling key are not part of the session
+        response = client.get('/')
+        self.assertTrue('Hello profiler!' in response.content_string())
+        self.assertEqual(_sessions['/?2,json'].started, 1)
+        response = client.get('/?prof=2,json')
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse('/?2,json' in _sessions)
+        data = json.loads(response.content_string())
+        self.assertEqual(data['requests'], 2)
+        self.assertTrue(data['functions'])
+        self.assertTrue(os.path.isfile(data['file']))
+        self.assertEqual(os.listdir(self.directory),
+                         [os.path.basename(data['file'])])
+
+    def testTimeout(self):
+        client = self.client()
+        client.get('/?prof=3,json')
+        session = _sessions['/?3,json']
+        session.created -= 1000
+        response = client.get('/?prof=3,json')
+        self.assertTrue('Hello profiler!' in response.content_string())
+        self.assertFalse(_sessions['/?3,json'] is session)
+        _sessions.clear()
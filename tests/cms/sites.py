@@ -1,6 +1,16 @@
+import os
+
 from djpcms import views, cms
 from djpcms.utils.httpurl import zip
-from djpcms.utils import test
+from djpcms.utils import test, orms
+
+
+class Portfolio(orms.Model):
+    pass
+
+
+class Book(orms.Model):
+    pass
 
     
 class TestSites(test.TestCase):
@@ -63,4 +73,64 @@ class TestSites(test.TestCase):
         self.assertFalse(site.isbound)
         self.assertRaises(cms.ImproperlyConfigured, site.load)
         self.assertFalse(site.isbound)
-        
\ No newline at end of file
+        
+
+@test.skipUnless(os.environ.get('stdcms'), "Requires stdcms installed")
+class TestModelIndex(test.TestCase):
+    installed_apps = ('stdcms',)
+
+    def testNestedSites(self):
+        from djpcms.apps.vanilla import Application
+        from tests.models import Portfolio, Book
+        site = cms.Site(cms.get_settings(INSTALLED_APPS=self.installed_apps))
+        admin = site.addsite(route='/admin/', APPLICATION_URLS=lambda s:
+                    (Application('/portfolio/', Portfolio),
+                     Application('/book/', Book)))
+        site.routes.append(Application('/portfolio/', Portfolio))
+        site.load()
+        root_app = site[1]
+        admin_portfolio, admin_book = admin[0], admin[1]
+        self.assertEqual(site.for_model(Portfolio), root_app)
+        self.assertEqual(site.for_model(Portfolio, all=True),
+                         [root_app, admin_portfolio])
+        self.assertEqual(site.for_model(Book), admin_book)
+        self.assertEqual(admin.for_model(Portfolio), admin_portfolio)
+        self.assertEqual(admin.for_model(Portfolio, all=True),
+                         [admin_portfolio, root_app])
+        self.assertEqual(admin.for_model(Book, all=True), [admin_book])
+        self.assertEqual(site.for_model(None), None)
+        self.assertEqual(site.for_hash('foo'), None)
+
+
+class TestPlainModelIndex(test.TestCase):
+
+    def site(self):
+        site = cms.Site(cms.get_settings())
+        admin = site.addsite(route='/admin/', APPLICATION_URLS=lambda s:
+                    (views.Application('/portfolio/', Portfolio),
+                     views.Application('/book/', Book)))
+        site.routes.append(views.Application('/portfolio/', Portfolio))
+        site.load()
+        return site, admin
+
+    def testNestedSites(self):
+        site, admin = self.site()
+        root_app = site[1]
+        admin_portfolio, admin_book = admin[0], admin[1]
+        self.assertEqual(site.for_model(Portfolio), root_app)
+        self.assertEqual(site.for_model(Portfolio, all=True),
+                         [root_app, admin_portfolio])
+        self.assertEqual(site.for_model(Book), admin_book)
+        self.assertEqual(admin.for_model(Portfolio), admin_portfolio)
+        self.assertEqual(admin.for_model(Portfolio, all=True),
+                         [admin_portfolio, root_app])
+        self.assertEqual(admin.for_model(Book, all=True), [admin_book])
+        self.assertEqual(root_app.for_model(Book), admin_book)
+
+    def testLazyIndex(self):
+        site, admin = self.site()
+        site._clear_model_index()
+        self.assertFalse('model_index' in admin.local)
+        self.assertEqual(admin.for_model(Portfolio), admin[0])
+        self.assertTrue('model_index' in site.local)
+        self.assertEqual(site.for_model(Book, start=False), admin[1])
@@ -0,0 +1,96 @@
+import time
+
+from djpcms import views, html
+from djpcms.utils import test
+from djpcms.cms import Response
+from djpcms.cms.timing import RequestTimer, TimingHandler
+
+
+class Dummy(object):
+
+    def __init__(self, **kwargs):
+        self.__dict__.update(kwargs)
+
+
+class TestRequestTimer(test.TestCase):
+
+    def testPhases(self):
+        timer = RequestTimer()
+        with timer('resolve'):
+            time.sleep(0.01)
+        with timer('view'):
+            pass
+        with timer('resolve'):
+            pass
+        phases = dict(timer.items())
+        self.assertEqual([p for p, d in timer.items()], ['resolve', 'view'])
+        self.assertTrue(phases['resolve'] >= 0.01)
+        self.assertTrue(timer.total() >= phases['resolve'])
+
+    def testHeader(self):
+        timer = RequestTimer()
+        timer.add('resolve', 0.0015)
+        timer.add('wait', 0.5)
+        header = timer.header()
+        bits = header.split(', ')
+        self.assertEqual(bits[0], 'resolve;dur=1.50')
+        self.assertEqual(bits[1], 'wait;dur=500.00')
+        self.assertTrue(bits[2].startswith('total;dur='))
+
+
+class TestTimingHandler(test.TestCase):
+
+    def request(self, path):
+        return Dummy(view=Dummy(path=path))
+
+    def testDisabled(self):
+        handler = TimingHandler(enabled=False, header=False)
+        response = Response()
+        handler.add_header(response, RequestTimer())
+        self.assertFalse('Server-Timing' in response.headers)
+        handler.record(self.request('/'), RequestTimer())
+        self.assertEqual(handler.stats(), [])
+
+    def testHistogram(self):
+        handler = TimingHandler(enabled=True, buckets=(10, 100))
+        for duration in (0.001, 0.05, 0.05, 1):
+            timer = RequestTimer()
+            timer.add('view', duration)
+            timer.start -= duration
+            handler.record(self.request('/foo/'), timer)
+        handler.record(self.request('/'), RequestTimer())
+        stats = handler.stats()
+        self.assertEqual(len(stats), 2)
+        foo = stats[0]
+        self.assertEqual(foo['path'], '/foo/')
+        self.assertEqual(foo['count'], 4)
+        self.assertEqual(foo['histogram'], [1, 2, 1])
+        self.assertAlmostEqual(foo['phases']['view'], 1.101)
+        self.assertTrue(foo['max'] >= 1)
+        self.assertEqual(handler.get('/').count, 1)
+        handler.clear()
+        self.assertEqual(handler.stats(), [])
+
+
+class TestServerTiming(test.TestCase):
+
+    def urls(self, site):
+        return views.Application('/',
+                    routes = (
+                        views.View('/', renderer = lambda request:
+                                   html.Widget('div', 'Hello timing!')),)
+                ),
+
+    def testHeader(self):
+        site = self.site()
+        site.timing.clear()
+        response = self.client().get('/')
+        self.assertEqual(response.status_code, 200)
+        header = response.headers['server-timing']
+        metrics = [m.split(';')[0] for m in header.split(', ')]
+        for phase in ('page_tree', 'resolve', 'request', 'permission',
+                      'view', 'render', 'html', 'total'):
+            self.assertTrue(phase in metrics)
+        view = site.timing.get('/')
+        self.assertEqual(view.count, 1)
+        self.assertTrue('view' in view.phases)
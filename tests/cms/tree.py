@@ -0,0 +1,107 @@
+'''Non recombining trees and multi trees'''
+from djpcms.utils import test
+from djpcms.cms import Route
+from djpcms.cms.tree import NRT, MultiTree
+
+
+class Dummy(object):
+
+    def __init__(self, **kwargs):
+        self.__dict__.update(kwargs)
+
+
+def view(rule):
+    route = Route(rule)
+    return Dummy(route=route, path=route.path)
+
+
+class Tree(MultiTree):
+
+    def node(self, node, urlargs=None):
+        return node
+
+
+def scan_children(multi, route, urlargs=None):
+    '''Children of *route* found by scanning every node of the trees.'''
+    path = route.path
+    url = route.safe_url(urlargs)
+    level = route.level
+    for tree in multi.trees:
+        if path in tree:
+            for child in tree[path].children:
+                yield child
+        elif url:
+            for child in tree.nodes():
+                if child.level == level+1 and not child.parent:
+                    match = child.route.split()[0].match(url[1:])
+                    if match is not None and '__remaining__' not in match:
+                        yield child
+
+
+paths = lambda nodes: sorted((n.path for n in nodes))
+
+
+class TestOrphans(test.TestCase):
+    site = Dummy(settings={})
+    rules = ('', 'a/', 'a/b/c/', 'a/b/d/', 'x/y/', 'x/y/z/w/', 'p/q/r/',
+             'blog/<id>/edit/', 'blog/<id>/view/', 'blog/<id>/<slug>/tags/',
+             'a/b/<id>/c/', 'u/<int:id>/v/')
+    # flat pages with the parents of nodes in the application tree
+    pages = ('a/b/', 'x/', 'p/q/', 'blog/')
+
+    def testIndex(self):
+        tree = NRT([view(r) for r in self.rules], site=self.site)
+        indexed = []
+        for bits, nodes in tree._orphans.items():
+            for node in nodes:
+                self.assertEqual(node.parent, None)
+                self.assertEqual(node.route.bits[:-1], bits)
+                indexed.append(node)
+        for bits, nodes in tree._dynamic_orphans.items():
+            for route, node in nodes:
+                self.assertEqual(node.parent, None)
+                self.assertEqual(route.bits[:len(bits)], bits)
+                self.assertTrue(route.arguments)
+                indexed.append(node)
+        self.assertEqual(paths(indexed),
+                         paths((n for n in tree.nodes()\
+                                if n.level and n.parent is None)))
+        self.assertEqual(paths(tree.orphans(('a', 'b'))),
+                         ['/a/b/c/', '/a/b/d/'])
+        self.assertEqual(tree.orphans(('a',)), ())
+
+    def testChildren(self):
+        apps = NRT([view(r) for r in self.rules], site=self.site)
+        pages = NRT([view(r) for r in self.pages])
+        multi = Tree(pages, apps)
+        for rule in self.rules + self.pages + ('x/y/z/', 'foo/'):
+            route = Route(rule)
+            self.assertEqual(paths(multi.children(route)),
+                             paths(scan_children(multi, route)))
+        # parents added by the pages tree
+        self.assertEqual(paths(multi.children(Route('a/b/'))),
+                         ['/a/b/c/', '/a/b/d/'])
+        self.assertEqual(paths(multi.children(Route('x/'))), ['/x/y/'])
+        self.assertEqual(paths(multi.children(Route('a/'))), ['/a/b/'])
+
+    def testDynamicChildren(self):
+        apps = NRT([view(r) for r in self.rules], site=self.site)
+        pages = NRT([view(r) for r in self.pages])
+        multi = Tree(pages, apps)
+        for rule, urlargs in (('blog/<id>/', {'id': '5'}),
+                              ('blog/<id>/<slug>/', {'id': '5', 'slug': 'x'}),
+                              ('a/b/<id>/', {'id': 'c'}),
+                              ('u/<int:id>/', {'id': 3}),
+                              ('u/<id>/', {'id': 'foo'})):
+            route = Route(rule)
+            self.assertEqual(paths(multi.children(route, urlargs)),
+                             paths(scan_children(multi, route, urlargs)))
+        self.assertEqual(paths(apps.orphans(('blog', '5'))),
+                         ['/blog/<id>/edit/', '/blog/<id>/view/'])
+        self.assertEqual(paths(apps.orphans(('blog', '5', 'x'))),
+                         ['/blog/<id>/<slug>/tags/'])
+        self.assertEqual(paths(apps.orphans(('u', '3'))), ['/u/<int:id>/v/'])
+        self.assertEqual(apps.orphans(('u', 'foo')), ())
+        # a static parent route is not matched by dynamic routes
+        self.assertEqual(paths(apps.orphans(('a', 'b'))),
+                         ['/a/b/c/', '/a/b/d/'])
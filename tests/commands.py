@@ -27,6 +27,31 @@ class CommandTests(test.TestCase):
         command()
         self.assertEqual(command.theme, 'teststyle')
         os.remove(command.target)
+
+    def testStyleAll(self):
+        command = self.fetch_command('style', ['--all', '-w', '1',
+                                               '--minify'])
+        results = command()
+        themes = [r[0] for r in results]
+        self.assertTrue('sea' in themes)
+        for theme, target, size, taken in results:
+            self.assertTrue(target.endswith('%s.css' % theme))
+            self.assertEqual(os.path.getsize(target), size)
+            os.remove(target)
+
+    def testStyleAllWorkers(self):
+        outputs = []
+        for workers in ('1', '2'):
+            command = self.fetch_command('style', ['--all', '-w', workers])
+            output = {}
+            for theme, target, size, taken in command():
+                with open(target) as f:
+                    output[theme] = f.read()
+                self.assertEqual(os.path.getsize(target), size)
+                os.remove(target)
+            outputs.append(output)
+        self.assertTrue(len(outputs[0]) > 1)
+        self.assertEqual(outputs[0], outputs[1])
         
     def test_nginx(self):
         command = self.fetch_command('nginx')
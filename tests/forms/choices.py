@@ -0,0 +1,129 @@
+from djpcms import forms
+from djpcms.utils import test, orms
+from djpcms.cms.cache import CacheHandler
+
+
+class Dummy(object):
+
+    def __init__(self, **kwargs):
+        self.__dict__.update(kwargs)
+
+
+class Item(orms.Model):
+
+    def __init__(self, id, name):
+        self.id = id
+        self.name = name
+
+    def __unicode__(self):
+        return self.name
+
+    @classmethod
+    def filter(cls, id__in=()):
+        return [item for item in items if str(item.id) in id__in]
+
+
+items = [Item(1, 'foo'), Item(2, 'bla'), Item(3, 'pippo')]
+
+
+class ItemQuery(object):
+    model = Item
+
+    def __init__(self):
+        self.iterations = 0
+
+    def __iter__(self):
+        self.iterations += 1
+        return iter(items)
+
+    def count(self):
+        return len(items)
+
+
+class Choices(object):
+    '''Choices which can change between requests'''
+    def __init__(self, *choices):
+        self.choices = list(choices)
+
+    def __iter__(self):
+        return iter(self.choices)
+
+
+class TestModelChoices(test.TestCase):
+
+    def bfield(self, handler=None, autocomplete=True):
+        handler = handler or CacheHandler(choices_timeout=60,
+                                          count_timeout=10)
+        view = Dummy(cache_handler=handler)
+        root_view = Dummy()
+        if autocomplete:
+            root_view.ajax__autocomplete = lambda request: None
+        app = Dummy(root_view=root_view)
+        request = Dummy(view=view, app_for_model=lambda m: app,
+                        for_app=lambda app: Dummy(url='/items/'))
+        return Dummy(request=request)
+
+    def testCachedChoices(self):
+        query = ItemQuery()
+        choices = forms.ChoiceFieldOptions(query=query)
+        bfield = self.bfield()
+        self.assertEqual(list(choices.all(bfield)),
+                         [(1, 'foo'), (2, 'bla'), (3, 'pippo')])
+        self.assertEqual(len(list(choices.all(bfield))), 3)
+        self.assertEqual(query.iterations, 1)
+        bfield.request.view.cache_handler.invalidate_model(Item)
+        self.assertEqual(len(list(choices.all(bfield))), 3)
+        self.assertEqual(query.iterations, 2)
+
+    def testAutocomplete(self):
+        choices = forms.ChoiceFieldOptions(query=ItemQuery(), max_options=2)
+        bfield = self.bfield()
+        self.assertTrue(choices.use_autocomplete(bfield))
+        self.assertEqual(list(choices.all(bfield)), [])
+        choices = forms.ChoiceFieldOptions(query=ItemQuery(), max_options=3)
+        self.assertFalse(choices.use_autocomplete(self.bfield()))
+        choices = forms.ChoiceFieldOptions(query=ItemQuery(), max_options=2,
+                                           autocomplete=False)
+        self.assertFalse(choices.use_autocomplete(bfield))
+
+    def testAutocompleteStored(self):
+        lookups = []
+        def for_app(app):
+            lookups.append(app)
+            return Dummy(url='/items/')
+        choices = forms.ChoiceFieldOptions(query=ItemQuery(), max_options=2)
+        bfield = self.bfield()
+        bfield.request.for_app = for_app
+        self.assertTrue(choices.use_autocomplete(bfield))
+        self.assertEqual(list(choices.all(bfield)), [])
+        self.assertTrue(choices.use_autocomplete(bfield))
+        self.assertEqual(len(lookups), 1)
+        self.assertEqual(bfield._autocomplete_url, '/items/')
+
+    def testAutocompleteNotSupported(self):
+        # the root view of the application does not handle autocomplete
+        choices = forms.ChoiceFieldOptions(query=ItemQuery(), max_options=2)
+        bfield = self.bfield(autocomplete=False)
+        self.assertFalse(choices.use_autocomplete(bfield))
+        self.assertEqual(len(list(choices.all(bfield))), 3)
+        self.assertEqual(choices.url(bfield.request), None)
+
+    def testCleanSimple(self):
+        query = Choices(('a', 'A'))
+        choices = forms.ChoiceFieldOptions(query=query)
+        bfield = self.bfield()
+        self.assertEqual(choices.clean('a', bfield), 'a')
+        self.assertRaises(forms.ValidationError, choices.clean, 'b', bfield)
+        query.choices.append(('b', 'B'))
+        self.assertEqual(choices.clean('b', bfield), 'b')
+        choices = forms.ChoiceFieldOptions(query=(('a', 'A'), ('b', 'B')))
+        self.assertEqual(choices.clean('b', bfield), 'b')
+        self.assertEqual(choices._values, frozenset(('a', 'b')))
+
+    def testCleanMultiple(self):
+        choices = forms.ChoiceFieldOptions(query=ItemQuery(), multiple=True)
+        bfield = self.bfield()
+        self.assertEqual(choices.clean(['1', '3'], bfield),
+                         [items[0], items[2]])
+        self.assertRaises(forms.ValidationError, choices.clean, ['1', '9'],
+                          bfield)
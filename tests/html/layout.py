@@ -1,6 +1,37 @@
 from djpcms.utils import test
 from djpcms import html
 from djpcms.html.layout import *
+from djpcms.html.layout import grid_system, namespace_columns, deque,\
+                                columns_deque, normalise_columns
+from djpcms.cms.layout import PageModel, BlockModel
+
+
+class Dummy(object):
+
+    def __init__(self, **kwargs):
+        self.__dict__.update(kwargs)
+
+
+class Block(Dummy, BlockModel):
+    saved = 0
+    deleted = False
+
+    def save(self):
+        self.saved += 1
+
+    def delete(self):
+        self.deleted = True
+
+
+class Page(PageModel):
+
+    @classmethod
+    def make_block(cls, **kwargs):
+        return Block(plugin_name='', **kwargs)
+
+    @classmethod
+    def blocks(cls, pageobj):
+        return pageobj.blocks
 
 
 class TestLayout(test.TestCase):
@@ -65,6 +96,112 @@ class TestLayout(test.TestCase):
         self.assertTrue("<div class='span4'>one</div>" in text)
         self.assertTrue("<div class='span4'>two</div>" in text)
         self.assertTrue("<div class='span4'>three</div>" in text)
+
+    def testCompiledGrid(self):
+        g = grid('grid 33-66')
+        self.assertTrue(g.is_static())
+        compiled = g.compiled(grid_system(True, 12))
+        self.assertEqual(compiled, g.compiled(grid_system(True, 12)))
+        self.assertNotEqual(compiled, g.compiled(grid_system(False, 12)))
+        self.assertEqual(len(compiled.parts), 5)
+        self.assertTrue('grid-container-12' in compiled.parts[0])
+        self.assertTrue('row-12' in compiled.parts[0])
+        self.assertTrue(isinstance(compiled.parts[1], column))
+        columns = deque(((0, ['one']), (1, ['two'])))
+        w = compiled()
+        text = w.render(context={'columns': namespace_columns(None, columns)})
+        self.assertTrue("<div class='span4'>one</div>" in text)
+        self.assertTrue("<div class='span8'>two</div>" in text)
         
-        
-        
\ No newline at end of file
+    def testNestedGridNotCompiled(self):
+        g = Grid(row(column(1, 2, grid('grid 100')), column(1, 2)))
+        self.assertFalse(g.is_static())
+        self.assertEqual(g.compiled(grid_system(True, 12)), None)
+
+
+
+class TestColumns(test.TestCase):
+
+    def request(self, page_editing=False):
+        return Dummy(view=Dummy(Page=Dummy(model=Page)), page=Dummy(),
+                     page_editing=page_editing)
+
+    def blocks(self, *plugins):
+        return dict(((p, Block(plugin_name=name, position=p, column=0))\
+                     for p, name in enumerate(plugins)))
+
+    def testRenumberBlocks(self):
+        blocks = self.blocks('a', '', 'b')
+        blocks[2].position = 5
+        new_blocks = Page.renumber_blocks([blocks[p] for p in (0, 1, 2)],
+                                          column=1)
+        self.assertEqual([b.plugin_name for b in new_blocks], ['a', 'b', ''])
+        self.assertEqual([b.position for b in new_blocks], [0, 1, 2])
+        self.assertEqual([b.column for b in new_blocks], [1, 1, 1])
+        self.assertTrue(blocks[1].deleted)
+        self.assertEqual(blocks[0].saved, 1)
+        self.assertEqual(new_blocks[2].saved, 1)
+
+    def testRenderDoesNotWrite(self):
+        blocks = self.blocks('a', '', 'b')
+        all_columns = {'content': {0: blocks}}
+        g = grid('grid 50-50')
+        columns = columns_deque(self.request(), 'content', all_columns, g)
+        self.assertEqual(len(columns.columns), 2)
+        col, col_blocks = columns.columns[0]
+        self.assertEqual([b.plugin_name for b in col_blocks], ['a', 'b'])
+        col, col_blocks = columns.columns[1]
+        self.assertEqual(len(col_blocks), 1)
+        self.assertEqual(col_blocks[0].saved, 0)
+        for block in blocks.values():
+            self.assertEqual(block.saved, 0)
+            self.assertFalse(block.deleted)
+
+    def testPageEditing(self):
+        blocks = self.blocks('a', '', 'b')
+        all_columns = {'content': {0: blocks}}
+        g = grid('grid 100')
+        columns = columns_deque(self.request(True), 'content', all_columns, g)
+        col, col_blocks = columns.columns[0]
+        self.assertEqual([b.plugin_name for b in col_blocks], ['a', 'b'])
+        self.assertFalse(blocks[1].deleted)
+
+    def testContainerColumns(self):
+        layout = page(container('header', grid('grid 100')),
+                      container('content'),
+                      container('footer', grid('grid 33-33-33')))
+        self.assertEqual(layout.container_columns(),
+                         {'header': 1, 'content': 1, 'footer': 3})
+        pageobj = Dummy(inner_grid=grid('grid 50-50'))
+        self.assertEqual(layout.container_columns(pageobj)['content'], 2)
+
+    def testNormaliseColumns(self):
+        blocks = self.blocks('a', '', 'b')
+        for block in blocks.values():
+            block.namespace = 'content'
+        footer = Block(plugin_name='', position=0, column=0,
+                       namespace='footer')
+        pageobj = Dummy(blocks=list(blocks.values()) + [footer])
+        request = self.request()
+        normalise_columns(request, pageobj, {'content': 2, 'footer': 1})
+        self.assertTrue(blocks[1].deleted)
+        self.assertEqual((blocks[2].position, blocks[2].saved), (1, 1))
+        self.assertEqual(footer.saved, 0)
+
+    def testRenumberColumns(self):
+        batches = []
+        class BatchBlock(Block):
+            @classmethod
+            def save_blocks(cls, save, delete=()):
+                batches.append((list(save), list(delete)))
+        a, b, e0 = [BatchBlock(plugin_name=n, position=p, column=0)\
+                    for p, n in enumerate(('a', 'b', ''))]
+        e1 = BatchBlock(plugin_name='', position=0, column=1)
+        columns = Page.renumber_columns({0: [a, e0], 1: [b, e1]})
+        self.assertEqual(columns[0], [a, e0])
+        self.assertEqual(columns[1], [b, e1])
+        self.assertEqual((b.column, b.position), (1, 0))
+        self.assertEqual((e0.position, e1.position), (1, 1))
+        self.assertEqual(len(batches), 1)
+        self.assertEqual(len(batches[0][0]), 3)
+
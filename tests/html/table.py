@@ -61,4 +61,107 @@ class TestTable(test.TestCase):
         self.assertTrue('<td>pluto</td><td>4</td>' in ht)
         self.assertTrue('<td>luna</td><td>1</td>' in ht)
         
-    
\ No newline at end of file
+    
+
+class Item(object):
+
+    def __init__(self, id, value):
+        self.id = id
+        self.value = value
+
+
+class Query(object):
+    '''A minimal sorted query supporting keyset pagination lookups. Like
+most backends it does not guarantee the order of rows with the same sort
+value.'''
+    ops = {'': lambda a, b: a == b,
+           'gt': lambda a, b: a > b,
+           'lt': lambda a, b: a < b}
+
+    def __init__(self, items):
+        self.items = items
+
+    def count(self):
+        return len(self.items)
+
+    def filter(self, **kwargs):
+        items = self.items
+        for lookup, value in kwargs.items():
+            name, _, op = lookup.partition('__')
+            op = self.ops[op]
+            items = [i for i in items if op(getattr(i, name), value)]
+        return Query(items)
+
+    def sort_by(self, field):
+        desc = field.startswith('-')
+        field = field[1:] if desc else field
+        # shuffle rows with the same value
+        items = sorted(self.items, key=lambda i: (i.id*7) % 10)
+        return Query(sorted(items, key=lambda i: getattr(i, field),
+                            reverse=desc))
+
+    def __getitem__(self, slic):
+        return self.items[slic]
+
+
+class TestKeysetPagination(test.TestCase):
+
+    def query(self):
+        values = (1, 2, 2, 2, 3, 4, 5, 5, 6, 7)
+        return Query([Item(i, v) for i, v in enumerate(values)]).sort_by('value')
+
+    def testCursors(self):
+        p = html.Pagination(keyset=True, size=3)
+        query = self.query()
+        pag, rows = p.paginate(query, sort_by='value')
+        self.assertEqual([r.id for r in rows], [0, 1, 2])
+        self.assertEqual(pag['total'], 10)
+        self.assertEqual(pag['prev'], None)
+        self.assertTrue(pag['next'])
+        seen = [r.id for r in rows]
+        while pag['next']:
+            pag, rows = p.paginate(query, start=len(seen), sort_by='value',
+                                   cursor=pag['next'])
+            seen.extend((r.id for r in rows))
+        self.assertEqual(seen, list(range(10)))
+        pag, rows = p.paginate(query, start=6, sort_by='value',
+                               cursor=pag['prev'])
+        self.assertEqual([r.id for r in rows], [6, 7, 8])
+
+    def testInvalidCursor(self):
+        p = html.Pagination(keyset=True, size=3, approximate_count=True)
+        pag, rows = p.paginate(self.query(), sort_by='value', cursor='xxx')
+        self.assertEqual([r.id for r in rows], [0, 1, 2])
+        self.assertEqual(pag['total'], 6)
+
+    def testSortOrderChange(self):
+        p = html.Pagination(keyset=True, size=3)
+        pag, rows = p.paginate(self.query(), sort_by='value')
+        query = self.query().sort_by('-value')
+        # a cursor created for ascending order is not valid in descending
+        pag, rows = p.paginate(query, sort_by='-value', cursor=pag['next'])
+        self.assertEqual([r.value for r in rows], [7, 6, 5])
+
+    def testTies(self):
+        values = (1, 1, 1, 1, 1, 2, 2, 2, 2, 3)
+        items = [Item(i, v) for i, v in enumerate(values)]
+        p = html.Pagination(keyset=True, size=2)
+        for sort_by in ('value', '-value'):
+            query = Query(items).sort_by(sort_by)
+            pag, rows = p.paginate(query, sort_by=sort_by)
+            pages = [[r.id for r in rows]]
+            while pag['next']:
+                pag, rows = p.paginate(query, sort_by=sort_by,
+                                       cursor=pag['next'])
+                pages.append([r.id for r in rows])
+            expected = list(range(10))
+            if sort_by == '-value':
+                expected.reverse()
+            self.assertEqual(sum(pages, []), expected)
+            # and back to the first page
+            back = [[r.id for r in rows]]
+            while pag['prev']:
+                pag, rows = p.paginate(query, start=2, sort_by=sort_by,
+                                       cursor=pag['prev'])
+                back.insert(0, [r.id for r in rows])
+            self.assertEqual(back, pages)
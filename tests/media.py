@@ -0,0 +1,96 @@
+import os
+import sys
+import time
+import tempfile
+import shutil
+
+from djpcms.media import Media
+from djpcms.media.bundle import rewrite_css_urls, is_bundle
+from djpcms.cms.conf import Config
+from djpcms.utils import test
+
+
+class TestMediaBundles(test.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        os.makedirs(os.path.join(self.directory, 'media', 'bundlesite'))
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def settings(self, **kwargs):
+        return Config(None, SITE_DIRECTORY=self.directory,
+                      SITE_MODULE='bundlesite', **kwargs)
+
+    def testRewriteCssUrls(self):
+        css = "a {background: url('../img/a.png')} b {background: url(#x)}"
+        css = rewrite_css_urls(css, '/media/djpcms/css/style.css')
+        self.assertTrue("url('/media/djpcms/img/a.png')" in css)
+        self.assertTrue("url(#x)" in css)
+
+    def testNoBundles(self):
+        m = Media(js=['djpcms/djpcms.js', 'djpcms/djptable.js'],
+                  settings=self.settings())
+        self.assertEqual(len(list(m.render_js())), 2)
+
+    def testJsBundle(self):
+        m = Media(js=['http://cdn.com/jquery.js', 'djpcms/djpcms.js',
+                      'djpcms/djptable.js'],
+                  settings=self.settings(MEDIA_BUNDLES=True))
+        scripts = list(m.render_js())
+        self.assertEqual(len(scripts), 2)
+        self.assertTrue('http://cdn.com/jquery.js' in scripts[0])
+        self.assertTrue('/media/bundlesite/bundles/' in scripts[1])
+        name = scripts[1].split('src="')[1].split('"')[0]
+        self.assertTrue(is_bundle(name))
+        self.assertTrue(os.path.isfile(os.path.join(self.directory, 'media',
+                                'bundlesite', 'bundles', name.split('/')[-1])))
+
+    def bundle(self, **kwargs):
+        m = Media(js=['bundleapp/a.js', 'bundleapp/b.js'],
+                  settings=self.settings(MEDIA_BUNDLES=True,
+                                         INSTALLED_APPS=['bundleapp'],
+                                         **kwargs))
+        scripts = list(m.render_js())
+        self.assertEqual(len(scripts), 1)
+        return scripts[0]
+
+    def testSourceChanged(self):
+        media = os.path.join(self.directory, 'bundleapp', 'media',
+                             'bundleapp')
+        os.makedirs(media)
+        open(os.path.join(self.directory, 'bundleapp', '__init__.py'),
+             'w').close()
+        for name in ('a.js', 'b.js'):
+            with open(os.path.join(media, name), 'w') as f:
+                f.write('var %s;' % name[0])
+        sys.path.insert(0, self.directory)
+        try:
+            bundle = self.bundle(MEDIA_BUNDLES_CHECK=0)
+            path = os.path.join(media, 'b.js')
+            with open(path, 'w') as f:
+                f.write('var c;')
+            mtime = time.time() + 10
+            os.utime(path, (mtime, mtime))
+            # not checked
+            self.assertEqual(self.bundle(MEDIA_BUNDLES_CHECK=0), bundle)
+            bundle2 = self.bundle(DEBUG=True)
+            self.assertNotEqual(bundle2, bundle)
+            self.assertEqual(self.bundle(DEBUG=True), bundle2)
+        finally:
+            sys.path.remove(self.directory)
+            sys.modules.pop('bundleapp', None)
+
+
+class TestMedia(test.TestCase):
+
+    def testCssMedia(self):
+        m = Media(css={'all': ['a.css', 'b.css'], 'print': ['p.css']})
+        head = m.css_media()
+        self.assertEqual(len(list(head.render_css)), 3)
+        m.add_css({'all': ['c.css'], 'print': ['p.css']})
+        late = list(m.css_media(head).render_css)
+        self.assertEqual(len(late), 1)
+        self.assertTrue('c.css' in late[0])
+        self.assertFalse(list(head.css_media(head).render_css))
@@ -328,5 +328,40 @@ body {
     background: #ffffff;
 }''' in stream)
 
+    def testThemes(self):
+        self.assertTrue('sea' in cssv.themes())
+
+    def testMinify(self):
+        text = cssmin('''/* comment */
+.a > p,
+.b :hover {
+    font-family: 'Liberation  Sans', FreeSans;
+    margin: 0 auto;
+}''')
+        self.assertEqual(text, ".a>p,.b :hover{font-family:'Liberation  Sans',"
+                               "FreeSans;margin:0 auto}")
+        stream = dump_theme(minify=True)
+        self.assertTrue('body{' in stream)
+        self.assertFalse('\n' in stream)
+
+    def testThemeCache(self):
+        stream = dump_theme()
+        self.assertEqual(dump_theme(), stream)
+        css('#theme-cache', color='red')
+        stream2 = dump_theme()
+        self.assertNotEqual(stream2, stream)
+        self.assertTrue('#theme-cache {' in stream2)
+
+    def testMemoisedRender(self):
+        with cssv.theme('memoised') as t:
+            text = css.body().render()
+            self.assertTrue('font-size: 28px;' in text)
+            self.assertEqual(css.body().render(), text)
+            cssv.body.font_size = px(17)
+            text2 = css.body().render()
+            self.assertNotEqual(text2, text)
+            # h1 font size is a lazy variable of the body font size
+            self.assertTrue('font-size: 34px;' in text2)
+
     
     
\ No newline at end of file
@@ -0,0 +1,95 @@
+from djpcms.utils import test
+from djpcms.utils import markups
+from djpcms.utils.markups import Application, MarkupCache
+
+
+class Upper(Application):
+    code = 'upper'
+    name = 'Upper'
+    version = '1.0'
+
+    def __init__(self):
+        self.calls = 0
+
+    def __call__(self, request, text):
+        self.calls += 1
+        return text.upper()
+
+
+class Store(dict):
+
+    def set(self, key, value):
+        self[key] = value
+
+
+class TestMarkupCache(test.TestCase):
+
+    def testRenderOnce(self):
+        handler = Upper()
+        cache = MarkupCache()
+        self.assertEqual(cache.render(handler, None, 'ciao'), 'CIAO')
+        self.assertEqual(cache.render(handler, None, 'ciao'), 'CIAO')
+        self.assertEqual(handler.calls, 1)
+        self.assertEqual(cache.render(handler, None, 'bla'), 'BLA')
+        self.assertEqual(handler.calls, 2)
+
+    def testVersion(self):
+        handler = Upper()
+        cache = MarkupCache()
+        key = cache.key(handler, 'ciao')
+        handler.version = '2.0'
+        self.assertNotEqual(cache.key(handler, 'ciao'), key)
+        cache.render(handler, None, 'ciao')
+        self.assertTrue(cache.key(handler, 'ciao') in cache.lru)
+
+    def testStore(self):
+        handler = Upper()
+        store = Store()
+        cache = MarkupCache(store=store)
+        cache.render(handler, None, 'ciao')
+        self.assertEqual(list(store.values()), ['CIAO'])
+        cache.clear()
+        other = MarkupCache(store=store)
+        self.assertEqual(other.render(handler, None, 'ciao'), 'CIAO')
+        self.assertEqual(handler.calls, 1)
+
+
+class TestMarkupEngines(test.TestCase):
+
+    def tearDown(self):
+        for code in ('base', 'missing', 'notinstalled'):
+            markups.MARKUP_ENGINES.pop(code, None)
+
+    def testNotInstalled(self):
+        engine = markups.register('notinstalled', 'Not installed',
+                                  'djpcms.utils.markups.base',
+                                  'djpcms_not_installed_library')
+        self.assertFalse(engine.available)
+        self.assertFalse(engine.loaded)
+        codes = [code for code, name in markups.choices()]
+        self.assertFalse('notinstalled' in codes)
+        self.assertNotEqual(markups.default(), 'notinstalled')
+
+    def testLazy(self):
+        engine = markups.register('base', 'Base',
+                                  'djpcms.utils.markups.base')
+        self.assertFalse(engine.loaded)
+        self.assertTrue(('base', 'Base') in list(markups.choices()))
+        self.assertFalse(engine.loaded)
+        handler = markups.get('base')
+        self.assertTrue(isinstance(handler, Application))
+        self.assertTrue(engine.loaded)
+        self.assertEqual(markups.get('base'), handler)
+        data = dict(((d['code'], d) for d in markups.report()))
+        self.assertTrue(data['base']['time'] >= 0)
+        self.assertEqual(data['base']['error'], None)
+
+    def testMissing(self):
+        engine = markups.register('missing', 'Missing',
+                                  'djpcms.utils.markups.missing')
+        self.assertTrue(('missing', 'Missing') in list(markups.choices()))
+        data = dict(((d['code'], d) for d in markups.load('missing')))
+        self.assertEqual(markups.get('missing'), None)
+        self.assertFalse(engine.available)
+        self.assertTrue(data['missing']['error'])
+        self.assertFalse(('missing', 'Missing') in list(markups.choices()))
@@ -118,4 +118,27 @@ class TestSimpleApplication(test.TestCase):
                                  views.Application, 'foo/', parent_view='/')
         
         
-        
\ No newline at end of file
+        
+
+class Dummy(object):
+
+    def __init__(self, **kwargs):
+        self.__dict__.update(kwargs)
+
+
+class TestInstanceRequest(test.TestCase):
+
+    def testInstanceRequest(self):
+        view = Dummy(ICON=None,
+                     variables_from_instance=lambda i: {'id': i.id},
+                     title=lambda r: 'Post %s' % r.instance.id)
+        route = Dummy(safe_url=lambda urlargs: '/blog/%(id)s/' % urlargs)
+        request = Dummy(view=view, node=Dummy(route=route), urlargs={'id': 1},
+                        instance=Dummy(id=1), url='/blog/1/', environ={})
+        req = views.instance_request(request, Dummy(id=5))
+        self.assertEqual(req.url, '/blog/5/')
+        self.assertEqual(req.urlargs, {'id': 5})
+        self.assertEqual(req.title, 'Post 5')
+        self.assertEqual(req.icon, None)
+        self.assertEqual(req.environ, request.environ)
+        self.assertEqual(request.urlargs, {'id': 1})
@@ -1,9 +1,30 @@
+import time
+
 from djpcms import views
-from djpcms.cms import Route, ImproperlyConfigured, AlreadyRegistered
+from djpcms.cms import Route, ImproperlyConfigured, AlreadyRegistered,\
+                       Http404
+from djpcms.cms.layout import PageModel, page_tree_update
 from djpcms.utils.httpurl import zip
 from djpcms.utils import test
 
 
+class Page(PageModel):
+    url = '/foo/'
+
+
+class PageQuery(object):
+
+    def all(self):
+        return []
+
+
+class PageMapper(object):
+    model = Page
+
+    def query(self):
+        return PageQuery()
+
+
 def get_simpleapps():
     return (
         views.Application('/bla/',
@@ -58,3 +79,67 @@ class TestApplication(test.TestCase):
         self.assertEqual(handle.parent.parent,site)
 
         
+        
+    def testPageTreeCache(self):
+        site = self.website()()
+        tree = site.page_tree()
+        self.assertEqual(tree.site, site)
+        self.assertEqual(site.page_tree(), tree)
+        site.invalidate_page_tree()
+        tree2 = site.page_tree()
+        self.assertNotEqual(tree2, tree)
+        self.assertEqual(site.page_tree(), tree2)
+
+    def testPageTreeUpdate(self):
+        site = self.website()()
+        site.internals['Page'] = PageMapper()
+        site.on_bound()
+        self.assertTrue(site.local['page_tree_cache'])
+        tree = site.page_tree()
+        self.assertEqual(site.page_tree(), tree)
+        # A page is saved
+        page_tree_update.send(sender=Page)
+        tree2 = site.page_tree()
+        self.assertNotEqual(tree2, tree)
+        self.assertEqual(site.page_tree(), tree2)
+        site.settings.PAGE_TREE_TIMEOUT = 0.01
+        site.invalidate_page_tree()
+        tree3 = site.page_tree()
+        time.sleep(0.02)
+        self.assertNotEqual(site.page_tree(), tree3)
+        
+    def testCompiledResolver(self):
+        site = self.website()()
+        compiled = site.local.get('compiled_resolver')
+        self.assertTrue(compiled)
+        for path in ('', 'bla/', 'bla/pluto/'):
+            view, urlargs = compiled.resolve(path)
+            self.assertEqual((view, urlargs), site.resolve(path, {}))
+        self.assertEqual(compiled.resolve('foo/'), None)
+        self.assertEqual(compiled.resolve('bla/pluto'), None)
+        
+    def testResolveCache(self):
+        site = self.website()()
+        tree = site.page_tree()
+        tree.clear_cache()
+        node = tree.resolve('/bla/')
+        self.assertEqual(node.path, '/bla/')
+        self.assertEqual(tree.resolve('/bla/').path, '/bla/')
+        info = tree.cache_info()
+        self.assertEqual(info['resolve']['hits'], 1)
+        self.assertEqual(info['resolve']['size'], 1)
+        self.assertRaises(Http404, tree.resolve, '/foo/')
+        self.assertRaises(Http404, tree.resolve, '/foo/')
+        info = tree.cache_info()
+        self.assertEqual(info['resolve']['size'], 1)
+        self.assertEqual(info['resolve_404']['hits'], 1)
+        errors = []
+        for i in range(2):
+            try:
+                tree.resolve('/foo/')
+            except Http404 as e:
+                errors.append(e)
+        self.assertFalse(errors[0] is errors[1])
+        self.assertEqual(errors[0].status, errors[1].status)
+        site.invalidate_page_tree()
+        self.assertEqual(tree.cache_info()['resolve']['size'], 0)